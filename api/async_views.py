@@ -0,0 +1,283 @@
+from functools import wraps
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedJWTAuthentication
+from .changes import achanges_since, parse_since, sync_page_size
+from .etags import amandal_etag, etag_matches, event_etag, with_etag
+from .fast_serializers import fast_donations, fast_expenses
+from .models import AppNotification, Donation, Expense, MandalEvent, User
+from .pagination import (
+    akeyset_page,
+    astream_json_array,
+    decode_cursor,
+    page_size,
+    wants_page,
+    wants_stream,
+)
+from .queries import query_budget
+from .renderers import payload_renderer_classes
+from .serializers import AppNotificationSerializer, MandalEventSerializer
+from .subscriptions import asubscription_status
+from .tenancy import aresolve_event
+
+
+# ============================
+# ASYNC READ ENDPOINTS
+# ============================
+# Async twins of the read-heavy views in views.py, on Django's async ORM,
+# for the ASGI serving mode (ganeshji/asgi.py). api/urls.py routes to them
+# when ASYNC_READ_VIEWS is on. DRF's @api_view cannot run coroutines, so
+# async_api_view below does the part of it these views use: method check,
+# JWT auth through the same user cache, and content negotiation over the
+# same renderers. Responses match the sync views.
+FORMAT_PARAM = "format"
+
+_authenticator = CachedJWTAuthentication()
+
+
+def _renderers(payload):
+    classes = payload_renderer_classes() if payload else [payload_renderer_classes()[0]]
+    # The browsable API needs a DRF view
+    return [cls() for cls in classes if getattr(cls, "format", None) != "api"]
+
+
+def _negotiate(request, renderers):
+    fmt = request.GET.get(FORMAT_PARAM)
+    if fmt:
+        return next((r for r in renderers if r.format == fmt), None)
+
+    media_type = request.get_preferred_type([r.media_type for r in renderers])
+    return next((r for r in renderers if r.media_type == media_type), None)
+
+
+def render(request, data, status=200):
+    renderer = request.accepted_renderer
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f"{content_type}; charset={renderer.charset}"
+
+    response = HttpResponse(
+        renderer.render(data, renderer.media_type, {}),
+        status=status,
+        content_type=content_type,
+    )
+    patch_vary_headers(response, ("Accept",))
+    return response
+
+
+def not_modified(etag):
+    return HttpResponse(status=304, headers={"ETag": etag})
+
+
+def async_api_view(methods, payload=False, login_required=True):
+    """
+    ``@api_view`` + ``@permission_classes([IsAuthenticated])`` +
+    ``@renderer_classes(...)`` for async views. ``payload`` offers the
+    payload renderers (MessagePack); ``login_required=False`` still
+    authenticates a token when one is sent, as DRF does.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            renderers = _renderers(payload)
+            request.accepted_renderer = _negotiate(request, renderers)
+            if request.accepted_renderer is None:
+                request.accepted_renderer = renderers[0]
+                return render(request, {"detail": "Could not satisfy the request Accept header."}, 406)
+
+            try:
+                auth = await _authenticator.aauthenticate(request)
+            except AuthenticationFailed as exc:  # simplejwt's errors subclass it
+                return _unauthorized(request, exc.detail)
+
+            if auth is not None:
+                request.user = auth[0]
+            elif login_required:
+                return _unauthorized(request, {"detail": "Authentication credentials were not provided."})
+
+            if request.method not in methods:
+                response = render(request, {"detail": f'Method "{request.method}" not allowed.'}, 405)
+                response["Allow"] = ", ".join(methods)
+                return response
+
+            return await view(request, *args, **kwargs)
+
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def _unauthorized(request, detail):
+    response = render(request, detail, 401)
+    response["WWW-Authenticate"] = _authenticator.authenticate_header(request)
+    return response
+
+
+def event_scoped(view):
+    """Async ``tenancy.event_scoped()`` (``?event_id=``, required)."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        event_id = request.GET.get("event_id")
+        if not event_id:
+            return render(request, {"error": "event_id required"}, 400)
+
+        tenant = await aresolve_event(request.user, event_id)
+        if tenant is None:
+            return render(request, {"error": "Invalid event"}, 403)
+
+        request.tenant = tenant
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+# ============================
+# SYNC
+# ============================
+@query_budget(2)
+@async_api_view(["GET"], payload=True)
+async def sync_user(request):
+    user = await User.objects.select_related("mandal").aget(pk=request.user.pk)
+
+    if not user or not user.is_active:
+        return render(request, {"error": "User not active"}, 403)
+
+    return render(request, {
+        "id": user.id,
+        "name": user.name,
+        "mobile": user.mobile,
+        "role": user.role,
+        "mandal_name": user.mandal.name,
+
+        # 🔐 Subscription
+        "is_paid": user.is_paid,
+        "is_demo_user": user.is_demo_user,
+
+        # 💰 Wallet
+        "wallet_balance": user.wallet_balance,
+        "total_collected": user.total_collected,
+        "total_transferred": user.total_transferred,
+        "manager_balance": user.manager_balance,
+
+        # 📊 Counters
+        "donation_count": user.donation_count,
+        "expense_count": user.expense_count,
+        "entry_count": user.entry_count,
+    })
+
+
+async def _sync_ledger(request, model, fast, key, client_field):
+    mandal_event = request.tenant.mandal_event
+
+    etag = event_etag(request, mandal_event)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    try:
+        since = parse_since(request)
+    except ValueError:
+        return render(request, {"error": "Invalid since cursor"}, 400)
+
+    # 🔄 DELTA MODE: only rows changed after the client's cursor
+    if since is not None:
+        items, deleted, cursor, has_more = await achanges_since(
+            model.objects.filter(mandal_event=mandal_event),
+            since,
+            sync_page_size(request),
+            fast,
+        )
+        return with_etag(render(request, {
+            key: items,
+            "deleted": [
+                {client_field: item[client_field], "change_seq": item["change_seq"]}
+                for item in deleted
+            ],
+            "cursor": cursor,
+            "has_more": has_more,
+        }), etag)
+
+    rows = await fast.amany(model.objects.filter(mandal_event=mandal_event, is_deleted=False))
+    return with_etag(render(request, rows), etag)
+
+
+@query_budget(3)
+@async_api_view(["GET"], payload=True)
+@event_scoped
+async def sync_donations(request):
+    return await _sync_ledger(request, Donation, fast_donations, "donations", "client_donation_id")
+
+
+@query_budget(3)
+@async_api_view(["GET"], payload=True)
+@event_scoped
+async def sync_expenses(request):
+    return await _sync_ledger(request, Expense, fast_expenses, "expenses", "client_expense_id")
+
+
+# ============================
+# LISTS
+# ============================
+@query_budget(3)
+@async_api_view(["GET"], payload=True)
+@event_scoped
+async def get_donations(request):
+    mandal_event = request.tenant.mandal_event
+
+    etag = event_etag(request, mandal_event)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    qs = Donation.objects.filter(mandal_event=mandal_event, is_deleted=False)
+    if request.user.role != "Manager":
+        qs = qs.filter(created_by_id=request.user.id)
+
+    if wants_stream(request):
+        response = StreamingHttpResponse(
+            astream_json_array(qs, fast_donations),
+            content_type="application/json"
+        )
+        return with_etag(response, etag)
+
+    if wants_page(request):
+        try:
+            cursor = decode_cursor(request.GET["cursor"]) if request.GET.get("cursor") else None
+        except ValueError:
+            return render(request, {"error": "Invalid cursor"}, 400)
+
+        results, next_cursor = await akeyset_page(qs, cursor, page_size(request), fast_donations)
+        return with_etag(render(request, {
+            "results": results,
+            "next_cursor": next_cursor,
+        }), etag)
+
+    return with_etag(render(request, await fast_donations.amany(qs)), etag)
+
+
+@query_budget(3)
+@async_api_view(["GET"])
+async def get_my_events(request):
+    etag = await amandal_etag(request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    events = [
+        event async for event in
+        MandalEvent.objects.filter(mandal_id=request.user.mandal_id).select_related("event")
+    ]
+    return with_etag(render(request, MandalEventSerializer(events, many=True).data), etag)
+
+
+@query_budget(2)
+@async_api_view(["GET"])
+async def get_notifications(request):
+    notifications = [n async for n in AppNotification.objects.filter(to_user_id=request.user.id)]
+    return render(request, AppNotificationSerializer(notifications, many=True).data)
+
+
+@query_budget(2)
+@async_api_view(["GET"], login_required=False)
+async def get_subscription_status(request, mandal_id):
+    # ⏳ Cached; expired rows are deactivated by expire_subscriptions, not here
+    return render(request, await asubscription_status(mandal_id))
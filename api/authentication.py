@@ -0,0 +1,195 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import User
+
+
+# ============================
+# TOKEN CLAIMS
+# ============================
+# Access and refresh tokens carry the user's mandal and role as signed
+# claims, so the tenant and role are known from the token alone.
+def add_claims(token, user):
+    token["mandal_id"] = user.mandal_id
+    token["role"] = user.role
+    return token
+
+
+def tokens_for(user):
+    """RefreshToken (with its access token) carrying the mandal / role claims."""
+    return add_claims(RefreshToken.for_user(user), user)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """token/ endpoint: same as simplejwt's, plus the claims."""
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+# ============================
+# USER CONTEXT CACHE
+# ============================
+# Per-process TTL + LRU cache of authenticated users (with their mandal
+# loaded). Writes in this process invalidate it directly; other workers
+# pick changes up within AUTH_USER_CACHE_TTL seconds, or immediately when
+# a token's claims disagree with the cached user.
+DEFAULT_CACHE_TTL = 60
+DEFAULT_CACHE_SIZE = 10000
+
+
+class UserCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # str(user_id) -> (expires_at, user); simplejwt puts the id in tokens as a string
+        self.entries = OrderedDict()
+
+    def ttl(self):
+        return getattr(settings, "AUTH_USER_CACHE_TTL", DEFAULT_CACHE_TTL)
+
+    def max_size(self):
+        return getattr(settings, "AUTH_USER_CACHE_SIZE", DEFAULT_CACHE_SIZE)
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, user):
+        if self.ttl() <= 0:
+            return
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + self.ttl(), user)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size():
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def invalidate_mandal(self, mandal_id):
+        with self.lock:
+            for user_id in [k for k, (_, u) in self.entries.items() if u.mandal_id == mandal_id]:
+                del self.entries[user_id]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache()
+
+
+def invalidate_user(user_id):
+    user_cache.invalidate(str(user_id))
+
+
+def invalidate_mandal(mandal_id):
+    user_cache.invalidate_mandal(int(mandal_id))
+
+
+def _copy(user):
+    """Copy handed to the request, so views changing request.user cannot touch the cache."""
+    user = copy.copy(user)
+    user._state = copy.copy(user._state)
+    user._state.fields_cache = {
+        name: copy.copy(value) for name, value in user._state.fields_cache.items()
+    }
+    return user
+
+
+def _claims_match(user, token):
+    for claim, value in (("mandal_id", user.mandal_id), ("role", user.role)):
+        if claim in token and token[claim] != value:
+            return False
+    return True
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication serving ``request.user`` from ``user_cache``: no
+    query on a hit, one (user + mandal) on a miss.
+    """
+    def get_user(self, validated_token):
+        if getattr(api_settings, "CHECK_REVOKE_TOKEN", False):
+            return super().get_user(validated_token)
+
+        user_id, user = self._cached(validated_token)
+        if user is None:
+            try:
+                user = User.objects.select_related("mandal").get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except User.DoesNotExist:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+            user_cache.set(str(user_id), user)
+
+        return self._checked(user)
+
+    async def aauthenticate(self, request):
+        """
+        ``authenticate`` for async views: ``(user, token)``, or None without
+        a token. Only a cache miss touches the database (async ORM).
+        """
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if getattr(api_settings, "CHECK_REVOKE_TOKEN", False):
+            return await sync_to_async(self.get_user)(validated_token)
+
+        user_id, user = self._cached(validated_token)
+        if user is None:
+            try:
+                user = await User.objects.select_related("mandal").aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except User.DoesNotExist:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+            user_cache.set(str(user_id), user)
+
+        return self._checked(user)
+
+    async def aget_user_by_id(self, user_id):
+        """``aget_user`` for a user id vouched for some other way (a stream ticket)."""
+        return await self.aget_user({api_settings.USER_ID_CLAIM: str(user_id)})
+
+    def _cached(self, validated_token):
+        """``(user_id, cached user)``; the user is None on a miss or when the claims disagree."""
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        user = user_cache.get(str(user_id))
+        if user is not None and not _claims_match(user, validated_token):
+            user = None
+        return user_id, user
+
+    def _checked(self, user):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        return _copy(user)
@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+from . import realtime
+from .models import Mandal, MandalEvent
+
+
+# ============================
+# CHANGE SEQUENCE (DELTA SYNC)
+# ============================
+DEFAULT_SYNC_PAGE_SIZE = 500
+
+
+def reserve_change_seq(mandal_event_id, count=1):
+    """
+    Reserve ``count`` consecutive change sequence numbers for an event and
+    return the first one.
+
+    Must run inside ``transaction.atomic()``: the UPDATE keeps the event row
+    locked until commit, so a reader never sees seq N+1 before seq N. The
+    owning mandal's ``data_version`` is bumped in the same transaction.
+    """
+    if connection.vendor == "mysql":
+        last = _reserve_mysql(mandal_event_id, count)
+    elif connection.features.can_return_columns_from_insert:
+        last = _reserve_returning(mandal_event_id, count)
+    else:
+        last = _reserve_orm(mandal_event_id, count)
+    realtime.ledger_changed(mandal_event_id, last)
+    return last - count + 1
+
+
+def _reserve_mysql(mandal_event_id, count):
+    # One round trip: a multi-table UPDATE bumps both rows, and
+    # LAST_INSERT_ID(expr) hands the new change_seq back as the cursor's
+    # lastrowid (it is per-connection, so concurrent writers can't see it).
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {qn(MandalEvent._meta.db_table)} e"
+            f" JOIN {qn(Mandal._meta.db_table)} m ON m.id = e.mandal_id"
+            " SET e.change_seq = LAST_INSERT_ID(e.change_seq + %s),"
+            " m.data_version = m.data_version + 1"
+            " WHERE e.id = %s",
+            [count, mandal_event_id],
+        )
+        if not cursor.rowcount:
+            raise MandalEvent.DoesNotExist
+        return cursor.lastrowid
+
+
+def _reserve_returning(mandal_event_id, count):
+    # UPDATE ... RETURNING reads the counter back without a second SELECT.
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {qn(MandalEvent._meta.db_table)}"
+            " SET change_seq = change_seq + %s WHERE id = %s"
+            " RETURNING change_seq, mandal_id",
+            [count, mandal_event_id],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        raise MandalEvent.DoesNotExist
+    last, mandal_id = row
+    bump_mandal_version(mandal_id)
+    return last
+
+
+def _reserve_orm(mandal_event_id, count):
+    MandalEvent.objects.filter(pk=mandal_event_id).update(
+        change_seq=F("change_seq") + count
+    )
+    Mandal.objects.filter(mandalevent=mandal_event_id).update(
+        data_version=F("data_version") + 1
+    )
+    return MandalEvent.objects.filter(pk=mandal_event_id).values_list(
+        "change_seq", flat=True
+    ).get()
+
+
+def bump_mandal_version(mandal_id):
+    """Invalidate mandal-wide ETags (see ``api.etags``)."""
+    Mandal.objects.filter(pk=mandal_id).update(
+        data_version=F("data_version") + 1
+    )
+
+
+def parse_since(request):
+    """
+    Return the ``since`` cursor from the query string, or None when the
+    client asked for a full snapshot. Raises ValueError on a bad cursor.
+    """
+    since = request.GET.get("since")
+    if since in (None, ""):
+        return None
+
+    since = int(since)
+    if since < 0:
+        raise ValueError("since must be >= 0")
+    return since
+
+
+def sync_page_size(request):
+    max_size = getattr(settings, "SYNC_PAGE_SIZE", DEFAULT_SYNC_PAGE_SIZE)
+    try:
+        limit = int(request.GET.get("limit", max_size))
+    except ValueError:
+        limit = max_size
+    return max(1, min(limit, max_size))
+
+
+def changes_since(qs, since, limit, fast):
+    """
+    Rows of ``qs`` changed after ``since``, oldest change first, serialized
+    with the ``FastSerializer`` ``fast``.
+
+    Returns ``(live, deleted, cursor, has_more)``. Soft-deleted rows are
+    split out so the caller can send them as tombstones.
+    """
+    rows = list(_changed_rows(qs, since, limit, fast))
+    return _split_changes(rows, since, limit, fast)
+
+
+async def achanges_since(qs, since, limit, fast):
+    """Async ``changes_since``."""
+    rows = [row async for row in _changed_rows(qs, since, limit, fast)]
+    return _split_changes(rows, since, limit, fast)
+
+
+def _changed_rows(qs, since, limit, fast):
+    return fast.rows(qs.filter(change_seq__gt=since).order_by("change_seq"), "is_deleted")[:limit + 1]
+
+
+def _split_changes(rows, since, limit, fast):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = fast.to_dicts(row[:-1] for row in rows)
+    live = [item for item, row in zip(items, rows) if not row[-1]]
+    deleted = [item for item, row in zip(items, rows) if row[-1]]
+    cursor = items[-1]["change_seq"] if items else since
+
+    return live, deleted, cursor, has_more
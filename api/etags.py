@@ -0,0 +1,70 @@
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from .models import Mandal
+
+
+# ============================
+# ETAGS / CONDITIONAL GET
+# ============================
+# Event-scoped reads are versioned by MandalEvent.change_seq and
+# mandal-wide reads by Mandal.data_version; both are bumped by every
+# write (see api.changes). The tag also covers who is asking and how,
+# because role, query string and Accept all change the body.
+def make_etag(request, scope, version):
+    key = "|".join((
+        scope,
+        str(version),
+        str(request.user.id),
+        str(request.user.role),
+        request.get_full_path(),
+        request.META.get("HTTP_ACCEPT", ""),
+    ))
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def event_etag(request, mandal_event):
+    return make_etag(request, f"event:{mandal_event.id}", mandal_event.change_seq)
+
+
+def mandal_etag(request):
+    version = _mandal_version(request).first()
+    return make_etag(request, f"mandal:{request.user.mandal_id}", version)
+
+
+async def amandal_etag(request):
+    version = await _mandal_version(request).afirst()
+    return make_etag(request, f"mandal:{request.user.mandal_id}", version)
+
+
+def _mandal_version(request):
+    return Mandal.objects.filter(pk=request.user.mandal_id).values_list(
+        "data_version", flat=True
+    )
+
+
+def etag_matches(request, etag):
+    """
+    Weak comparison, as If-None-Match requires; compression middleware
+    may have handed the client a W/ version of our tag.
+    """
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+
+    tags = parse_etags(header)
+    if "*" in tags:
+        return True
+    return etag in (tag.removeprefix("W/") for tag in tags)
+
+
+def not_modified(etag):
+    return Response(status=304, headers={"ETag": etag})
+
+
+def with_etag(response, etag):
+    if response.status_code == 200:
+        response["ETag"] = etag
+    return response
@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from django.utils import timezone
+
+from .serializers import DonationSerializer, ExpenseSerializer
+
+
+# ============================
+# FAST-PATH (READ-ONLY) SERIALIZERS
+# ============================
+# Builds exactly the dicts a ModelSerializer's ``.data`` would, but from
+# ``values_list()`` tuples: no model instances, no per-field
+# get_attribute() walk. Columns and converters are worked out once from
+# the ModelSerializer, so the two cannot drift apart.
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def _decimal_converter(field):
+    exp = Decimal(1).scaleb(-field.decimal_places)
+    return lambda value: "{:f}".format(value.quantize(exp))
+
+
+def _datetime_converter():
+    def convert(value):
+        value = value.astimezone(timezone.get_current_timezone()).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+    return convert
+
+
+def _converter(field):
+    """Return a ``value -> json value`` callable, or None when the value is already final."""
+    if isinstance(field, serializers.DecimalField):
+        coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+        if coerce_to_string and not field.localize and not field.normalize_output:
+            return _decimal_converter(field)
+        return field.to_representation
+
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+        if output_format in (None, ISO_8601):
+            return _datetime_converter()
+        return field.to_representation
+
+    if isinstance(field, IDENTITY_FIELDS) and not getattr(field, "pk_field", None):
+        return None
+
+    return field.to_representation
+
+
+class FastSerializer:
+    def __init__(self, serializer_class):
+        fields = serializer_class().fields
+
+        self.names = []
+        self.columns = []
+        self.converters = []
+
+        for name, field in fields.items():
+            if field.write_only:
+                continue
+            self.names.append(name)
+            self.columns.append("__".join(field.source_attrs))
+            self.converters.append(_converter(field))
+
+    def index(self, name):
+        return self.names.index(name)
+
+    def rows(self, qs, *extra):
+        """``values_list()`` over the serializer's columns (plus ``extra`` columns)."""
+        return qs.values_list(*self.columns, *extra)
+
+    def to_dicts(self, rows):
+        names = self.names
+        converters = [
+            (i, names[i], convert)
+            for i, convert in enumerate(self.converters)
+            if convert is not None
+        ]
+        out = []
+
+        for row in rows:
+            item = dict(zip(names, row))
+            for i, name, convert in converters:
+                if row[i] is not None:
+                    item[name] = convert(row[i])
+            out.append(item)
+
+        return out
+
+    def many(self, qs):
+        return self.to_dicts(self.rows(qs))
+
+    async def amany(self, qs):
+        return self.to_dicts([row async for row in self.rows(qs)])
+
+
+fast_donations = FastSerializer(DonationSerializer)
+fast_expenses = FastSerializer(ExpenseSerializer)
@@ -0,0 +1,237 @@
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics
+from .models import Job, JobLock
+
+logger = logging.getLogger(__name__)
+
+
+# ============================
+# BACKGROUND JOBS
+# ============================
+# Deferred work on the database we already have. enqueue() inserts a Job
+# row (inside the caller's transaction: a rolled back request queues
+# nothing) and the run_jobs worker claims due rows with SELECT ... FOR
+# UPDATE SKIP LOCKED, so any number of workers share the table without
+# taking the same job twice.
+#
+# A claim is committed before the handler runs, so a long job holds no
+# row lock; a worker that dies mid-job leaves a "running" row that
+# requeue_stale() hands out again after JOB_TIMEOUT seconds. Failed runs
+# are retried with exponential backoff up to the handler's max_attempts.
+# Handlers live in api/tasks.py.
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_BACKOFF = 10
+MAX_RETRY_DELAY = 3600
+DEFAULT_TIMEOUT = 900
+DEFAULT_RETENTION = 7 * 24 * 3600
+
+
+class Handler:
+    def __init__(self, name, func, max_attempts, concurrency, every):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+        self.every = every
+
+
+handlers = {}
+
+
+def job(name, max_attempts=DEFAULT_MAX_ATTEMPTS, concurrency=None, every=None):
+    """
+    Register a handler, called with the job's payload as keyword
+    arguments. ``concurrency`` caps how many of these run at once across
+    all workers; ``every`` (seconds) has the worker enqueue one run per
+    interval (JOB_SCHEDULE overrides it; 0 turns it off).
+    """
+    def decorator(func):
+        handlers[name] = Handler(name, func, max_attempts, concurrency, every)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, run_at=None, unique_key=None):
+    """
+    Queue ``name`` to run with ``payload`` (JSON) at ``run_at`` (now by
+    default). A second job with the same ``unique_key`` is ignored.
+    """
+    handler = handlers.get(name)
+    job = Job(
+        name=name,
+        payload=payload or {},
+        unique_key=unique_key,
+        max_attempts=handler.max_attempts if handler else DEFAULT_MAX_ATTEMPTS,
+        run_at=run_at or timezone.now(),
+    )
+    Job.objects.bulk_create([job], ignore_conflicts=True)
+    return job
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ============================
+# CLAIM / RUN
+# ============================
+def claim(worker, limit):
+    """Lock up to ``limit`` due jobs, mark them running for ``worker`` and return them."""
+    now = timezone.now()
+    due = Job.objects.filter(status="pending", run_at__lte=now)
+    limited = {name: h.concurrency for name, h in handlers.items() if h.concurrency}
+
+    # Capped jobs first, each bounded by its free slots, so a backlog of
+    # one capped job cannot crowd out the rest
+    claimed = []
+    if limited:
+        for name in sorted(set(due.filter(name__in=limited).values_list("name", flat=True))):
+            if len(claimed) < limit:
+                claimed += _claim_capped(worker, name, limited[name], limit - len(claimed), now)
+
+    if len(claimed) < limit:
+        with transaction.atomic():
+            jobs = list(
+                due.exclude(name__in=limited)
+                .select_for_update(skip_locked=True)
+                .order_by("run_at")[:limit - len(claimed)]
+            )
+            _mark_running(jobs, worker, now)
+        claimed += jobs
+
+    return claimed
+
+
+def _claim_capped(worker, name, cap, limit, now):
+    JobLock.objects.bulk_create([JobLock(name=name)], ignore_conflicts=True)
+
+    with transaction.atomic():
+        # Held until commit: the next claimer of this job counts our claims
+        JobLock.objects.select_for_update().get(name=name)
+
+        # A locking read, so it sees the latest committed claims
+        running = len(
+            Job.objects.select_for_update()
+            .filter(name=name, status="running")
+            .values_list("id", flat=True)
+        )
+        free = min(cap - running, limit)
+        if free <= 0:
+            return []
+
+        jobs = list(
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(name=name, status="pending", run_at__lte=now)
+            .order_by("run_at")[:free]
+        )
+        _mark_running(jobs, worker, now)
+    return jobs
+
+
+def _mark_running(jobs, worker, now):
+    if not jobs:
+        return
+
+    Job.objects.filter(id__in=[job.id for job in jobs]).update(
+        status="running",
+        locked_by=worker,
+        locked_at=now,
+        attempts=F("attempts") + 1,
+    )
+    for job in jobs:
+        job.status = "running"
+        job.locked_by = worker
+        job.locked_at = now
+        job.attempts += 1
+
+
+def retry_delay(attempts):
+    backoff = getattr(settings, "JOB_RETRY_BACKOFF", DEFAULT_RETRY_BACKOFF)
+    return min(backoff * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def run(job):
+    """
+    Run a claimed job and record the outcome: "done", "retry" (back to
+    pending after a backoff) or "failed". Returns the outcome.
+    """
+    handler = handlers.get(job.name)
+    started = time.monotonic()
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job '{job.name}'")
+        handler.func(**job.payload)
+    except Exception as exc:
+        outcome = "failed" if handler is None or job.attempts >= job.max_attempts else "retry"
+        logger.warning(
+            "job failed",
+            exc_info=True,
+            extra={"job": job.name, "job_id": job.id, "attempts": job.attempts, "outcome": outcome},
+        )
+        changes = {"last_error": f"{type(exc).__name__}: {exc}", "locked_by": None, "locked_at": None}
+        if outcome == "retry":
+            changes.update(status="pending", run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)))
+        else:
+            changes.update(status="failed", finished_at=timezone.now())
+    else:
+        outcome = "done"
+        changes = {"status": "done", "finished_at": timezone.now(), "last_error": None}
+
+    duration = time.monotonic() - started
+    metrics.registry.observe_job(job.name, outcome, duration)
+    logger.info("job finished", extra={"job": job.name, "job_id": job.id, "outcome": outcome, "duration": duration})
+
+    # Only if it is still ours (requeue_stale may have handed it out again)
+    Job.objects.filter(id=job.id, status="running", locked_by=job.locked_by).update(**changes)
+    return outcome
+
+
+# ============================
+# HOUSEKEEPING
+# ============================
+def requeue_stale():
+    """Hand out again jobs whose worker has held them past JOB_TIMEOUT (it died, most likely)."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, "JOB_TIMEOUT", DEFAULT_TIMEOUT))
+    stale = Job.objects.filter(status="running", locked_at__lt=cutoff)
+    error = "Worker did not finish the job in time"
+
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status="failed", finished_at=timezone.now(), last_error=error, locked_by=None, locked_at=None,
+    )
+    requeued = stale.update(status="pending", last_error=error, locked_by=None, locked_at=None)
+    return requeued + failed
+
+
+def schedule(now=None):
+    """Enqueue this interval's run of every periodic handler (once, whichever worker gets there first)."""
+    now = now or timezone.now()
+    overrides = getattr(settings, "JOB_SCHEDULE", {})
+
+    for name, handler in handlers.items():
+        every = overrides.get(name, handler.every)
+        if not every:
+            continue
+        slot = int(now.timestamp() // every)
+        enqueue(
+            name,
+            run_at=datetime.fromtimestamp(slot * every, tz=dt_timezone.utc),
+            unique_key=f"{name}@{slot}",
+        )
+
+
+def purge_finished():
+    """Delete done and failed jobs older than JOB_RETENTION seconds."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, "JOB_RETENTION", DEFAULT_RETENTION))
+    deleted, _ = Job.objects.filter(status__in=("done", "failed"), finished_at__lt=cutoff).delete()
+    return deleted
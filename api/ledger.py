@@ -0,0 +1,186 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import CollectorRollup, Donation, EventLedgerSummary, Expense, MandalEvent
+
+
+# ============================
+# LEDGER SUMMARY MAINTENANCE
+# ============================
+# Callers apply deltas inside the same transaction as the ledger write, and
+# after reserve_change_seq(): that call already holds the MandalEvent row
+# lock, which is what serializes concurrent updates of one summary row.
+CENT = Decimal("0.01")
+
+
+def _money(value):
+    return str(Decimal(value).quantize(CENT))
+
+
+def _bump(breakdown, key, amount, count):
+    entry = breakdown.get(key) or {"total": "0.00", "count": 0}
+    total = Decimal(entry["total"]) + amount
+    entry = {"total": _money(total), "count": entry["count"] + count}
+
+    if entry["count"] <= 0:
+        breakdown.pop(key, None)
+    else:
+        breakdown[key] = entry
+
+
+def apply_ledger_delta(mandal_event_id, donations=(), expenses=(), sign=1):
+    """
+    Add (``sign=1``) or remove (``sign=-1``) donation / expense rows from the
+    event's summary. Call it after the rows themselves have been written.
+    """
+    if not donations and not expenses:
+        return
+
+    summary = EventLedgerSummary.objects.select_for_update().filter(
+        mandal_event_id=mandal_event_id
+    ).first()
+
+    if summary is None:
+        # No summary yet: the raw rows, including the ones just written,
+        # are already the answer.
+        rebuild_summary(mandal_event_id)
+        return
+
+    for donation in donations:
+        amount = Decimal(donation.amount) * sign
+        summary.total_collection += amount
+        summary.donation_count += sign
+        _bump(summary.donation_types, donation.donation_type, amount, sign)
+
+    for expense in expenses:
+        amount = Decimal(expense.amount) * sign
+        summary.total_expense += amount
+        summary.expense_count += sign
+        _bump(summary.expense_categories, expense.category, amount, sign)
+
+    summary.save()
+    _apply_collector_delta(mandal_event_id, donations, sign)
+
+
+def _apply_collector_delta(mandal_event_id, donations, sign):
+    collectors = defaultdict(lambda: {"total": Decimal("0"), "count": 0, "last": None, "name": ""})
+    for donation in donations:
+        entry = collectors[donation.created_by_id]
+        entry["total"] += Decimal(donation.amount) * sign
+        entry["count"] += sign
+        entry["name"] = donation.created_by_name
+        if entry["last"] is None or donation.date > entry["last"]:
+            entry["last"] = donation.date
+
+    for user_id, entry in collectors.items():
+        changes = {
+            "total": F("total") + entry["total"],
+            "donation_count": F("donation_count") + entry["count"],
+        }
+        if sign > 0:
+            changes["collector_name"] = entry["name"]
+            changes["last_collected_at"] = Greatest(
+                Coalesce(F("last_collected_at"), Value(entry["last"])),
+                Value(entry["last"]),
+            )
+
+        updated = CollectorRollup.objects.filter(
+            mandal_event_id=mandal_event_id,
+            user_id=user_id
+        ).update(**changes)
+
+        if not updated and sign > 0:
+            CollectorRollup.objects.create(
+                mandal_event_id=mandal_event_id,
+                user_id=user_id,
+                collector_name=entry["name"],
+                total=entry["total"],
+                donation_count=entry["count"],
+                last_collected_at=entry["last"],
+            )
+
+
+def _breakdown(qs, field):
+    rows = (
+        qs.order_by()
+        .values(field)
+        .annotate(total=Sum("amount"), count=Count("id"))
+    )
+    return {
+        row[field]: {"total": _money(row["total"]), "count": row["count"]}
+        for row in rows
+    }
+
+
+def rebuild_summary(mandal_event_id):
+    """
+    Recompute one event's summary and collector rollups from the raw,
+    non-deleted rows.
+    """
+    with transaction.atomic():
+        # Block ledger writes for this event while we recompute
+        MandalEvent.objects.select_for_update().filter(pk=mandal_event_id).first()
+
+        donations = Donation.objects.filter(mandal_event_id=mandal_event_id, is_deleted=False)
+        expenses = Expense.objects.filter(mandal_event_id=mandal_event_id, is_deleted=False)
+
+        donation_types = _breakdown(donations, "donation_type")
+        expense_categories = _breakdown(expenses, "category")
+
+        summary, _ = EventLedgerSummary.objects.update_or_create(
+            mandal_event_id=mandal_event_id,
+            defaults={
+                "total_collection": sum((Decimal(v["total"]) for v in donation_types.values()), Decimal("0")),
+                "total_expense": sum((Decimal(v["total"]) for v in expense_categories.values()), Decimal("0")),
+                "donation_count": sum(v["count"] for v in donation_types.values()),
+                "expense_count": sum(v["count"] for v in expense_categories.values()),
+                "donation_types": donation_types,
+                "expense_categories": expense_categories,
+            },
+        )
+
+        CollectorRollup.objects.filter(mandal_event_id=mandal_event_id).delete()
+        CollectorRollup.objects.bulk_create([
+            CollectorRollup(
+                mandal_event_id=mandal_event_id,
+                user_id=row["created_by"],
+                collector_name=row["name"],
+                total=row["total"],
+                donation_count=row["count"],
+                last_collected_at=row["last"],
+            )
+            for row in donations.order_by().values("created_by").annotate(
+                name=Max("created_by_name"),
+                total=Sum("amount"),
+                count=Count("id"),
+                last=Max("date"),
+            )
+        ])
+
+    return summary
+
+
+def get_summary(mandal_event_id):
+    """
+    The event's summary, built from the raw rows the first time it is read
+    (events created before the summary table existed).
+    """
+    summary = EventLedgerSummary.objects.filter(mandal_event_id=mandal_event_id).first()
+    if summary is None:
+        summary = rebuild_summary(mandal_event_id)
+    return summary
+
+
+def ensure_summaries(mandal_id):
+    """Build summaries / rollups for any of the mandal's events still missing one."""
+    missing = MandalEvent.objects.filter(
+        mandal_id=mandal_id,
+        ledger_summary__isnull=True
+    ).values_list("id", flat=True)
+
+    for mandal_event_id in missing:
+        rebuild_summary(mandal_event_id)
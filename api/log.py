@@ -0,0 +1,230 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import zlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+
+# ============================
+# STRUCTURED LOGGING
+# ============================
+# logger.info("donation created", extra={"event_id": 3, "amount": "101.00"})
+# comes out as one JSON line with the request id attached. Records are
+# handed to a background thread through a bounded queue, so a slow or
+# blocked stdout never holds up a request; when the queue is full records
+# are dropped (and counted) rather than waited on.
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_DEBUG_SAMPLE_RATE = 0.01
+
+REDACTED = "[redacted]"
+REDACT_KEYS = {
+    "password", "old_password", "new_password", "confirm_password",
+    "access", "refresh", "token", "authorization", "secret",
+    "razorpay_signature", "signature", "ticket",
+}
+# Kept recognisable but not reusable: last four digits only
+MASK_KEYS = {"mobile", "whatsapp_number", "user_upi_id"}
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+# The same keys inside text: query strings in messages, %-args and reprs
+# (django.request logs "<WSGIRequest: GET '/path?token=...'>")
+_SECRET_PARAM = re.compile(
+    r"\b(%s)=[^&\s'\"]*" % "|".join(sorted(REDACT_KEYS)), re.IGNORECASE,
+)
+_JSON_TYPES = (str, int, float, bool, type(None), dict, list)
+
+
+def get_request_id():
+    return request_id_var.get()
+
+
+def _mask(value):
+    value = str(value)
+    return "*" * max(len(value) - 4, 0) + value[-4:]
+
+
+def redact_text(text):
+    return _SECRET_PARAM.sub(lambda m: f"{m.group(1)}={REDACTED}", text)
+
+
+def redact(value):
+    """Copy of ``value`` with secrets replaced and phone numbers masked."""
+    if isinstance(value, dict):
+        out = {}
+        for key, item in value.items():
+            lowered = str(key).lower()
+            if lowered in REDACT_KEYS:
+                out[key] = REDACTED
+            elif lowered in MASK_KEYS and item not in (None, ""):
+                out[key] = _mask(item)
+            else:
+                out[key] = redact(item)
+        return out
+
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+
+    # QueryDict and friends
+    if hasattr(value, "dict") and hasattr(value, "getlist"):
+        return redact(value.dict())
+
+    if isinstance(value, str):
+        return redact_text(value)
+
+    # Anything else is logged as its str(), e.g. django.request's request
+    if not isinstance(value, _JSON_TYPES):
+        return redact_text(str(value))
+
+    return value
+
+
+def record_extras(record):
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+
+
+# ============================
+# FILTERS / FORMATTER
+# ============================
+class RequestIdFilter(logging.Filter):
+    """
+    Stamps ``record.request_id``; handler filters run in the caller's
+    thread, before the queue. django.request logs a response after
+    RequestIdMiddleware has returned, so the id then comes from the
+    ``request`` it passes along.
+    """
+    def filter(self, record):
+        request_id = request_id_var.get()
+        if request_id is None:
+            request_id = getattr(getattr(record, "request", None), "request_id", None)
+        record.request_id = request_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a ``LOG_DEBUG_SAMPLE_RATE`` fraction of DEBUG records; INFO and
+    above always pass. The decision is made per request id, so a sampled
+    request keeps all of its debug lines.
+    """
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+
+        rate = getattr(settings, "LOG_DEBUG_SAMPLE_RATE", DEFAULT_DEBUG_SAMPLE_RATE)
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+
+        request_id = request_id_var.get()
+        if request_id is None:
+            return random.random() < rate
+        return zlib.crc32(request_id.encode()) % 10000 < rate * 10000
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update(record_extras(record))
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+# ============================
+# NON-BLOCKING HANDLER
+# ============================
+class NonBlockingHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler writing to ``stream`` (stdout) from a QueueListener thread.
+
+    The calling thread only snapshots the record (message merged, extras
+    redacted) and does a non-blocking put; formatting and I/O happen on the
+    listener. The listener is (re)started lazily per process, so it survives
+    gunicorn forking workers after settings are loaded.
+    """
+    def __init__(self, stream=None, maxsize=DEFAULT_QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.dropped = 0
+        self.listener = None
+        self.pid = None
+        self.start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def start(self):
+        with self.start_lock:
+            if self.pid == os.getpid():
+                return
+            if self.pid is not None:
+                # Forked: the parent's listener thread does not exist here
+                self.queue = queue.Queue(self.maxsize)
+            self.listener = logging.handlers.QueueListener(self.queue, self.target)
+            self.listener.start()
+            self.pid = os.getpid()
+            atexit.register(self.stop)
+
+    def stop(self):
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self.pid = None
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = redact_text(record.getMessage())
+        record.args = None
+
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        for key, value in redact(record_extras(record)).items():
+            setattr(record, key, value)
+        return record
+
+    def enqueue(self, record):
+        if self.pid != os.getpid():
+            self.start()
+
+        try:
+            if self.dropped:
+                # Reset only once the notice is queued, or the count is lost
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": "dropped %d log records: queue full" % self.dropped,
+                }))
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
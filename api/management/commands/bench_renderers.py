@@ -0,0 +1,77 @@
+import gzip
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+
+
+class Command(BaseCommand):
+    help = "Benchmark encoding time and payload size of the payload renderers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def payloads(self, rows):
+        now = timezone.now()
+
+        # Shape of a sync/donations response (serializer output: strings)
+        synced = [
+            {
+                "id": i,
+                "created_by_user_id": 7,
+                "donor_name": f"Donor {i}",
+                "amount": f"{101 + i}.50",
+                "whatsapp_number": "9876543210",
+                "donation_type": "Cash",
+                "received_by": "Volunteer",
+                "date": (now - timedelta(seconds=i)).isoformat().replace("+00:00", "Z"),
+                "remarks": None,
+                "created_by_name": "Volunteer",
+                "client_donation_id": f"donation-{i}",
+                "change_seq": i + 1,
+                "mandal_event": 3,
+            }
+            for i in range(rows)
+        ]
+
+        # Raw Decimal / datetime values, as in aggregate responses
+        raw = [
+            {"id": i, "amount": Decimal("101.50") + i, "date": now - timedelta(seconds=i)}
+            for i in range(rows)
+        ]
+
+        return (("sync rows", synced), ("raw decimal/datetime", raw))
+
+    def handle(self, *args, **options):
+        renderers = [("drf json", JSONRenderer())]
+        if orjson is not None:
+            renderers.append(("fast json", FastJSONRenderer()))
+        else:
+            self.stdout.write("orjson not installed: fast json falls back to drf json")
+        if msgpack is not None:
+            renderers.append(("msgpack", MessagePackRenderer()))
+        else:
+            self.stdout.write("msgpack not installed: skipping")
+
+        for label, data in self.payloads(options["rows"]):
+            self.stdout.write(f"\n{label} ({len(data)} rows)")
+
+            for name, renderer in renderers:
+                best = None
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    body = renderer.render(data)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+
+                self.stdout.write(
+                    f"  {name:<10} encode={best * 1000:8.1f}ms  "
+                    f"size={len(body) / 1024:8.1f}KiB  "
+                    f"gzip={len(gzip.compress(body)) / 1024:7.1f}KiB"
+                )
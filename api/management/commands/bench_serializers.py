@@ -0,0 +1,102 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.fast_serializers import fast_donations, fast_expenses
+from api.models import Donation, EventMaster, Expense, Mandal, MandalEvent, User
+from api.serializers import DonationSerializer, ExpenseSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the fast-path serializers against the DRF ModelSerializers "
+        "on a sync-sized payload. Seeds its own rows and rolls them back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                event = self.seed(options["rows"])
+                self.run(event, options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, rows):
+        now = timezone.now()
+        mandal = Mandal.objects.create(name=f"bench-{now.timestamp()}")
+        user = User.objects.create_user(
+            mobile=f"b{int(now.timestamp())}"[:15], password=None,
+            name="Bench", mandal=mandal, role="Manager",
+        )
+        master, _ = EventMaster.objects.get_or_create(event_name="Bench")
+        event = MandalEvent.objects.create(mandal=mandal, event=master)
+
+        Donation.objects.bulk_create([
+            Donation(
+                mandal_event=event, mandal=mandal, created_by=user,
+                created_by_name="Bench", donor_name=f"Donor {i}",
+                amount=Decimal("101.50") + i, whatsapp_number="9876543210",
+                donation_type="Cash", received_by="Bench",
+                date=now - timedelta(seconds=i, microseconds=i),
+                remarks=None if i % 3 else "Shubh",
+                client_donation_id=f"bench-d-{now.timestamp()}-{i}",
+                change_seq=i + 1,
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+        Expense.objects.bulk_create([
+            Expense(
+                mandal_event=event, mandal=mandal, created_by=user,
+                created_by_name="Bench", category="Decor",
+                amount=Decimal("49.99") + i, payment_mode="UPI", paid_to="Shop",
+                date=now - timedelta(seconds=i),
+                client_expense_id=f"bench-e-{now.timestamp()}-{i}",
+                change_seq=rows + i + 1,
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+
+        return event
+
+    def timed(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def run(self, event, repeat):
+        cases = (
+            ("donations", Donation, DonationSerializer, fast_donations),
+            ("expenses", Expense, ExpenseSerializer, fast_expenses),
+        )
+
+        for name, model, serializer_class, fast in cases:
+            qs = model.objects.filter(mandal_event=event, is_deleted=False)
+
+            drf_time, drf_data = self.timed(lambda: serializer_class(qs.all(), many=True).data, repeat)
+            fast_time, fast_data = self.timed(lambda: fast.many(qs.all()), repeat)
+
+            if [dict(row) for row in drf_data] != fast_data:
+                raise CommandError(f"{name}: fast-path output differs from {serializer_class.__name__}")
+
+            self.stdout.write(
+                f"{name:<10} rows={len(fast_data):<7} "
+                f"drf={drf_time * 1000:8.1f}ms  fast={fast_time * 1000:8.1f}ms  "
+                f"speedup={drf_time / fast_time:5.1f}x"
+            )
@@ -0,0 +1,174 @@
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from . import loadtest
+from .generate_festival_data import DEFAULT_PASSWORD
+from .loadtest import percentile
+
+# Read endpoints that have an async twin in api/async_views.py
+READ_MIX = "sync_donations=50,sync_expenses=20,sync_user=30"
+
+
+def process_tree(pid):
+    pids = [pid]
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            children = (task / "children").read_text().split()
+        except OSError:
+            continue
+        for child in children:
+            pids.extend(process_tree(int(child)))
+    return pids
+
+
+def rss_bytes(pid):
+    """Resident memory of ``pid`` and its descendants (Linux /proc)."""
+    total = 0
+    for member in process_tree(pid):
+        try:
+            status = Path(f"/proc/{member}/status").read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith("VmRSS:"):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the app under gunicorn (WSGI, sync views) and under uvicorn "
+        "(ASGI, ASYNC_READ_VIEWS=True) in turn, replay the read-heavy sync "
+        "mix against each, and report throughput and latency next to the "
+        "servers' peak memory. Size --wsgi-workers/--asgi-workers so the "
+        "memory column matches to compare concurrency at equal memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", default="wsgi,asgi")
+        parser.add_argument("--wsgi-workers", type=int, default=4)
+        parser.add_argument("--wsgi-threads", type=int, default=1)
+        parser.add_argument("--asgi-workers", type=int, default=1)
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--concurrency", type=int, default=100, help="Simultaneous virtual volunteers.")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds per mode.")
+        parser.add_argument("--mandals", type=int, default=100)
+        parser.add_argument("--users", type=int, default=15)
+        parser.add_argument("--password", default=DEFAULT_PASSWORD)
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--mix", default=READ_MIX)
+
+    def server_command(self, mode, options):
+        bind = f"127.0.0.1:{options['port']}"
+        if mode == "wsgi":
+            return [
+                sys.executable, "-m", "gunicorn", "ganeshji.wsgi",
+                "--workers", str(options["wsgi_workers"]),
+                "--threads", str(options["wsgi_threads"]),
+                "--bind", bind,
+            ], str(options["wsgi_workers"] * options["wsgi_threads"])
+        if mode == "asgi":
+            return [
+                sys.executable, "-m", "uvicorn", "ganeshji.asgi:application",
+                "--workers", str(options["asgi_workers"]),
+                "--host", "127.0.0.1", "--port", str(options["port"]),
+                "--no-access-log",
+            ], f"{options['asgi_workers']} loop(s)"
+        raise CommandError(f"Unknown mode '{mode}' (wsgi, asgi)")
+
+    def wait_ready(self, server, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"Server exited with {server.returncode}")
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            try:
+                conn.request("GET", "/api/ping/")
+                conn.getresponse().read()
+                return
+            except OSError:
+                time.sleep(0.2)
+            finally:
+                conn.close()
+        raise CommandError("Server did not come up")
+
+    def handle(self, *args, **options):
+        rows = []
+        for mode in options["modes"].split(","):
+            mode = mode.strip()
+            command, capacity = self.server_command(mode, options)
+            env = dict(os.environ, ASYNC_READ_VIEWS=str(mode == "asgi"))
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{mode}: {' '.join(command[1:])}"))
+            server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, start_new_session=True)
+            try:
+                self.wait_ready(server, options["port"])
+                rows.append((mode, capacity) + self.measure(server, options))
+            finally:
+                try:
+                    os.killpg(server.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+                server.wait(timeout=30)
+
+        self.stdout.write(
+            f"\n{'mode':<6}{'capacity':>12}{'peak MB':>9}{'req/s':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}"
+        )
+        for mode, capacity, peak, rate, p50, p95, errors in rows:
+            self.stdout.write(
+                f"{mode:<6}{capacity:>12}{peak / 2 ** 20:>9.0f}{rate:>9.1f}"
+                f"{p50 * 1000:>9.1f}{p95 * 1000:>9.1f}{errors:>8}"
+            )
+
+    def measure(self, server, options):
+        peak = [rss_bytes(server.pid)]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(0.5):
+                peak[0] = max(peak[0], rss_bytes(server.pid))
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+
+        # loadtest prints the per-endpoint table; the totals come from its results
+        load = loadtest.Command(stdout=self.stdout, stderr=self.stderr)
+        started = time.monotonic()
+        load.handle(
+            base_url=f"http://127.0.0.1:{options['port']}",
+            concurrency=options["concurrency"],
+            duration=options["duration"],
+            mandals=options["mandals"],
+            users=options["users"],
+            password=options["password"],
+            seed=1,
+            timeout=options["timeout"],
+            mix=options["mix"],
+        )
+        elapsed = time.monotonic() - started
+        done.set()
+        sampler.join()
+
+        latencies = sorted(
+            latency
+            for name, (values, _) in load.results.items() if name != "login"
+            for latency in values
+        )
+        errors = sum(errors for _, (errors,) in load.results.values())
+        return (
+            peak[0],
+            len(latencies) / elapsed,
+            percentile(latencies, 50),
+            percentile(latencies, 95),
+            errors,
+        )
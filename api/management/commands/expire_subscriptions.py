@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import MandalSubscription
+from api.notifications import collect_notifications
+from api.subscriptions import expire_due_subscriptions
+
+
+class Command(BaseCommand):
+    help = (
+        "Deactivate every active MandalSubscription past its end_date in one "
+        "set-based UPDATE. Meant to run on a schedule (e.g. every few minutes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only count the due rows.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        if options["dry_run"]:
+            due = MandalSubscription.objects.filter(is_active=True, end_date__lt=now).count()
+            self.stdout.write(f"{due} subscriptions due to expire")
+            return
+
+        with collect_notifications():
+            expired = expire_due_subscriptions(now)
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} subscriptions"))
@@ -0,0 +1,321 @@
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.ledger import rebuild_summary
+from api.models import (
+    CollectorRollup,
+    Donation,
+    EventLedgerSummary,
+    EventMaster,
+    Expense,
+    Mandal,
+    MandalEvent,
+    MandalSubscription,
+    SubscriptionPlan,
+    User,
+    WalletTransfer,
+)
+
+
+# ============================
+# NAMING (shared with loadtest)
+# ============================
+# Everything is derived from the mandal / user index, so the load test
+# can log in as generated users without reading anything back.
+MANDAL_PREFIX = "Load Mandal "
+DEFAULT_PASSWORD = "festival123"
+
+FESTIVALS = ("Ganeshotsav", "Navratri", "Diwali")
+
+FIRST_NAMES = (
+    "Aarav", "Vihaan", "Aditya", "Sai", "Arjun", "Rohan", "Omkar", "Pratik",
+    "Sneha", "Pooja", "Anjali", "Kavya", "Shruti", "Priya", "Neha", "Rutuja",
+)
+LAST_NAMES = (
+    "Patil", "Jadhav", "Pawar", "Shinde", "Kulkarni", "Deshmukh", "More",
+    "Joshi", "Chavan", "Gaikwad", "Kale", "Naik",
+)
+
+# Small amounts dominate; a few large sponsors per event
+DONATION_AMOUNTS = (11, 21, 51, 101, 151, 201, 251, 501, 1001, 2100, 5001, 11000)
+DONATION_WEIGHTS = (8, 10, 18, 22, 8, 10, 6, 8, 5, 3, 1.5, 0.5)
+DONATION_TYPES = (("Cash", 60), ("UPI", 35), ("Cheque", 5))
+
+EXPENSE_CATEGORIES = ("Decor", "Murti", "Prasad", "Sound", "Lighting", "Pandal", "Misc")
+PAYMENT_MODES = ("Cash", "UPI", "Bank")
+
+TRANSFER_STATUSES = (("Approved", 70), ("Pending", 20), ("Rejected", 10))
+
+
+def mandal_name(m):
+    return f"{MANDAL_PREFIX}{m:06d}"
+
+
+def mobile_for(m, u):
+    """Mobile of user ``u`` of mandal ``m``; user 0 is the mandal's manager."""
+    return f"6{m:06d}{u:03d}"
+
+
+def _weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights)[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate deterministic festival-scale data (mandals, users, events, "
+        "donations, expenses, wallet transfers) for load testing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mandals", type=int, default=2000)
+        parser.add_argument("--users", type=int, default=15, help="Users per mandal, manager included.")
+        parser.add_argument("--events", type=int, default=2, help="Events per mandal (max %d)." % len(FESTIVALS))
+        parser.add_argument("--donations", type=int, default=300, help="Donations per event.")
+        parser.add_argument("--expenses", type=int, default=40, help="Expenses per event.")
+        parser.add_argument("--transfers", type=int, default=20, help="Wallet transfers per event.")
+        parser.add_argument("--seed", type=int, default=2026)
+        parser.add_argument("--start", default="2026-08-27", help="First festival day (YYYY-MM-DD).")
+        parser.add_argument("--days", type=int, default=11)
+        parser.add_argument("--password", default=DEFAULT_PASSWORD)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--flush", action="store_true", help="Delete previously generated data first.")
+        parser.add_argument("--skip-summaries", action="store_true", help="Do not rebuild ledger summaries.")
+
+    def handle(self, *args, **options):
+        if not 1 <= options["events"] <= len(FESTIVALS):
+            raise CommandError(f"--events must be between 1 and {len(FESTIVALS)}")
+        if options["users"] < 1:
+            raise CommandError("--users must be at least 1")
+
+        try:
+            start = datetime.strptime(options["start"], "%Y-%m-%d")
+        except ValueError:
+            raise CommandError("--start must be YYYY-MM-DD")
+        self.start = timezone.make_aware(start, timezone.get_current_timezone())
+        self.span = options["days"] * 86400
+        self.options = options
+
+        if options["flush"]:
+            self.flush()
+        elif Mandal.objects.filter(name__startswith=MANDAL_PREFIX).exists():
+            raise CommandError("Generated data already exists; pass --flush to replace it")
+
+        began = time.monotonic()
+        self.password = make_password(options["password"], salt="festivaldata")
+        self.plan, _ = SubscriptionPlan.objects.get_or_create(
+            name="GOLD", defaults={"price": Decimal("999"), "duration_days": 365}
+        )
+        self.festivals = [
+            EventMaster.objects.get_or_create(event_name=name)[0]
+            for name in FESTIVALS[:options["events"]]
+        ]
+        self.totals = {"users": 0, "donations": 0, "expenses": 0, "transfers": 0}
+
+        event_ids = []
+        block = 100
+        for first in range(0, options["mandals"], block):
+            last = min(first + block, options["mandals"])
+            event_ids += self.generate_block(first, last)
+            self.stdout.write(
+                f"mandals {last}/{options['mandals']}  "
+                + "  ".join(f"{k}={v}" for k, v in self.totals.items())
+            )
+
+        if not options["skip_summaries"]:
+            for i, event_id in enumerate(event_ids, 1):
+                rebuild_summary(event_id)
+                if i % 500 == 0:
+                    self.stdout.write(f"summaries {i}/{len(event_ids)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['mandals']} mandals, {len(event_ids)} events, "
+            + ", ".join(f"{v} {k}" for k, v in self.totals.items())
+            + f" in {time.monotonic() - began:.0f}s"
+        ))
+
+    def flush(self):
+        mandals = Mandal.objects.filter(name__startswith=MANDAL_PREFIX)
+        # Leaf tables first, so each delete is a plain DELETE ... WHERE
+        for model in (WalletTransfer, Donation, Expense, CollectorRollup):
+            model.objects.filter(mandal_event__mandal__in=mandals).delete()
+        EventLedgerSummary.objects.filter(mandal_event__mandal__in=mandals).delete()
+        MandalSubscription.objects.filter(mandal__in=mandals).delete()
+        MandalEvent.objects.filter(mandal__in=mandals).delete()
+        User.objects.filter(mandal__in=mandals).delete()
+        deleted, _ = mandals.delete()
+        self.stdout.write(f"Flushed {deleted} generated mandals")
+
+    # -------- generation --------
+    def generate_block(self, first, last):
+        """Create mandals ``first``..``last - 1`` with everything under them; returns event ids."""
+        options = self.options
+
+        with transaction.atomic():
+            Mandal.objects.bulk_create([
+                Mandal(name=mandal_name(m), city="Pune", state="Maharashtra")
+                for m in range(first, last)
+            ])
+            mandal_ids = dict(
+                Mandal.objects.filter(name__in=[mandal_name(m) for m in range(first, last)])
+                .values_list("name", "id")
+            )
+
+            User.objects.bulk_create([
+                User(
+                    mandal_id=mandal_ids[mandal_name(m)],
+                    mobile=mobile_for(m, u),
+                    name=self.person(random.Random(f"{options['seed']}-user-{m}-{u}")),
+                    role="Manager" if u == 0 else "User",
+                    password=self.password,
+                    is_paid=True,
+                    is_demo_user=False,
+                )
+                for m in range(first, last)
+                for u in range(options["users"])
+            ], batch_size=options["batch_size"])
+            users = {}
+            for user_id, mandal_id, mobile, name in User.objects.filter(
+                mandal_id__in=mandal_ids.values()
+            ).values_list("id", "mandal_id", "mobile", "name"):
+                users.setdefault(mandal_id, []).append((mobile, user_id, name))
+            self.totals["users"] += (last - first) * options["users"]
+
+            MandalSubscription.objects.bulk_create([
+                MandalSubscription(
+                    mandal_id=mandal_id, plan=self.plan,
+                    start_date=self.start - timedelta(days=30),
+                    end_date=self.start + timedelta(days=335),
+                    payment_transaction_id=f"gen-pay-{name}",
+                )
+                for name, mandal_id in mandal_ids.items()
+            ])
+
+            MandalEvent.objects.bulk_create([
+                MandalEvent(mandal_id=mandal_id, event=festival)
+                for mandal_id in mandal_ids.values()
+                for festival in self.festivals
+            ])
+            events = {
+                (mandal_id, event_id): pk
+                for pk, mandal_id, event_id in MandalEvent.objects.filter(
+                    mandal_id__in=mandal_ids.values()
+                ).values_list("id", "mandal_id", "event_id")
+            }
+
+            buffers = {Donation: [], Expense: [], WalletTransfer: []}
+            seqs = {}
+            # user id -> [wallet_balance, total_transferred] from approved transfers
+            wallets = defaultdict(lambda: [Decimal(0), Decimal(0)])
+
+            for m in range(first, last):
+                mandal_id = mandal_ids[mandal_name(m)]
+                members = [(uid, name) for _, uid, name in sorted(users[mandal_id])]
+
+                for e, festival in enumerate(self.festivals):
+                    rng = random.Random(f"{options['seed']}-{m}-{e}")
+                    event_id = events[(mandal_id, festival.id)]
+                    seqs[event_id] = self.fill_event(rng, m, e, mandal_id, event_id, members, buffers, wallets)
+
+                    for model, rows in buffers.items():
+                        if len(rows) >= options["batch_size"]:
+                            model.objects.bulk_create(rows, batch_size=options["batch_size"])
+                            rows.clear()
+
+            for model, rows in buffers.items():
+                model.objects.bulk_create(rows, batch_size=options["batch_size"])
+
+            for event_id, seq in seqs.items():
+                MandalEvent.objects.filter(pk=event_id).update(change_seq=seq)
+
+            # The stored balances settle_transfers would have left behind
+            User.objects.bulk_update([
+                User(id=user_id, wallet_balance=balance, total_transferred=sent)
+                for user_id, (balance, sent) in wallets.items()
+            ], ["wallet_balance", "total_transferred"], batch_size=options["batch_size"])
+
+        return list(seqs)
+
+    def person(self, rng):
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    def moment(self, rng):
+        return self.start + timedelta(seconds=rng.randrange(self.span))
+
+    def fill_event(self, rng, m, e, mandal_id, event_id, members, buffers, wallets):
+        """
+        Queue one event's rows into ``buffers`` and its approved transfers'
+        balance changes into ``wallets``; returns the event's last change_seq.
+        """
+        options = self.options
+        manager_id, manager_name = members[0]
+        seq = 0
+
+        # Ascending dates, so change_seq order matches what live traffic produces
+        dates = sorted(self.moment(rng) for _ in range(options["donations"]))
+        for i, date in enumerate(dates):
+            user_id, user_name = rng.choice(members)
+            seq += 1
+            buffers[Donation].append(Donation(
+                mandal_event_id=event_id, mandal_id=mandal_id,
+                created_by_id=user_id, created_by_name=user_name,
+                donor_name=self.person(rng),
+                amount=Decimal(rng.choices(DONATION_AMOUNTS, DONATION_WEIGHTS)[0]),
+                whatsapp_number=f"9{rng.randrange(10 ** 9):09d}",
+                donation_type=_weighted(rng, DONATION_TYPES),
+                received_by=user_name,
+                date=date,
+                remarks=None if rng.random() < 0.8 else "Shubh Ganesh",
+                client_donation_id=f"gen-d-{m}-{e}-{i}",
+                is_deleted=rng.random() < 0.01,
+                change_seq=seq,
+            ))
+
+        dates = sorted(self.moment(rng) for _ in range(options["expenses"]))
+        for i, date in enumerate(dates):
+            seq += 1
+            buffers[Expense].append(Expense(
+                mandal_event_id=event_id, mandal_id=mandal_id,
+                created_by_id=manager_id, created_by_name=manager_name,
+                category=rng.choice(EXPENSE_CATEGORIES),
+                amount=Decimal(rng.randrange(200, 25000)),
+                payment_mode=rng.choice(PAYMENT_MODES),
+                paid_to=self.person(rng),
+                date=date,
+                client_expense_id=f"gen-e-{m}-{e}-{i}",
+                change_seq=seq,
+            ))
+
+        volunteers = members[1:] or members
+        for i in range(options["transfers"]):
+            status = _weighted(rng, TRANSFER_STATUSES)
+            requested_at = self.moment(rng)
+            from_user_id = rng.choice(volunteers)[0]
+            amount = Decimal(rng.randrange(5, 100) * 100)
+            if status == "Approved":
+                wallets[from_user_id][0] -= amount
+                wallets[from_user_id][1] += amount
+                wallets[manager_id][0] += amount
+
+            buffers[WalletTransfer].append(WalletTransfer(
+                from_user_id=from_user_id, to_manager_id=manager_id,
+                mandal_id=mandal_id, mandal_event_id=event_id,
+                amount=amount,
+                status=status,
+                client_wallet_transfer_id=f"gen-w-{m}-{e}-{i}",
+                requested_at=requested_at,
+                approved_at=requested_at + timedelta(hours=2) if status == "Approved" else None,
+            ))
+
+        self.totals["donations"] += options["donations"]
+        self.totals["expenses"] += options["expenses"]
+        self.totals["transfers"] += options["transfers"]
+        return seq
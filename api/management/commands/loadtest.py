@@ -0,0 +1,246 @@
+import gzip
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .generate_festival_data import DEFAULT_PASSWORD, mobile_for
+
+
+# ============================
+# CALL MIX
+# ============================
+# Roughly what the app does during collection hours: mostly delta syncs
+# and new donations, some dashboard refreshes, the odd re-login.
+DEFAULT_MIX = {
+    "sync_donations": 35,
+    "create_donation": 25,
+    "dashboard": 15,
+    "sync_expenses": 10,
+    "sync_user": 10,
+    "login": 5,
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Client:
+    """One volunteer's phone: a keep-alive connection, a token and sync cursors."""
+    def __init__(self, base_url, mobile, password, rng, timeout):
+        url = urlsplit(base_url)
+        conn_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self.conn = conn_class(url.hostname, url.port, timeout=timeout)
+        self.prefix = url.path.rstrip("/")
+
+        self.mobile = mobile
+        self.password = password
+        self.rng = rng
+        self.token = None
+        self.event_id = None
+        self.cursors = {"donations": 0, "expenses": 0}
+
+    def request(self, method, path, body=None):
+        headers = {"Accept-Encoding": "gzip", "Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = json.dumps(body).encode() if body is not None else None
+
+        try:
+            self.conn.request(method, self.prefix + path, payload, headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()  # reconnects on the next request
+            raise
+
+        if response.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        return response.status, data
+
+    def json(self, data):
+        try:
+            return json.loads(data)
+        except ValueError:
+            return {}
+
+    # -------- calls (return the HTTP status) --------
+    def login(self):
+        self.token = None
+        status, data = self.request("POST", "/api/login/", {"mobile": self.mobile, "password": self.password})
+        if status == 200:
+            self.token = self.json(data).get("access")
+        return status
+
+    def pick_event(self):
+        status, data = self.request("GET", "/api/my-events/")
+        events = self.json(data) if status == 200 else []
+        if events:
+            self.event_id = self.rng.choice(events)["id"]
+        return status
+
+    def sync(self, section):
+        status, data = self.request(
+            "GET", f"/api/sync/{section}/?event_id={self.event_id}&since={self.cursors[section]}"
+        )
+        if status == 200:
+            self.cursors[section] = self.json(data).get("cursor", self.cursors[section])
+        return status
+
+    def sync_donations(self):
+        return self.sync("donations")
+
+    def sync_expenses(self):
+        return self.sync("expenses")
+
+    def sync_user(self):
+        return self.request("GET", "/api/sync/user/")[0]
+
+    def dashboard(self):
+        return self.request("GET", f"/api/dashboard/summary/?event_id={self.event_id}")[0]
+
+    def create_donation(self):
+        rng = self.rng
+        return self.request("POST", "/api/donations/create/", {
+            "mandal_event": self.event_id,
+            "donor_name": f"Load Donor {rng.randrange(10000)}",
+            "amount": str(rng.choice((11, 21, 51, 101, 251, 501))),
+            "whatsapp_number": f"9{rng.randrange(10 ** 9):09d}",
+            "donation_type": rng.choice(("Cash", "UPI")),
+            "received_by": "Load Test",
+            "created_by_name": "Load Test",
+            "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "client_donation_id": f"lt-{uuid.UUID(int=rng.getrandbits(128)).hex}",
+        })[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the app's call mix (login, sync, create_donation, dashboard) "
+        "against a running server as users from generate_festival_data, and "
+        "report throughput and p50/p95/p99 latency per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", type=int, default=20, help="Simultaneous virtual volunteers.")
+        parser.add_argument("--duration", type=float, default=60, help="Seconds to run.")
+        parser.add_argument("--mandals", type=int, default=100, help="Generated mandals to draw users from.")
+        parser.add_argument("--users", type=int, default=15, help="Users per generated mandal.")
+        parser.add_argument("--password", default=DEFAULT_PASSWORD)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument(
+            "--mix",
+            help="Call weights, e.g. 'sync_donations=35,create_donation=25,dashboard=15' "
+                 "(names: %s)." % ", ".join(DEFAULT_MIX),
+        )
+
+    def parse_mix(self, value):
+        if not value:
+            return dict(DEFAULT_MIX)
+
+        mix = {}
+        for part in value.split(","):
+            name, _, weight = part.partition("=")
+            name = name.strip()
+            if name not in DEFAULT_MIX:
+                raise CommandError(f"Unknown call '{name}' in --mix")
+            try:
+                mix[name] = float(weight)
+            except ValueError:
+                raise CommandError(f"Bad weight for '{name}' in --mix")
+        return mix
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options["mix"])
+        self.results = {}
+        self.lock = threading.Lock()
+        self.deadline = time.monotonic() + options["duration"]
+
+        threads = [
+            threading.Thread(target=self.volunteer, args=(i, mix, options), daemon=True)
+            for i in range(options["concurrency"])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.report(time.monotonic() - started)
+
+    def record(self, name, elapsed, ok):
+        with self.lock:
+            latencies, errors = self.results.setdefault(name, ([], [0]))
+            latencies.append(elapsed)
+            if not ok:
+                errors[0] += 1
+
+    def timed(self, name, call):
+        start = time.perf_counter()
+        try:
+            status = call()
+        except (OSError, http.client.HTTPException):
+            status = None
+        self.record(name, time.perf_counter() - start, status is not None and status < 400)
+        return status
+
+    def volunteer(self, index, mix, options):
+        rng = random.Random(f"{options['seed']}-{index}")
+        m = rng.randrange(options["mandals"])
+        u = rng.randrange(options["users"])
+        client = Client(options["base_url"], mobile_for(m, u), options["password"], rng, options["timeout"])
+
+        names, weights = zip(*mix.items())
+        while time.monotonic() < self.deadline:
+            if client.token is None:
+                if self.timed("login", client.login) != 200:
+                    time.sleep(1)
+                    continue
+                self.timed("my_events", client.pick_event)
+                if client.event_id is None:
+                    time.sleep(1)
+                    continue
+
+            name = rng.choices(names, weights)[0]
+            self.timed(name, getattr(client, name))
+
+    def report(self, elapsed):
+        if not self.results:
+            self.stdout.write(self.style.WARNING("No requests completed"))
+            return
+
+        self.stdout.write(
+            f"{'endpoint':<16}{'count':>8}{'errors':>8}{'req/s':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        )
+
+        total = failed = 0
+        for name in sorted(self.results):
+            latencies, (errors,) = self.results[name]
+            latencies.sort()
+            total += len(latencies)
+            failed += errors
+            self.stdout.write(
+                f"{name:<16}{len(latencies):>8}{errors:>8}{len(latencies) / elapsed:>9.1f}"
+                + "".join(
+                    f"{percentile(latencies, pct) * 1000:>9.1f}" for pct in (50, 95, 99)
+                )
+                + f"{latencies[-1] * 1000:>9.1f}"
+            )
+
+        self.stdout.write(
+            f"\n{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s, "
+            f"{failed} errors ({failed / total:.1%})"
+        )
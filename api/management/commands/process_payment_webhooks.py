@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.notifications import collect_notifications
+from api.webhooks import process_pending_webhooks
+
+
+class Command(BaseCommand):
+    help = (
+        "Activate subscriptions for queued payment webhook deliveries. Runs "
+        "until stopped, polling every --interval seconds (failed deliveries are "
+        "retried once per poll); --once drains the queue and exits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain pending deliveries and exit.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between polls when idle.")
+        parser.add_argument("--batch", type=int, default=None, help="Deliveries per pass.")
+
+    def handle(self, *args, **options):
+        while True:
+            with collect_notifications():
+                counts = process_pending_webhooks(options["batch"])
+            if counts:
+                self.stdout.write(", ".join(f"{status}: {n}" for status, n in sorted(counts.items())))
+
+            # Failures stay pending for the next pass; only keep going
+            # straight away while deliveries are being processed
+            if counts.get("processed"):
+                continue
+            if options["once"]:
+                self.stdout.write(self.style.SUCCESS("Webhook queue drained"))
+                return
+            time.sleep(options["interval"])
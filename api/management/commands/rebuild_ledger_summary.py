@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.ledger import rebuild_summary
+from api.models import MandalEvent
+
+
+class Command(BaseCommand):
+    help = "Recompute EventLedgerSummary and CollectorRollup rows from the raw donation / expense rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--event",
+            type=int,
+            action="append",
+            dest="events",
+            help="MandalEvent id to rebuild (repeatable). Defaults to every event.",
+        )
+
+    def handle(self, *args, **options):
+        event_ids = options["events"] or MandalEvent.objects.order_by("id").values_list("id", flat=True)
+
+        rebuilt = 0
+        for event_id in event_ids:
+            summary = rebuild_summary(event_id)
+            rebuilt += 1
+            self.stdout.write(
+                f"event {event_id}: collection={summary.total_collection} "
+                f"expense={summary.total_expense} "
+                f"donations={summary.donation_count} expenses={summary.expense_count}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} ledger summaries"))
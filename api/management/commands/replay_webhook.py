@@ -0,0 +1,116 @@
+import http.client
+import json
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.payments import sign_webhook
+
+from .loadtest import percentile
+
+
+def captured_payment(mandal_id, payment_id, order_id, amount):
+    """A payment.captured delivery shaped like Razorpay's."""
+    return {
+        "entity": "event",
+        "event": "payment.captured",
+        "contains": ["payment"],
+        "payload": {
+            "payment": {
+                "entity": {
+                    "id": payment_id,
+                    "entity": "payment",
+                    "amount": amount,
+                    "currency": "INR",
+                    "status": "captured",
+                    "order_id": order_id,
+                    "method": "upi",
+                    "vpa": "replay@upi",
+                    "notes": {"mandal_id": str(mandal_id)},
+                },
+            },
+        },
+        "created_at": int(time.time()),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Send a signed payment webhook to a running server, optionally many "
+        "times over concurrently, as the gateway does when it retries a "
+        "delivery. Prints status counts and latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000/api/payments/webhook/")
+        parser.add_argument("--mandal", type=int, help="Mandal to activate (builds a payment.captured delivery).")
+        parser.add_argument("--payment-id", default=None)
+        parser.add_argument("--order-id", default=None)
+        parser.add_argument("--amount", type=int, default=99900)
+        parser.add_argument("--file", help="Replay this raw delivery body instead.")
+        parser.add_argument("--repeat", type=int, default=1, help="Deliveries to send in total.")
+        parser.add_argument("--concurrency", type=int, default=1)
+        parser.add_argument("--timeout", type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        if options["file"]:
+            with open(options["file"], "rb") as f:
+                body = f.read()
+        elif options["mandal"]:
+            body = json.dumps(captured_payment(
+                options["mandal"],
+                options["payment_id"] or f"pay_replay_{uuid.uuid4().hex[:14]}",
+                options["order_id"] or f"order_replay_{uuid.uuid4().hex[:14]}",
+                options["amount"],
+            )).encode()
+        else:
+            raise CommandError("Give --mandal or --file")
+
+        headers = {"Content-Type": "application/json", "X-Razorpay-Signature": sign_webhook(body)}
+        url = urlsplit(options["url"])
+        conn_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+
+        lock = threading.Lock()
+        remaining = [options["repeat"]]
+        statuses = {}
+        latencies = []
+
+        def worker():
+            conn = conn_class(url.hostname, url.port, timeout=options["timeout"])
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+
+                started = time.perf_counter()
+                try:
+                    conn.request("POST", url.path, body, headers)
+                    response = conn.getresponse()
+                    response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    status = "error"
+                elapsed = (time.perf_counter() - started) * 1000
+
+                with lock:
+                    statuses[status] = statuses.get(status, 0) + 1
+                    latencies.append(elapsed)
+            conn.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(max(1, options["concurrency"]))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        latencies.sort()
+        self.stdout.write(f"statuses: {dict(sorted(statuses.items(), key=str))}")
+        self.stdout.write(
+            f"latency ms: p50 {percentile(latencies, 50):.1f}  "
+            f"p95 {percentile(latencies, 95):.1f}  p99 {percentile(latencies, 99):.1f}"
+        )
@@ -0,0 +1,91 @@
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from api import jobs, metrics
+
+DEFAULT_CONCURRENCY = 4
+HOUSEKEEPING_INTERVAL = 30
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs (api/jobs.py) from the Job table: claims due jobs "
+        "with SELECT ... FOR UPDATE SKIP LOCKED, runs up to --concurrency at "
+        "once, retries failures with backoff and enqueues the periodic ones. "
+        "Start as many as needed; stops cleanly on SIGTERM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=None,
+            help=f"Jobs run at once by this worker (JOB_WORKER_CONCURRENCY, default {DEFAULT_CONCURRENCY}).",
+        )
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between polls when idle.")
+        parser.add_argument("--once", action="store_true", help="Run the jobs due now and exit.")
+        parser.add_argument("--no-schedule", action="store_true", help="Do not enqueue periodic jobs.")
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"] or getattr(settings, "JOB_WORKER_CONCURRENCY", DEFAULT_CONCURRENCY)
+        worker = jobs.worker_name()
+        metrics.start()
+
+        stopping = threading.Event()
+        if not options["once"]:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, lambda *_: stopping.set())
+
+        self.stdout.write(f"{worker}: running jobs ({', '.join(sorted(jobs.handlers))}), {concurrency} at a time")
+
+        running = set()
+        next_housekeeping = 0
+        with ThreadPoolExecutor(concurrency, thread_name_prefix="job") as executor:
+            while not stopping.is_set():
+                close_old_connections()
+
+                if time.monotonic() >= next_housekeeping:
+                    self.housekeeping(options)
+                    next_housekeeping = time.monotonic() + HOUSEKEEPING_INTERVAL
+
+                claimed = jobs.claim(worker, concurrency - len(running)) if len(running) < concurrency else []
+                for job in claimed:
+                    running.add(executor.submit(self.run_job, job))
+
+                if options["once"] and not running:
+                    break
+
+                # Straight back to claiming while there is work and a free slot
+                timeout = 0 if claimed and len(running) < concurrency else options["interval"]
+                if running:
+                    finished, running = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        future.result()
+                elif timeout:
+                    stopping.wait(timeout)
+
+            if running:
+                self.stdout.write(f"Waiting for {len(running)} running job(s)")
+                wait(running)
+
+        self.stdout.write(self.style.SUCCESS("Job worker stopped"))
+
+    def housekeeping(self, options):
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"Requeued {requeued} stale job(s)"))
+        if not options["no_schedule"]:
+            jobs.schedule()
+        jobs.purge_finished()
+
+    def run_job(self, job):
+        try:
+            outcome = jobs.run(job)
+            self.stdout.write(f"{job.name} #{job.id}: {outcome}")
+        finally:
+            # Each pool thread has its own connection
+            connections.close_all()
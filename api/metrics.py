@@ -0,0 +1,296 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+
+# ============================
+# REQUEST METRICS
+# ============================
+# Per-process counters, updated in place under a lock. With METRICS_DIR
+# set, every worker also writes its totals to METRICS_DIR/<pid>.json
+# (at most every METRICS_FLUSH_INTERVAL seconds and at exit), and
+# /metrics adds up all the files, so the numbers are right whichever
+# gunicorn worker answers the scrape.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Background jobs (run_jobs worker) run far longer than requests
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+DEFAULT_FLUSH_INTERVAL = 5
+
+
+def metrics_dir():
+    return getattr(settings, "METRICS_DIR", None)
+
+
+def flush_interval():
+    return getattr(settings, "METRICS_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.reset()
+
+    def reset(self):
+        # (route, method, status) -> count
+        self.requests = {}
+        # (route, method) -> [bucket counts..., +Inf count, sum]
+        self.latency = {}
+        # (route, method) -> [seconds, queries]
+        self.db = {}
+        # (route, method) -> [seconds, renders]
+        self.render = {}
+        # (job name, outcome) -> count
+        self.jobs = {}
+        # job name -> [bucket counts..., +Inf count, sum]
+        self.job_latency = {}
+
+    def observe(self, route, method, status, duration, db_seconds=0.0, db_queries=0, render_seconds=None):
+        key = (route, method)
+        bucket = bisect_left(LATENCY_BUCKETS, duration)
+
+        with self.lock:
+            status_key = (route, method, status)
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+
+            latency = self.latency.get(key)
+            if latency is None:
+                latency = self.latency[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            latency[bucket] += 1
+            latency[-1] += duration
+
+            db = self.db.setdefault(key, [0.0, 0])
+            db[0] += db_seconds
+            db[1] += db_queries
+
+            if render_seconds is not None:
+                render = self.render.setdefault(key, [0.0, 0])
+                render[0] += render_seconds
+                render[1] += 1
+
+        self.maybe_flush()
+
+    def observe_job(self, name, outcome, duration):
+        bucket = bisect_left(JOB_BUCKETS, duration)
+
+        with self.lock:
+            key = (name, outcome)
+            self.jobs[key] = self.jobs.get(key, 0) + 1
+
+            latency = self.job_latency.get(name)
+            if latency is None:
+                latency = self.job_latency[name] = [0] * (len(JOB_BUCKETS) + 1) + [0.0]
+            latency[bucket] += 1
+            latency[-1] += duration
+
+        self.maybe_flush()
+
+    # -------- snapshots / multi-process --------
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": [[*k, v] for k, v in self.requests.items()],
+                "latency": [[*k, list(v)] for k, v in self.latency.items()],
+                "db": [[*k, list(v)] for k, v in self.db.items()],
+                "render": [[*k, list(v)] for k, v in self.render.items()],
+                "jobs": [[*k, v] for k, v in self.jobs.items()],
+                "job_latency": [[k, list(v)] for k, v in self.job_latency.items()],
+            }
+
+    def load(self, snapshot):
+        """Add a snapshot's totals into this registry."""
+        with self.lock:
+            for *key, value in snapshot.get("requests", ()):
+                key = tuple(key)
+                self.requests[key] = self.requests.get(key, 0) + value
+
+            for name in ("latency", "db", "render"):
+                table = getattr(self, name)
+                for route, method, values in snapshot.get(name, ()):
+                    current = table.get((route, method))
+                    if current is None:
+                        table[(route, method)] = list(values)
+                    else:
+                        for i, value in enumerate(values):
+                            current[i] += value
+
+            for *key, value in snapshot.get("jobs", ()):
+                key = tuple(key)
+                self.jobs[key] = self.jobs.get(key, 0) + value
+
+            for name, values in snapshot.get("job_latency", ()):
+                current = self.job_latency.get(name)
+                if current is None:
+                    self.job_latency[name] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        current[i] += value
+
+    def _path(self, directory):
+        return os.path.join(directory, f"{os.getpid()}.json")
+
+    def maybe_flush(self):
+        if metrics_dir() and time.monotonic() - self.last_flush >= flush_interval():
+            self.flush()
+
+    def flush(self):
+        directory = metrics_dir()
+        if not directory:
+            return
+
+        self.last_flush = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, self._path(directory))
+
+
+registry = Registry()
+_started = False
+_start_lock = threading.Lock()
+
+
+def start():
+    """
+    Pick up the file a previous process with this pid left behind (so its
+    counters keep counting up) and flush at exit. Called on the first
+    observed request, i.e. after gunicorn has forked the worker.
+    """
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+        directory = metrics_dir()
+        if not directory:
+            return
+
+        try:
+            with open(registry._path(directory)) as f:
+                registry.load(json.load(f))
+        except (OSError, ValueError):
+            pass
+        atexit.register(registry.flush)
+
+
+def collect():
+    """Registry with the totals of every worker (just this one without METRICS_DIR)."""
+    directory = metrics_dir()
+    if not directory:
+        return registry
+
+    registry.flush()
+    total = Registry()
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                total.load(json.load(f))
+        except (OSError, ValueError):
+            continue  # a worker is mid-write; it is picked up on the next scrape
+    return total
+
+
+# ============================
+# PROMETHEUS TEXT FORMAT
+# ============================
+def _labels(**labels):
+    pairs = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def _le(bound):
+    return "+Inf" if bound is None else repr(bound)
+
+
+def render_prometheus(reg):
+    lines = []
+
+    lines.append("# HELP http_requests_total Requests handled, by route, method and status.")
+    lines.append("# TYPE http_requests_total counter")
+    for (route, method, code), count in sorted(reg.requests.items()):
+        lines.append(f"http_requests_total{_labels(route=route, method=method, status=code)} {count}")
+
+    lines.append("# HELP http_request_duration_seconds Time to produce the response.")
+    lines.append("# TYPE http_request_duration_seconds histogram")
+    for (route, method), values in sorted(reg.latency.items()):
+        cumulative = 0
+        for bound, count in zip((*LATENCY_BUCKETS, None), values[:-1]):
+            cumulative += count
+            labels = _labels(route=route, method=method, le=_le(bound))
+            lines.append(f"http_request_duration_seconds_bucket{labels} {cumulative}")
+        labels = _labels(route=route, method=method)
+        lines.append(f"http_request_duration_seconds_sum{labels} {values[-1]}")
+        lines.append(f"http_request_duration_seconds_count{labels} {cumulative}")
+
+    lines.append("# HELP http_request_db_seconds_total Time spent in database queries.")
+    lines.append("# TYPE http_request_db_seconds_total counter")
+    for (route, method), (seconds, _) in sorted(reg.db.items()):
+        lines.append(f"http_request_db_seconds_total{_labels(route=route, method=method)} {seconds}")
+
+    lines.append("# HELP http_request_db_queries_total Database queries run.")
+    lines.append("# TYPE http_request_db_queries_total counter")
+    for (route, method), (_, queries) in sorted(reg.db.items()):
+        lines.append(f"http_request_db_queries_total{_labels(route=route, method=method)} {queries}")
+
+    lines.append("# HELP http_response_render_seconds_total Time spent rendering (serializing) response bodies.")
+    lines.append("# TYPE http_response_render_seconds_total counter")
+    for (route, method), (seconds, _) in sorted(reg.render.items()):
+        lines.append(f"http_response_render_seconds_total{_labels(route=route, method=method)} {seconds}")
+
+    lines.append("# HELP http_response_renders_total Response bodies rendered.")
+    lines.append("# TYPE http_response_renders_total counter")
+    for (route, method), (_, renders) in sorted(reg.render.items()):
+        lines.append(f"http_response_renders_total{_labels(route=route, method=method)} {renders}")
+
+    lines.append("# HELP job_runs_total Background job runs, by job name and outcome.")
+    lines.append("# TYPE job_runs_total counter")
+    for (name, outcome), count in sorted(reg.jobs.items()):
+        lines.append(f"job_runs_total{_labels(job=name, outcome=outcome)} {count}")
+
+    lines.append("# HELP job_duration_seconds Time a background job run took.")
+    lines.append("# TYPE job_duration_seconds histogram")
+    for name, values in sorted(reg.job_latency.items()):
+        cumulative = 0
+        for bound, count in zip((*JOB_BUCKETS, None), values[:-1]):
+            cumulative += count
+            lines.append(f"job_duration_seconds_bucket{_labels(job=name, le=_le(bound))} {cumulative}")
+        lines.append(f"job_duration_seconds_sum{_labels(job=name)} {values[-1]}")
+        lines.append(f"job_duration_seconds_count{_labels(job=name)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; needs ``Authorization: Bearer
+    <METRICS_TOKEN>``, and does not exist (404) until METRICS_TOKEN is set.
+    """
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if not token:
+        return HttpResponse(status=404)
+    if not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+
+    return HttpResponse(
+        render_prometheus(collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,379 @@
+import logging
+import re
+import time
+import uuid
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+from . import metrics
+from .log import request_id_var
+from .notifications import acollect_notifications, collect_notifications
+from .queries import acount_queries, count_queries, get_query_budget
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+query_logger = logging.getLogger("api.queries")
+
+
+# ============================
+# RESPONSE COMPRESSION
+# ============================
+DEFAULT_COMPRESSION_MIN_SIZE = 512
+
+# Event streams must reach the client as soon as they are written
+SKIP_CONTENT_TYPES = ("text/event-stream",)
+
+
+def _accepted_encodings(header):
+    """``{"gzip": 1.0, "br": 0.5, ...}`` from an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = _accepted_encodings(header)
+
+    def allowed(name):
+        return accepted.get(name, accepted.get("*", 0)) > 0
+
+    if brotli is not None and allowed("br"):
+        return "br"
+    if allowed("gzip"):
+        return "gzip"
+    return None
+
+
+class _StreamCompressor:
+    """Compress one chunk at a time, flushing so each chunk is decodable on arrival."""
+    def __init__(self, encoding):
+        if encoding == "br":
+            self.compressor = brotli.Compressor()
+            self.compress = lambda chunk: self.compressor.process(chunk) + self.compressor.flush()
+            self.finish = self.compressor.finish
+        else:
+            self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            self.compress = lambda chunk: (
+                self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            )
+            self.finish = self.compressor.flush
+
+
+def _as_bytes(chunk):
+    return chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def compress_stream(encoding, chunks):
+    stream = _StreamCompressor(encoding)
+    for chunk in chunks:
+        data = stream.compress(_as_bytes(chunk))
+        if data:
+            yield data
+    yield stream.finish()
+
+
+async def acompress_stream(encoding, chunks):
+    stream = _StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = stream.compress(_as_bytes(chunk))
+        if data:
+            yield data
+    yield stream.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    GZipMiddleware with brotli (when the ``brotli`` package is installed),
+    a ``COMPRESSION_MIN_SIZE`` threshold, and chunk-by-chunk compression of
+    streaming responses so streamed sync listings are never buffered.
+    """
+    max_random_bytes = 100
+
+    def process_response(self, request, response):
+        min_size = getattr(settings, "COMPRESSION_MIN_SIZE", DEFAULT_COMPRESSION_MIN_SIZE)
+
+        if not response.streaming and len(response.content) < min_size:
+            return response
+
+        if response.has_header("Content-Encoding"):
+            return response
+
+        if response.get("Content-Type", "").startswith(SKIP_CONTENT_TYPES):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            # Bind the current iterator before replacing it
+            original = response.streaming_content
+            if response.is_async:
+                response.streaming_content = acompress_stream(encoding, original)
+            else:
+                response.streaming_content = compress_stream(encoding, original)
+            del response.headers["Content-Length"]
+        else:
+            if encoding == "br":
+                compressed = brotli.compress(response.content)
+            else:
+                compressed = compress_string(
+                    response.content,
+                    max_random_bytes=self.max_random_bytes,
+                )
+
+            if len(compressed) >= len(response.content):
+                return response
+
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # A strong ETag names exact bytes; the compressed body needs a weak one
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+
+        return response
+
+
+# ============================
+# QUERY BUDGET / N+1 REPORTING
+# ============================
+class QueryCountMiddleware:
+    """
+    Counts the queries and DB time of every request and looks for the same
+    query shape repeated (an N+1), and for views going over the budget they
+    declared with ``@query_budget``.
+
+    With DEBUG on the numbers go out as ``X-Query-*`` response headers;
+    otherwise only offending requests are logged to ``api.queries``.
+    Queries run while a streaming body is consumed are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        request.query_budget = None
+
+        with count_queries() as stats:
+            request.query_stats = stats
+            response = self.get_response(request)
+
+        return self.report(request, stats, response)
+
+    async def __acall__(self, request):
+        request.query_budget = None
+
+        async with acount_queries() as stats:
+            request.query_stats = stats
+            response = await self.get_response(request)
+
+        return self.report(request, stats, response)
+
+    def report(self, request, stats, response):
+        budget = request.query_budget
+        repeated = stats.repeated()
+        over_budget = budget is not None and stats.count > budget
+
+        if settings.DEBUG:
+            response.headers["X-Query-Count"] = str(stats.count)
+            response.headers["X-Query-Time-Ms"] = str(stats.duration_ms)
+            if budget is not None:
+                response.headers["X-Query-Budget"] = str(budget)
+            if repeated:
+                response.headers["X-Query-Repeats"] = "; ".join(
+                    f"{count}x {shape[:120]}" for shape, count in repeated[:3]
+                )
+        elif over_budget or repeated:
+            query_logger.warning(
+                "%s %s ran %d queries in %.2fms (budget %s), repeated: %s",
+                request.method,
+                request.path,
+                stats.count,
+                stats.duration_ms,
+                budget,
+                [(count, shape) for shape, count in repeated],
+            )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
+
+
+# ============================
+# REQUEST METRICS
+# ============================
+class MetricsMiddleware:
+    """
+    Records count, latency, status, DB time (from QueryCountMiddleware) and
+    render time per route into ``api.metrics``. Routes are the URL patterns
+    (``api/collections/user/<int:user_id>/``), not raw paths, so the label
+    set stays small.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics.start()
+        request.render_seconds = None
+        start = time.perf_counter()
+
+        response = self.get_response(request)
+        return self.observe(request, response, start)
+
+    async def __acall__(self, request):
+        metrics.start()
+        request.render_seconds = None
+        start = time.perf_counter()
+
+        response = await self.get_response(request)
+        return self.observe(request, response, start)
+
+    def observe(self, request, response, start):
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        stats = getattr(request, "query_stats", None)
+
+        metrics.registry.observe(
+            match.route if match else "unmatched",
+            request.method,
+            response.status_code,
+            duration,
+            db_seconds=stats.duration if stats else 0.0,
+            db_queries=stats.count if stats else 0,
+            render_seconds=request.render_seconds,
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF Responses are rendered right after this hook
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.render_seconds = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+# ============================
+# REQUEST IDS
+# ============================
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class RequestIdMiddleware:
+    """
+    Takes the caller's ``X-Request-ID`` (if it looks sane) or makes one,
+    exposes it to every log line of the request (``api.log``) and echoes
+    it back.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = request_id_var.set(self.request_id(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+
+        response.headers[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        token = request_id_var.set(self.request_id(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+
+        response.headers[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+    def request_id(self, request):
+        request_id = request.headers.get(REQUEST_ID_HEADER, "")
+        if not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        request.request_id = request_id
+        return request_id
+
+
+# ============================
+# NOTIFICATION OUTBOX
+# ============================
+class NotificationMiddleware:
+    """
+    Gives each request a notification outbox (``api.notifications``) and
+    writes it once the view is done. It sits inside QueryCountMiddleware,
+    so those writes (at most four queries) count against the view's budget.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with collect_notifications():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        async with acollect_notifications():
+            return await self.get_response(request)
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:00
+
+from django.db import migrations, models
+
+
+def backfill_change_seq(apps, schema_editor):
+    """Number existing rows per event so ``since=0`` returns the full history."""
+    MandalEvent = apps.get_model("api", "MandalEvent")
+    Donation = apps.get_model("api", "Donation")
+    Expense = apps.get_model("api", "Expense")
+
+    for event in MandalEvent.objects.all().iterator():
+        seq = 0
+        for model in (Donation, Expense):
+            batch = []
+            for row in (
+                model.objects.filter(mandal_event=event)
+                .order_by("id")
+                .only("id")
+                .iterator()
+            ):
+                seq += 1
+                row.change_seq = seq
+                batch.append(row)
+            model.objects.bulk_update(batch, ["change_seq"], batch_size=1000)
+
+        event.change_seq = seq
+        event.save(update_fields=["change_seq"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="donation",
+            name="change_seq",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="expense",
+            name="change_seq",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="mandalevent",
+            name="change_seq",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="donation",
+            index=models.Index(
+                fields=["mandal_event", "change_seq"],
+                name="donations_mandal__3d1e6f_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                fields=["mandal_event", "change_seq"],
+                name="expenses_mandal__b10f36_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_change_seq, migrations.RunPython.noop),
+    ]
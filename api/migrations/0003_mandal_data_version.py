@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_delta_sync_change_seq"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mandal",
+            name="data_version",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_mandal_data_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventLedgerSummary",
+            fields=[
+                (
+                    "mandal_event",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="ledger_summary",
+                        serialize=False,
+                        to="api.mandalevent",
+                    ),
+                ),
+                (
+                    "total_collection",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "total_expense",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("donation_count", models.IntegerField(default=0)),
+                ("expense_count", models.IntegerField(default=0)),
+                ("donation_types", models.JSONField(default=dict)),
+                ("expense_categories", models.JSONField(default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "event_ledger_summaries",
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def reset_ledger_summaries(apps, schema_editor):
+    """Drop existing summaries so they are rebuilt together with their rollups."""
+    apps.get_model("api", "EventLedgerSummary").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_event_ledger_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CollectorRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("collector_name", models.CharField(max_length=100)),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("donation_count", models.IntegerField(default=0)),
+                ("last_collected_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "mandal_event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="collector_rollups",
+                        to="api.mandalevent",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "collector_rollups",
+                "unique_together": {("mandal_event", "user")},
+            },
+        ),
+        migrations.RunPython(reset_ledger_summaries, migrations.RunPython.noop),
+    ]
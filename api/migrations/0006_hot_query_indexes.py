@@ -0,0 +1,96 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_collector_rollup"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="appnotification",
+            index=models.Index(
+                fields=["to_user_id", "created_at"],
+                name="app_notific_to_user_f4eafd_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="appnotification",
+            index=models.Index(
+                fields=["to_user_id", "is_read", "created_at"],
+                name="app_notific_to_user_5a2561_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="donation",
+            index=models.Index(
+                fields=["mandal_event", "is_deleted", "date", "id"],
+                name="donations_mandal__53ee30_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="donation",
+            index=models.Index(
+                fields=["mandal_event", "created_by", "is_deleted", "date"],
+                name="donations_mandal__d6f3be_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="donation",
+            index=models.Index(
+                fields=["mandal", "created_by", "is_deleted", "date"],
+                name="donations_mandal__71084b_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                fields=["mandal_event", "is_deleted", "date"],
+                name="expenses_mandal__0dd646_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                fields=["mandal_event", "created_by", "is_deleted"],
+                name="expenses_mandal__4bf99a_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mandalsubscription",
+            index=models.Index(
+                fields=["mandal", "is_active", "created_at"],
+                name="api_mandals_mandal__68e37c_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mandalsubscription",
+            index=models.Index(
+                fields=["is_active", "end_date"], name="api_mandals_is_acti_de241f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wallettransfer",
+            index=models.Index(
+                fields=["mandal", "status", "requested_at"],
+                name="wallet_tran_mandal__3d5d9f_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wallettransfer",
+            index=models.Index(
+                fields=["mandal_event", "status", "from_user_id"],
+                name="wallet_tran_mandal__ca992e_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wallettransfer",
+            index=models.Index(
+                fields=["mandal_event", "status", "to_manager_id"],
+                name="wallet_tran_mandal__f36de4_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentWebhookEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("payment_id", models.CharField(max_length=200, unique=True)),
+                ("order_id", models.CharField(blank=True, max_length=200, null=True)),
+                ("event", models.CharField(max_length=100)),
+                ("mandal_id", models.BigIntegerField(blank=True, null=True)),
+                ("payload", models.JSONField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processed", "Processed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0)),
+                ("last_error", models.TextField(blank=True, null=True)),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "received_at"],
+                        name="api_payment_status_9a81e3_idx",
+                    )
+                ],
+            },
+        ),
+    ]
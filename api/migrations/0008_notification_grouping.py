@@ -0,0 +1,30 @@
+# Generated by Django 5.2.11 on 2026-10-18 07:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_payment_webhook_event"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="appnotification",
+            name="count",
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="appnotification",
+            name="group_key",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="appnotification",
+            index=models.Index(
+                fields=["to_user_id", "group_key", "is_read"],
+                name="app_notific_to_user_6b6a19_idx",
+            ),
+        ),
+    ]
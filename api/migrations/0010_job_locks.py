@@ -0,0 +1,22 @@
+# Generated by Django 5.2.11 on 2026-10-18 08:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_background_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobLock",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=100, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
@@ -11,6 +11,11 @@ class Mandal(models.Model):
     district = models.CharField(max_length=100, blank=True, null=True)
     state = models.CharField(max_length=100, blank=True, null=True)
     pincode = models.CharField(max_length=10, blank=True, null=True)
+
+    # 🏷️ Bumped by every write that changes mandal-wide reads (events,
+    # ledger). Used for ETags, so it only has to change, not count anything.
+    data_version = models.BigIntegerField(default=0)
+
     class Meta:
         db_table = "ganesh_mandals"
 
@@ -140,11 +145,21 @@ class Donation(models.Model):
     is_synced = models.BooleanField(default=True)
     is_deleted = models.BooleanField(default=False)
 
+    # 🔄 Delta sync cursor (see MandalEvent.change_seq)
+    change_seq = models.BigIntegerField(default=0)
+
     class Meta:
         db_table = "donations"
         ordering = ["-date"]
         indexes = [
             models.Index(fields=["mandal_event"]),
+            models.Index(fields=["mandal_event", "change_seq"]),
+            # sync / list / keyset pages: event rows newest first
+            models.Index(fields=["mandal_event", "is_deleted", "date", "id"]),
+            # volunteer's own list and wallet balance per collector
+            models.Index(fields=["mandal_event", "created_by", "is_deleted", "date"]),
+            # collections/user/<id>: one collector across the mandal
+            models.Index(fields=["mandal", "created_by", "is_deleted", "date"]),
         ]
         
         
@@ -182,9 +197,17 @@ class Expense(models.Model):
     is_synced = models.BooleanField(default=True)
     is_deleted = models.BooleanField(default=False)
 
+    # 🔄 Delta sync cursor (see MandalEvent.change_seq)
+    change_seq = models.BigIntegerField(default=0)
+
     class Meta:
         db_table = "expenses"
         ordering = ["-date"]
+        indexes = [
+            models.Index(fields=["mandal_event", "change_seq"]),
+            models.Index(fields=["mandal_event", "is_deleted", "date"]),
+            models.Index(fields=["mandal_event", "created_by", "is_deleted"]),
+        ]
 
 class EventMaster(models.Model):
     event_name = models.CharField(max_length=100, unique=True)
@@ -197,10 +220,68 @@ class MandalEvent(models.Model):
     event = models.ForeignKey(EventMaster, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # 🔄 Last change sequence handed out to a donation / expense of this event.
+    # Bumped inside the writing transaction, so the row lock keeps it ordered.
+    change_seq = models.BigIntegerField(default=0)
+
     class Meta:
         unique_together = ('mandal', 'event')  # 🚨 Prevent duplicate event creation
         
     
+# ============================
+# LEDGER SUMMARY (MATERIALIZED)
+# ============================
+class EventLedgerSummary(models.Model):
+    """
+    Running totals for one event, kept in step with Donation / Expense writes
+    by ``api.ledger``. Breakdowns map a donation type / expense category to
+    ``{"total": "<decimal>", "count": <int>}``.
+    """
+    mandal_event = models.OneToOneField(
+        MandalEvent,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="ledger_summary"
+    )
+
+    total_collection = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_expense = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    donation_count = models.IntegerField(default=0)
+    expense_count = models.IntegerField(default=0)
+
+    donation_types = models.JSONField(default=dict)
+    expense_categories = models.JSONField(default=dict)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "event_ledger_summaries"
+
+
+class CollectorRollup(models.Model):
+    """
+    Per-volunteer donation totals for one event, maintained next to
+    EventLedgerSummary. ``last_collected_at`` only moves forward; deleting
+    a donation does not rewind it.
+    """
+    mandal_event = models.ForeignKey(
+        MandalEvent,
+        on_delete=models.CASCADE,
+        related_name="collector_rollups"
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    collector_name = models.CharField(max_length=100)
+
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    donation_count = models.IntegerField(default=0)
+    last_collected_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "collector_rollups"
+        unique_together = ("mandal_event", "user")
+
+
 # ============================
 # WALLET TRANSFER
 # ============================
@@ -236,6 +317,13 @@ class WalletTransfer(models.Model):
     class Meta:
         db_table = "wallet_transfers"
         ordering = ["-requested_at"]
+        indexes = [
+            # manager's pending queue
+            models.Index(fields=["mandal", "status", "requested_at"]),
+            # wallet balance engine: approved sent / received per user
+            models.Index(fields=["mandal_event", "status", "from_user_id"]),
+            models.Index(fields=["mandal_event", "status", "to_manager_id"]),
+        ]
 
     def __str__(self):
         return f"₹{self.amount} | {self.status}"
@@ -253,11 +341,20 @@ class AppNotification(models.Model):
     type = models.CharField(max_length=50)
     is_read = models.BooleanField(default=False)
 
+    # Bursts collapse into one row per recipient and group (api/notifications.py)
+    group_key = models.CharField(max_length=100, null=True, blank=True)
+    count = models.IntegerField(default=1)
+
     created_at = models.DateTimeField()
 
     class Meta:
         db_table = "app_notifications"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["to_user_id", "created_at"]),
+            models.Index(fields=["to_user_id", "is_read", "created_at"]),
+            models.Index(fields=["to_user_id", "group_key", "is_read"]),
+        ]
 
     def __str__(self):
         return self.title
@@ -297,5 +394,100 @@ class MandalSubscription(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # subscription-status: latest active row per mandal
+            models.Index(fields=["mandal", "is_active", "created_at"]),
+            # expiry of active rows past end_date
+            models.Index(fields=["is_active", "end_date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.mandal.name} - {self.plan.name}"
+
+class PaymentWebhookEvent(models.Model):
+    """
+    A gateway webhook delivery, one row per payment: retried deliveries of
+    the same payment collapse onto it. Rows are the work queue for
+    subscription activation (see api/webhooks.py).
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processed", "Processed"),
+        ("failed", "Failed"),
+    ]
+
+    payment_id = models.CharField(max_length=200, unique=True)
+    order_id = models.CharField(max_length=200, null=True, blank=True)
+    event = models.CharField(max_length=100)
+    mandal_id = models.BigIntegerField(null=True, blank=True)
+    payload = models.JSONField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # worker: oldest pending deliveries first
+            models.Index(fields=["status", "received_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.event} {self.payment_id} ({self.status})"
+
+
+class Job(models.Model):
+    """
+    A unit of deferred work for the run_jobs worker (see api/jobs.py). The
+    table is the queue: workers claim due rows with SELECT ... FOR UPDATE
+    SKIP LOCKED.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # Enqueueing the same key twice is a no-op (e.g. one run per schedule slot)
+    unique_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(null=True, blank=True)
+
+    locked_by = models.CharField(max_length=100, null=True, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # worker: due pending jobs, oldest first; stale running jobs
+            models.Index(fields=["status", "run_at"]),
+            # concurrency limits: running jobs per name
+            models.Index(fields=["name", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+
+class JobLock(models.Model):
+    """
+    One row per job name with a concurrency cap; claims of that job lock
+    it, so two workers cannot both see the same free slot (api/jobs.py).
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+
     def __str__(self):
-        return f"{self.mandal.name} - {self.plan.name}"
\ No newline at end of file
+        return self.name
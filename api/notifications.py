@@ -0,0 +1,298 @@
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import AppNotification, User
+from .realtime import hub
+
+logger = logging.getLogger(__name__)
+
+
+# ============================
+# NOTIFICATION FAN-OUT
+# ============================
+# notify() only queues: a notification joins the outbox once its
+# transaction commits (a rolled back write notifies nobody). The outbox
+# belongs to the request (NotificationMiddleware) or to a worker's
+# collect_notifications() block and is written when that ends: recipients
+# in one query, then one bulk_create.
+#
+# Notifications sharing a ``group`` collapse per recipient, within the
+# outbox and into the recipient's unread row of that group from the last
+# NOTIFICATION_COLLAPSE_WINDOW seconds: twelve donations make one "12 new
+# donations" row, not twelve.
+#
+# With NOTIFICATION_JOBS on, the write itself leaves the request too: the
+# outbox becomes one notifications.flush job for the run_jobs worker. Open
+# event streams live in the web process, so that is still where the
+# outbox is published to them (api/realtime.py); notifications raised by
+# jobs themselves reach streams only through the client's next sync.
+DEFAULT_COLLAPSE_WINDOW = 900
+
+# type -> (title, message) once a group holds more than one notification
+COLLAPSED = {
+    "donation": ("New donations", "{count} new donations recorded"),
+    "wallet_request": ("Wallet requests", "{count} wallet requests waiting for approval"),
+    "wallet_approved": ("Wallet requests approved", "{count} of your wallet requests were approved"),
+    "wallet_rejected": ("Wallet requests rejected", "{count} of your wallet requests were rejected"),
+}
+
+_outbox = ContextVar("notification_outbox", default=None)
+
+
+def notify(type, title, message, to=(), managers_of=None, exclude=None, group=None):
+    """
+    Notify the users in ``to`` and/or the managers of mandal
+    ``managers_of`` (except ``exclude``) once the current transaction
+    commits.
+    """
+    notice = {
+        "type": type,
+        "title": title,
+        "message": message,
+        "to": list(to),
+        "managers_of": managers_of,
+        "exclude": exclude,
+        "group": group,
+    }
+    transaction.on_commit(lambda: _enqueue(notice))
+
+
+def _enqueue(notice):
+    outbox = _outbox.get()
+    if outbox is None:
+        _deliver([notice])
+    else:
+        outbox.append(notice)
+
+
+def _deliver(notices):
+    if getattr(settings, "NOTIFICATION_JOBS", False):
+        enqueue("notifications.flush", {"notices": notices})
+        publish_notifications(notices)
+    else:
+        flush_notifications(notices)
+
+
+@contextmanager
+def collect_notifications():
+    """Hold notifications committed inside the block and write them together at the end."""
+    token = _outbox.set([])
+    try:
+        yield
+    finally:
+        outbox = _outbox.get()
+        _outbox.reset(token)
+        if outbox:
+            _deliver(outbox)
+
+
+@asynccontextmanager
+async def acollect_notifications():
+    """``collect_notifications`` for async code; the write runs in a worker thread."""
+    token = _outbox.set([])
+    try:
+        yield
+    finally:
+        outbox = _outbox.get()
+        _outbox.reset(token)
+        if outbox:
+            await sync_to_async(_deliver)(outbox)
+
+
+def _text(notice, count):
+    if count == 1:
+        return notice["title"], notice["message"]
+    if notice["type"] in COLLAPSED:
+        title, message = COLLAPSED[notice["type"]]
+        return title, message.format(count=count)
+    return notice["title"], f"{notice['message']} (+{count - 1} more)"
+
+
+def flush_notifications(notices):
+    """
+    Write ``notices``: one query for manager recipients, one for unread
+    rows to collapse into, one bulk_create and one bulk_update. Failures
+    are logged, not raised: the writes they announce are already
+    committed.
+    """
+    try:
+        write_notifications(notices)
+    except Exception:
+        logger.exception("notification flush failed", extra={"notifications": len(notices)})
+
+
+def publish_notifications(notices):
+    """
+    Tell the recipients' open streams about ``notices`` without writing
+    them (the notifications.flush job does). ``count`` is the outbox's
+    own; the row it collapses into may hold more.
+    """
+    try:
+        pending = _pending(notices)
+    except Exception:
+        logger.exception("notification publish failed", extra={"notifications": len(notices)})
+        return
+
+    for (user_id, _), (notice, count) in pending.items():
+        title, message = _text(notice, count)
+        _publish(user_id, notice["type"], title, message, count)
+
+
+def _publish(user_id, type, title, message, count):
+    # No row id: bulk_create does not return primary keys on MySQL, so
+    # clients fetch notifications/ for ids
+    hub.publish([f"user:{user_id}"], "notification", {
+        "type": type,
+        "title": title,
+        "message": message,
+        "count": count,
+    })
+
+
+def _pending(notices):
+    """``{(recipient, group or a per-notice key): [notice, count]}``; one query for manager recipients."""
+    mandal_ids = {n["managers_of"] for n in notices if n["managers_of"] is not None}
+    managers = defaultdict(list)
+    if mandal_ids:
+        for user_id, mandal_id in User.objects.filter(
+            mandal_id__in=mandal_ids, role="Manager",
+        ).values_list("id", "mandal_id"):
+            managers[mandal_id].append(user_id)
+
+    # (recipient, group or a per-notice key) -> [notice, count]
+    pending = {}
+    for i, notice in enumerate(notices):
+        recipients = set(notice["to"]) | set(managers.get(notice["managers_of"], ()))
+        recipients.discard(notice["exclude"])
+
+        for user_id in sorted(recipients):
+            key = (user_id, notice["group"] or f"#{i}")
+            if key in pending:
+                pending[key][1] += 1
+            else:
+                pending[key] = [notice, 1]
+    return pending
+
+
+def write_notifications(notices, publish=True):
+    """
+    ``flush_notifications`` that raises, for the notifications.flush job to
+    retry (with ``publish`` off: the web process has published them).
+    """
+    now = timezone.now()
+    pending = _pending(notices)
+
+    grouped = [key for key, (notice, _) in pending.items() if notice["group"]]
+    existing = {}
+    if grouped:
+        window = getattr(settings, "NOTIFICATION_COLLAPSE_WINDOW", DEFAULT_COLLAPSE_WINDOW)
+        rows = AppNotification.objects.filter(
+            to_user_id__in={user_id for user_id, _ in grouped},
+            group_key__in={group for _, group in grouped},
+            is_read=False,
+            created_at__gte=now - timedelta(seconds=window),
+        ).order_by("created_at")
+        for row in rows:
+            existing[(row.to_user_id, row.group_key)] = row  # latest wins
+
+    created = []
+    updated = []
+    for (user_id, _), (notice, count) in pending.items():
+        row = existing.get((user_id, notice["group"]))
+        if row is not None:
+            row.count += count
+            row.title, row.message = _text(notice, row.count)
+            row.created_at = now
+            updated.append(row)
+            continue
+
+        title, message = _text(notice, count)
+        created.append(AppNotification(
+            to_user_id=user_id,
+            type=notice["type"],
+            title=title,
+            message=message,
+            group_key=notice["group"],
+            count=count,
+            created_at=now,
+        ))
+
+    if created:
+        AppNotification.objects.bulk_create(created)
+    if updated:
+        AppNotification.objects.bulk_update(updated, ["count", "title", "message", "created_at"])
+
+    # Open event streams of the recipients (already committed: no on_commit)
+    if publish:
+        for row in created + updated:
+            _publish(row.to_user_id, row.type, row.title, row.message, row.count)
+
+
+# ============================
+# WHO HEARS ABOUT WHAT
+# ============================
+def donations_recorded(user, mandal_event, donations):
+    """Managers of the mandal, except the collector themselves."""
+    for donation in donations:
+        notify(
+            "donation",
+            "New donation",
+            f"{user.name} recorded ₹{donation.amount} from {donation.donor_name}",
+            managers_of=mandal_event.mandal_id,
+            exclude=user.id,
+            group=f"donations:{mandal_event.id}",
+        )
+
+
+def wallet_requested(user, amount, to_manager_id=None):
+    """The chosen manager, or every manager of the mandal."""
+    notify(
+        "wallet_request",
+        "Wallet request",
+        f"{user.name} wants to hand over ₹{amount}",
+        to=[to_manager_id] if to_manager_id else (),
+        managers_of=None if to_manager_id else user.mandal_id,
+        exclude=user.id,
+        group="wallet-requests",
+    )
+
+
+def transfers_settled(manager, approved, rejected):
+    for transfers, kind, verb in ((approved, "wallet_approved", "approved"), (rejected, "wallet_rejected", "rejected")):
+        for transfer in transfers:
+            notify(
+                kind,
+                f"Wallet request {verb}",
+                f"₹{transfer.amount} {verb} by {manager.name}",
+                to=[transfer.from_user_id],
+                group=f"wallet-{verb}",
+            )
+
+
+def subscription_activated(subscription):
+    notify(
+        "subscription",
+        "Subscription activated",
+        f"{subscription.plan.name} plan active until {subscription.end_date:%d %b %Y}",
+        managers_of=subscription.mandal_id,
+    )
+
+
+def subscriptions_expired(mandal_ids):
+    for mandal_id in mandal_ids:
+        notify(
+            "subscription",
+            "Subscription expired",
+            "Your subscription has ended. Renew to keep using premium features.",
+            managers_of=mandal_id,
+            group="subscription-expired",
+        )
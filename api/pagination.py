@@ -0,0 +1,180 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils import encoders
+
+
+# ============================
+# KEYSET PAGINATION (date, id)
+# ============================
+# Matches Donation.Meta.ordering ("-date"), with id as the tie breaker so
+# the cursor is stable when several rows share a timestamp.
+KEYSET_ORDERING = ("-date", "-id")
+
+DEFAULT_PAGE_SIZE = 200
+DEFAULT_STREAM_CHUNK_SIZE = 500
+
+
+def encode_cursor(date, pk):
+    raw = f"{date.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """Return ``(date, id)`` for a cursor, or raise ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        date, pk = raw.rsplit("|", 1)
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+    if date is None:
+        raise ValueError("Invalid cursor")
+    return date, pk
+
+
+def wants_page(request):
+    return "cursor" in request.GET or "limit" in request.GET
+
+
+def wants_stream(request):
+    return request.GET.get("stream") in ("1", "true")
+
+
+def page_size(request):
+    max_size = getattr(settings, "LIST_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(request.GET.get("limit", max_size))
+    except ValueError:
+        limit = max_size
+    return max(1, min(limit, max_size))
+
+
+def _after(qs, cursor):
+    date, pk = cursor
+    return qs.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+
+
+def keyset_page(qs, cursor, limit, fast):
+    """
+    One page of ``qs`` newest first, serialized with the ``FastSerializer``
+    ``fast``. ``cursor`` is the decoded ``(date, id)`` of the last row the
+    client has, or None for the first page.
+
+    Returns ``(items, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    return _page(list(_page_rows(qs, cursor, limit, fast)), limit, fast)
+
+
+async def akeyset_page(qs, cursor, limit, fast):
+    """Async ``keyset_page``."""
+    return _page([row async for row in _page_rows(qs, cursor, limit, fast)], limit, fast)
+
+
+def _page_rows(qs, cursor, limit, fast):
+    qs = qs.order_by(*KEYSET_ORDERING)
+    if cursor is not None:
+        qs = _after(qs, cursor)
+    return fast.rows(qs)[:limit + 1]
+
+
+def _page(rows, limit, fast):
+    if len(rows) <= limit:
+        return fast.to_dicts(rows), None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return fast.to_dicts(rows), encode_cursor(last[fast.index("date")], last[fast.index("id")])
+
+
+def keyset_chunks(qs, chunk_size, fast):
+    """
+    Yield ``qs`` newest first as lists of at most ``chunk_size`` serialized
+    rows.
+
+    Each chunk is its own keyset query rather than one ``iterator()`` over a
+    server-side cursor: MySQLdb buffers the whole result set client side, so
+    this is what keeps memory flat on the production database.
+    """
+    qs = qs.order_by(*KEYSET_ORDERING)
+    date_at, id_at = fast.index("date"), fast.index("id")
+    cursor = None
+
+    while True:
+        rows = list(fast.rows(_after(qs, cursor) if cursor else qs)[:chunk_size])
+        if not rows:
+            return
+
+        yield fast.to_dicts(rows)
+
+        if len(rows) < chunk_size:
+            return
+        cursor = (rows[-1][date_at], rows[-1][id_at])
+
+
+async def akeyset_chunks(qs, chunk_size, fast):
+    """Async ``keyset_chunks``."""
+    qs = qs.order_by(*KEYSET_ORDERING)
+    date_at, id_at = fast.index("date"), fast.index("id")
+    cursor = None
+
+    while True:
+        rows = [row async for row in fast.rows(_after(qs, cursor) if cursor else qs)[:chunk_size]]
+        if not rows:
+            return
+
+        yield fast.to_dicts(rows)
+
+        if len(rows) < chunk_size:
+            return
+        cursor = (rows[-1][date_at], rows[-1][id_at])
+
+
+def _stream_chunk_size(chunk_size):
+    return chunk_size or getattr(settings, "STREAM_CHUNK_SIZE", DEFAULT_STREAM_CHUNK_SIZE)
+
+
+def _json_items(chunk):
+    """The chunk as JSON array items, without the brackets."""
+    return json.dumps(
+        chunk,
+        cls=encoders.JSONEncoder,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )[1:-1]
+
+
+def stream_json_array(qs, fast, chunk_size=None):
+    """
+    Generator producing ``qs`` as one JSON array, serialized chunk by chunk,
+    for use as a ``StreamingHttpResponse`` body.
+    """
+    yield "["
+    first = True
+
+    for chunk in keyset_chunks(qs, _stream_chunk_size(chunk_size), fast):
+        if not first:
+            yield ","
+        yield _json_items(chunk)
+        first = False
+
+    yield "]"
+
+
+async def astream_json_array(qs, fast, chunk_size=None):
+    """Async ``stream_json_array``, for async views."""
+    yield "["
+    first = True
+
+    async for chunk in akeyset_chunks(qs, _stream_chunk_size(chunk_size), fast):
+        if not first:
+            yield ","
+        yield _json_items(chunk)
+        first = False
+
+    yield "]"
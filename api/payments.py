@@ -0,0 +1,223 @@
+import hashlib
+import hmac
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# ============================
+# PAYMENT GATEWAY ADAPTER
+# ============================
+# Built on first use, not at import, so workers that never take a payment
+# never construct a client. PAYMENT_GATEWAY picks "razorpay" (default) or
+# "fake", an offline stand-in with the same signatures for tests and
+# benchmarks.
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+DEFAULT_RETRIES = 2
+DEFAULT_POOL_SIZE = 10
+DEFAULT_ORDER_DEADLINE = 15
+
+
+class PaymentGatewayError(Exception):
+    """The gateway failed or answered with an error."""
+
+
+class PaymentGatewayTimeout(PaymentGatewayError):
+    """The gateway did not answer in time."""
+
+
+class TimeoutSession(requests.Session):
+    """Session applying ``timeout`` to every request that does not set one (razorpay never does)."""
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(*args, **kwargs)
+
+
+def pooled_session():
+    session = TimeoutSession(getattr(settings, "PAYMENT_HTTP_TIMEOUT", DEFAULT_TIMEOUT))
+
+    retries = getattr(settings, "PAYMENT_HTTP_RETRIES", DEFAULT_RETRIES)
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=getattr(settings, "PAYMENT_HTTP_POOL_SIZE", DEFAULT_POOL_SIZE),
+        max_retries=Retry(
+            total=retries,
+            connect=retries,
+            # Reads and 5xx are only retried for GET: a POST that reached
+            # the gateway may have created the order already
+            read=retries,
+            status=retries,
+            allowed_methods=frozenset({"GET"}),
+            status_forcelist=(502, 503, 504),
+            backoff_factor=0.3,
+            raise_on_status=False,
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _require(secret, setting):
+    """An empty key would make every signature forgeable: refuse to check any."""
+    if not secret:
+        raise ImproperlyConfigured(f"{setting} is not set; cannot verify gateway signatures")
+    return secret
+
+
+def _hmac_sha256(secret, message):
+    if isinstance(message, str):
+        message = message.encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+class RazorpayGateway:
+    def __init__(self, key, secret, webhook_secret):
+        import razorpay
+
+        self.secret = secret
+        self.webhook_secret = webhook_secret
+        self.client = razorpay.Client(session=pooled_session(), auth=(key, secret))
+
+    def create_order(self, amount, currency="INR", notes=None):
+        try:
+            order = self.client.order.create({
+                "amount": amount,
+                "currency": currency,
+                "payment_capture": 1,
+                "notes": notes or {},
+            })
+        except requests.Timeout as exc:
+            raise PaymentGatewayTimeout(str(exc)) from exc
+        except Exception as exc:  # razorpay raises its own error classes and requests errors
+            raise PaymentGatewayError(str(exc)) from exc
+
+        return {"id": order["id"], "amount": order["amount"], "currency": order["currency"]}
+
+    def verify_payment(self, order_id, payment_id, signature):
+        expected = _hmac_sha256(_require(self.secret, "RAZORPAY_SECRET"), f"{order_id}|{payment_id}")
+        return hmac.compare_digest(expected, str(signature or ""))
+
+    def verify_webhook(self, body, signature):
+        """
+        ``body`` is the raw request body; Razorpay signs it with the webhook
+        secret set in its dashboard, which is not the API key secret.
+        """
+        expected = _hmac_sha256(_require(self.webhook_secret, "RAZORPAY_WEBHOOK_SECRET"), body)
+        return hmac.compare_digest(expected, str(signature or ""))
+
+
+class FakeGateway:
+    """
+    Offline gateway: orders are made up locally and payments are signed
+    exactly as Razorpay signs them (HMAC-SHA256 of ``order_id|payment_id``
+    with the key secret, webhooks with the webhook secret).
+    ``FAKE_GATEWAY_LATENCY`` adds a delay per order, for benchmarking the
+    slow path.
+    """
+    def __init__(self, secret, webhook_secret):
+        self.secret = secret
+        self.webhook_secret = webhook_secret
+
+    def create_order(self, amount, currency="INR", notes=None):
+        latency = getattr(settings, "FAKE_GATEWAY_LATENCY", 0)
+        if latency:
+            time.sleep(latency)
+        return {"id": f"order_fake_{uuid.uuid4().hex[:14]}", "amount": amount, "currency": currency}
+
+    def sign_payment(self, order_id, payment_id):
+        return _hmac_sha256(self.secret, f"{order_id}|{payment_id}")
+
+    def verify_payment(self, order_id, payment_id, signature):
+        return hmac.compare_digest(self.sign_payment(order_id, payment_id), str(signature or ""))
+
+    def sign_webhook(self, body):
+        return _hmac_sha256(self.webhook_secret, body)
+
+    def verify_webhook(self, body, signature):
+        return hmac.compare_digest(self.sign_webhook(body), str(signature or ""))
+
+
+_gateway = None
+_executor = None
+_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _lock:
+            if _gateway is None:
+                secret = settings.RAZORPAY_SECRET or ""
+                webhook_secret = getattr(settings, "RAZORPAY_WEBHOOK_SECRET", None) or ""
+                if getattr(settings, "PAYMENT_GATEWAY", "razorpay") == "fake":
+                    _gateway = FakeGateway(secret or "fake-secret", webhook_secret or "fake-webhook-secret")
+                else:
+                    _gateway = RazorpayGateway(settings.RAZORPAY_KEY, secret, webhook_secret)
+    return _gateway
+
+
+def reset_gateway():
+    """Forget the gateway (and executor), e.g. after changing PAYMENT_GATEWAY in tests."""
+    global _gateway, _executor
+    with _lock:
+        _gateway = None
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def _order_executor():
+    global _executor
+    workers = getattr(settings, "PAYMENT_ORDER_WORKERS", 0)
+    if not workers:
+        return None
+
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="payments")
+    return _executor
+
+
+def create_order(amount, currency="INR", notes=None):
+    """
+    Create a gateway order. With PAYMENT_ORDER_WORKERS set, the call runs
+    on a small shared pool and the request gives up after
+    PAYMENT_ORDER_DEADLINE seconds (PaymentGatewayTimeout); the pool also
+    caps how many requests can be waiting on the gateway at once.
+    """
+    executor = _order_executor()
+    if executor is None:
+        return get_gateway().create_order(amount, currency, notes)
+
+    future = executor.submit(get_gateway().create_order, amount, currency, notes)
+    try:
+        return future.result(timeout=getattr(settings, "PAYMENT_ORDER_DEADLINE", DEFAULT_ORDER_DEADLINE))
+    except FutureTimeout:
+        future.cancel()
+        raise PaymentGatewayTimeout("Order creation timed out")
+
+
+def verify_payment(order_id, payment_id, signature):
+    return get_gateway().verify_payment(order_id, payment_id, signature)
+
+
+def verify_webhook(body, signature):
+    return get_gateway().verify_webhook(body, signature)
+
+
+def sign_webhook(body):
+    """Signature the gateway would send for ``body`` (for replaying deliveries locally)."""
+    return _hmac_sha256(_require(get_gateway().webhook_secret, "RAZORPAY_WEBHOOK_SECRET"), body)
@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .changes import reserve_change_seq
+from .ledger import apply_ledger_delta
+from .models import Donation, Expense, User, WalletTransfer
+from . import realtime
+from .notifications import donations_recorded, wallet_requested
+from .serializers import (
+    DonationPushSerializer,
+    ExpensePushSerializer,
+    WalletTransferPushSerializer,
+)
+
+
+# ============================
+# BATCHED OFFLINE PUSH
+# ============================
+DEFAULT_SYNC_PUSH_MAX_ITEMS = 500
+
+# (payload key, model, client id field, serializer)
+PUSH_SECTIONS = (
+    ("donations", Donation, "client_donation_id", DonationPushSerializer),
+    ("expenses", Expense, "client_expense_id", ExpensePushSerializer),
+    ("wallet_requests", WalletTransfer, "client_wallet_transfer_id", WalletTransferPushSerializer),
+)
+
+
+def push_max_items():
+    return getattr(settings, "SYNC_PUSH_MAX_ITEMS", DEFAULT_SYNC_PUSH_MAX_ITEMS)
+
+
+def batch_size(data):
+    return sum(len(data.get(key) or []) for key, *_ in PUSH_SECTIONS)
+
+
+def _validate_section(items, model, client_field, serializer_class):
+    """
+    Split one section into ``(results, accepted)``.
+
+    Already-stored client ids are found with a single IN query; ids repeated
+    inside the batch are treated the same way as ids seen on an earlier push.
+    """
+    client_ids = [item.get(client_field) for item in items if isinstance(item, dict)]
+    existing = set(
+        model.objects.filter(**{f"{client_field}__in": client_ids})
+        .values_list(client_field, flat=True)
+    )
+
+    results = []
+    accepted = []
+    seen = set()
+
+    for item in items:
+        if not isinstance(item, dict):
+            results.append({client_field: None, "status": "error", "errors": "Invalid item"})
+            continue
+
+        client_id = item.get(client_field)
+        if client_id in existing or client_id in seen:
+            results.append({client_field: client_id, "status": "duplicate"})
+            continue
+
+        serializer = serializer_class(data=item)
+        if not serializer.is_valid():
+            results.append({client_field: client_id, "status": "error", "errors": serializer.errors})
+            continue
+
+        seen.add(client_id)
+        accepted.append(serializer.validated_data)
+        results.append({client_field: client_id, "status": "created"})
+
+    return results, accepted
+
+
+def _reject(results, client_field, client_id, error):
+    for result in results:
+        if result[client_field] == client_id and result["status"] == "created":
+            result["status"] = "error"
+            result["errors"] = error
+            return
+
+
+def push_batch(user, mandal_event, data):
+    """
+    Validate and insert a mixed offline batch for one event.
+
+    Every section is validated up front, then all accepted rows are written
+    with one ``bulk_create`` per model inside a single transaction, together
+    with the event's ledger summary. Returns per-item results keyed like the
+    request payload.
+    """
+    results = {}
+    accepted = {}
+
+    for key, model, client_field, serializer_class in PUSH_SECTIONS:
+        results[key], accepted[key] = _validate_section(
+            data.get(key) or [], model, client_field, serializer_class
+        )
+
+    # 💼 Wallet requests go to a manager of the caller's mandal
+    wallet_rows = []
+    if accepted["wallet_requests"]:
+        manager_ids = list(
+            User.objects.filter(mandal_id=user.mandal_id, role="Manager")
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        now = timezone.now()
+
+        for row in accepted["wallet_requests"]:
+            to_manager_id = row.get("to_manager_id") or (manager_ids[0] if manager_ids else None)
+            if to_manager_id not in manager_ids:
+                _reject(
+                    results["wallet_requests"],
+                    "client_wallet_transfer_id",
+                    row["client_wallet_transfer_id"],
+                    "Invalid manager",
+                )
+                continue
+
+            wallet_rows.append(WalletTransfer(
+                client_wallet_transfer_id=row["client_wallet_transfer_id"],
+                from_user_id=user.id,
+                to_manager_id=to_manager_id,
+                mandal_id=user.mandal_id,
+                mandal_event=mandal_event,
+                amount=row["amount"],
+                status="Pending",
+                requested_at=row.get("requested_at") or now,
+            ))
+
+    ledger_count = len(accepted["donations"]) + len(accepted["expenses"])
+
+    with transaction.atomic():
+        seq = reserve_change_seq(mandal_event.id, ledger_count) if ledger_count else 0
+
+        donations = []
+        for row in accepted["donations"]:
+            donations.append(Donation(
+                **row,
+                mandal_event=mandal_event,
+                mandal_id=user.mandal_id,
+                created_by=user,
+                change_seq=seq,
+            ))
+            seq += 1
+
+        expenses = []
+        for row in accepted["expenses"]:
+            expenses.append(Expense(
+                **row,
+                mandal_event=mandal_event,
+                mandal_id=user.mandal_id,
+                created_by=user,
+                change_seq=seq,
+            ))
+            seq += 1
+
+        # A client id pushed concurrently since the duplicate check raises
+        # IntegrityError and rolls the whole batch back, which keeps the
+        # ledger summary exact; the client's retry then sees a duplicate.
+        Donation.objects.bulk_create(donations)
+        Expense.objects.bulk_create(expenses)
+        WalletTransfer.objects.bulk_create(wallet_rows)
+
+        apply_ledger_delta(mandal_event.id, donations=donations, expenses=expenses)
+
+        donations_recorded(user, mandal_event, donations)
+        for transfer in wallet_rows:
+            wallet_requested(user, transfer.amount, transfer.to_manager_id)
+            realtime.wallet_requested(transfer)
+
+    return results
@@ -0,0 +1,109 @@
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+
+# ============================
+# QUERY COUNTING / N+1 DETECTION
+# ============================
+# A query "shape" is its SQL with the parameters left out (Django passes
+# them separately) and IN lists collapsed, so the same lookup repeated
+# once per row shows up as one shape with a high count.
+DEFAULT_REPEAT_THRESHOLD = 3
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_SPACES = re.compile(r"\s+")
+
+
+def query_shape(sql):
+    return _SPACES.sub(" ", _IN_LIST.sub("IN (...)", sql)).strip()
+
+
+def repeat_threshold():
+    return getattr(settings, "QUERY_REPEAT_THRESHOLD", DEFAULT_REPEAT_THRESHOLD)
+
+
+class QueryStats:
+    """``execute_wrapper`` that counts queries, DB time and query shapes."""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    @property
+    def duration_ms(self):
+        return round(self.duration * 1000, 2)
+
+    def repeated(self, threshold=None):
+        """``[(shape, count), ...]`` for shapes run at least ``threshold`` times."""
+        threshold = threshold or repeat_threshold()
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+def _wrap_connections(stack, stats):
+    for conn in connections.all():
+        stack.enter_context(conn.execute_wrapper(stats))
+
+
+@contextmanager
+def count_queries():
+    """Collect ``QueryStats`` for every query run on any database in the block."""
+    stats = QueryStats()
+    with ExitStack() as stack:
+        _wrap_connections(stack, stats)
+        yield stats
+
+
+@asynccontextmanager
+async def acount_queries():
+    """
+    ``count_queries`` for async code. Connections are per thread and the
+    async ORM runs its queries on the thread-sensitive executor, not on the
+    event loop, so the wrappers are installed (and removed) there.
+    """
+    stats = QueryStats()
+    stack = ExitStack()
+    await sync_to_async(_wrap_connections, thread_sensitive=True)(stack, stats)
+    try:
+        yield stats
+    finally:
+        await sync_to_async(stack.close, thread_sensitive=True)()
+
+
+def query_budget(max_queries):
+    """
+    Declare the most queries a view may run per request::
+
+        @query_budget(4)
+        @api_view(["GET"])
+        def get_donations(request): ...
+
+    Must be the outermost decorator. QueryCountMiddleware reports requests
+    that go over it, and the test suite fails on them.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def get_query_budget(view):
+    return getattr(view, "query_budget", None)
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import secrets
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+
+# ============================
+# IN-PROCESS EVENT HUB
+# ============================
+# Fan-out for the server-sent events stream (events_stream in views.py).
+# Writers publish to channels once their transaction commits; every open
+# stream subscribed to one of those channels gets the message on its own
+# event loop. Channels:
+#
+#   event:<mandal_event_id>   ledger changes (new change_seq to sync to)
+#   managers:<mandal_id>      wallet requests and settlements
+#   user:<user_id>            the user's notifications and settled requests
+#
+# No broker: a stream only sees what its own process publishes, so run
+# the ASGI server as a single process (or make clients treat a quiet
+# stream as a hint, and keep their periodic sync). The last
+# REALTIME_BACKLOG messages are kept so a reconnecting client sends
+# Last-Event-ID and misses nothing; if it fell further behind it gets a
+# "resync" event and should run a normal delta sync.
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_BACKLOG = 1000
+
+
+class Subscriber:
+    def __init__(self, channels, loop, size):
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+        self.overflowed = False
+
+    def deliver(self, message):
+        """Runs on the subscriber's loop."""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class Hub:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = defaultdict(set)
+        self.backlog = deque(maxlen=getattr(settings, "REALTIME_BACKLOG", DEFAULT_BACKLOG))
+        self.last_id = 0
+
+    def publish(self, channels, kind, data):
+        """Thread-safe; returns the message id."""
+        with self.lock:
+            self.last_id += 1
+            message = (self.last_id, frozenset(channels), kind, data)
+            self.backlog.append(message)
+            targets = set()
+            for channel in message[1]:
+                targets |= self.channels.get(channel, set())
+
+        for subscriber in targets:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.deliver, message)
+            except RuntimeError:  # its loop has closed; unsubscribe is on the way
+                pass
+        return message[0]
+
+    def subscribe(self, channels, last_id=None):
+        """
+        Register a subscriber on the running loop. Returns ``(subscriber,
+        replay, complete)``: the backlog messages after ``last_id`` for
+        these channels, and whether the backlog still reached back that far.
+        """
+        channels = frozenset(channels)
+        subscriber = Subscriber(
+            channels,
+            asyncio.get_running_loop(),
+            getattr(settings, "REALTIME_QUEUE_SIZE", DEFAULT_QUEUE_SIZE),
+        )
+
+        with self.lock:
+            for channel in channels:
+                self.channels[channel].add(subscriber)
+
+            if last_id is None:
+                return subscriber, [], True
+
+            oldest = self.backlog[0][0] if self.backlog else self.last_id + 1
+            complete = oldest <= last_id + 1 and last_id <= self.last_id
+            replay = [m for m in self.backlog if m[0] > last_id and m[1] & channels]
+            return subscriber, replay, complete
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            for channel in subscriber.channels:
+                members = self.channels.get(channel)
+                if members is not None:
+                    members.discard(subscriber)
+                    if not members:
+                        del self.channels[channel]
+
+
+hub = Hub()
+
+
+def publish(channels, kind, data):
+    """Publish once the current transaction commits (at once outside one)."""
+    transaction.on_commit(lambda: hub.publish(channels, kind, data))
+
+
+def format_event(message):
+    message_id, _, kind, data = message
+    payload = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return f"id: {message_id}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+def user_channels(user, mandal_event=None):
+    channels = {f"user:{user.id}"}
+    if user.role == "Manager":
+        channels.add(f"managers:{user.mandal_id}")
+    if mandal_event is not None:
+        channels.add(f"event:{mandal_event.id}")
+    return channels
+
+
+# ============================
+# WHAT GETS PUBLISHED
+# ============================
+def ledger_changed(mandal_event_id, change_seq):
+    publish([f"event:{mandal_event_id}"], "ledger", {
+        "event_id": mandal_event_id,
+        "change_seq": change_seq,
+    })
+
+
+def wallet_requested(transfer):
+    publish([f"managers:{transfer.mandal_id}"], "wallet_request", {
+        "client_wallet_transfer_id": transfer.client_wallet_transfer_id,
+        "from_user_id": transfer.from_user_id,
+        "to_manager_id": transfer.to_manager_id,
+        "amount": transfer.amount,
+    })
+
+
+def transfers_settled(manager, approved, rejected):
+    for transfers, new_status in ((approved, "Approved"), (rejected, "Rejected")):
+        for transfer in transfers:
+            publish(
+                [f"user:{transfer.from_user_id}", f"managers:{manager.mandal_id}"],
+                "wallet_settled",
+                {
+                    "client_wallet_transfer_id": transfer.client_wallet_transfer_id,
+                    "status": new_status,
+                    "amount": transfer.amount,
+                },
+            )
+
+
+# ============================
+# STREAM TICKETS
+# ============================
+# EventSource cannot send an Authorization header, and a JWT in the query
+# string ends up in access logs. The client instead POSTs for a ticket
+# and opens the stream with ?ticket=: signed, good for
+# REALTIME_TICKET_TTL seconds and redeemable once (the hub is
+# per-process anyway, so the process cache is enough to remember that).
+DEFAULT_TICKET_TTL = 30
+TICKET_SALT = "api.realtime.ticket"
+
+
+def ticket_ttl():
+    return getattr(settings, "REALTIME_TICKET_TTL", DEFAULT_TICKET_TTL)
+
+
+def issue_ticket(user):
+    return signing.dumps({"user_id": user.id, "nonce": secrets.token_urlsafe(12)}, salt=TICKET_SALT)
+
+
+def redeem_ticket(ticket):
+    """The ticket's user id, or None when it is forged, expired or already used."""
+    try:
+        data = signing.loads(ticket, salt=TICKET_SALT, max_age=ticket_ttl())
+    except signing.BadSignature:
+        return None
+
+    if not cache.add(f"stream-ticket:{data['nonce']}", 1, ticket_ttl()):
+        return None
+    return data["user_id"]
+
+
+# ============================
+# SSE STREAM
+# ============================
+DEFAULT_HEARTBEAT = 15
+DEFAULT_RETRY_MS = 3000
+
+
+async def event_stream(channels, last_id=None):
+    """
+    Body of one SSE response: replay after ``last_id``, then live messages,
+    with a comment line every REALTIME_HEARTBEAT seconds to keep proxies
+    from closing an idle connection. Subscribes on first iteration, so it
+    runs on the loop that serves the response.
+    """
+    subscriber, replay, complete = hub.subscribe(channels, last_id)
+    heartbeat = getattr(settings, "REALTIME_HEARTBEAT", DEFAULT_HEARTBEAT)
+
+    try:
+        yield f"retry: {getattr(settings, 'REALTIME_RETRY_MS', DEFAULT_RETRY_MS)}\n\n"
+        if not complete:
+            yield format_event((hub.last_id, None, "resync", {}))
+        for message in replay:
+            yield format_event(message)
+
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+
+            yield format_event(message)
+            if subscriber.overflowed:
+                # Fell behind: tell the client to sync, and let it reconnect
+                yield format_event((hub.last_id, None, "resync", {}))
+                return
+    finally:
+        hub.unsubscribe(subscriber)
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # falls back to DRF's stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is left out of negotiation
+    msgpack = None
+
+
+# ============================
+# PAYLOAD RENDERERS
+# ============================
+_drf_default = encoders.JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Byte-for-byte the output of DRF's JSONRenderer, encoded with orjson.
+
+    Types orjson does not handle the same way (datetime, Decimal, querysets)
+    are handed to DRF's encoder, so the wire format does not change. Falls
+    back to JSONRenderer when orjson is missing or indented output is asked
+    for.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=_drf_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+
+        # Same JavaScript-safety escaping as JSONRenderer
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+def _msgpack_default(obj):
+    value = _drf_default(obj)
+    # Keep money exact: JSON turns a bare Decimal into a float, msgpack
+    # sends the string the serializers would have produced.
+    if isinstance(value, float) and not isinstance(obj, float):
+        return str(obj)
+    return value
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Compact binary encoding of the same payload, for slow mobile links."""
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+def payload_renderer_classes():
+    """
+    Renderers offered by the payload-heavy endpoints (sync/*, donations/,
+    expenses/), from ``settings.PAYLOAD_RENDERER_CLASSES``. MessagePack is
+    dropped when the msgpack package is not installed.
+    """
+    classes = [import_string(path) for path in settings.PAYLOAD_RENDERER_CLASSES]
+    if msgpack is None:
+        classes = [cls for cls in classes if not issubclass(cls, MessagePackRenderer)]
+    return classes
@@ -1,3 +1,4 @@
+from decimal import Decimal
 from rest_framework import serializers
 from .models import (
     User,
@@ -97,6 +98,7 @@ class DonationSerializer(serializers.ModelSerializer):
             "is_synced",
             "is_deleted",
         )
+        read_only_fields = ("change_seq",)
 
     # def validate_mandal_event(self, value):
     #     request = self.context.get("request")
@@ -131,6 +133,7 @@ class ExpenseSerializer(serializers.ModelSerializer):
             "is_synced",
             "is_deleted",
         )
+        read_only_fields = ("change_seq",)
 
     # def validate_mandal_event(self, value):
     #     request = self.context.get("request")
@@ -194,4 +197,30 @@ class MandalEventSerializer(serializers.ModelSerializer):
     class Meta:
         model = MandalEvent
         fields = ["id", "event", "event_name", "created_at"]
-        read_only_fields = ["created_at"]
\ No newline at end of file
+        read_only_fields = ["created_at"]
+
+# ============================
+# BATCHED PUSH (OFFLINE REPLAY)
+# ============================
+# The batch carries mandal_event once, and duplicate client ids are
+# resolved with one IN query per section, so the per-row FK lookup and
+# UniqueValidator queries are switched off here.
+class DonationPushSerializer(DonationSerializer):
+    class Meta(DonationSerializer.Meta):
+        exclude = DonationSerializer.Meta.exclude + ("mandal_event",)
+        extra_kwargs = {"client_donation_id": {"validators": []}}
+
+
+class ExpensePushSerializer(ExpenseSerializer):
+    class Meta(ExpenseSerializer.Meta):
+        exclude = ExpenseSerializer.Meta.exclude + ("mandal_event",)
+        extra_kwargs = {"client_expense_id": {"validators": []}}
+
+
+class WalletTransferPushSerializer(serializers.Serializer):
+    client_wallet_transfer_id = serializers.CharField(max_length=50)
+    amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal("0.01")
+    )
+    to_manager_id = serializers.IntegerField(required=False)
+    requested_at = serializers.DateTimeField(required=False)
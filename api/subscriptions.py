@@ -0,0 +1,149 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Mandal, MandalSubscription, SubscriptionPlan
+from .notifications import subscription_activated, subscriptions_expired
+
+
+# ============================
+# SUBSCRIPTION STATUS CACHE
+# ============================
+# The app asks for its mandal's status on every launch. The answer is
+# cached per mandal; an active subscription is never cached past its
+# end_date, so expiry needs no write on the read path (the
+# expire_subscriptions command flips is_active in bulk). Inactive
+# answers are cached briefly, so a fresh payment shows up quickly on
+# workers that did not handle the verification.
+DEFAULT_STATUS_TTL = 300
+DEFAULT_INACTIVE_TTL = 30
+
+
+def _cache_key(mandal_id):
+    return f"subscription-status:{mandal_id}"
+
+
+def _latest_active(mandal_id):
+    return (
+        MandalSubscription.objects
+        .filter(mandal_id=mandal_id, is_active=True)
+        .select_related("plan")
+        .order_by("-created_at")
+    )
+
+
+def _status(sub, now):
+    if sub is None:
+        return {"is_active": False}
+
+    return {
+        "is_active": sub.end_date >= now,
+        "plan": sub.plan.name,
+        "start_date": sub.start_date,
+        "end_date": sub.end_date,
+    }
+
+
+def subscription_status(mandal_id):
+    """``{"is_active", "plan", "start_date", "end_date"}`` for the mandal (just ``is_active`` when it never subscribed)."""
+    key = _cache_key(mandal_id)
+    status = cache.get(key)
+    if status is not None:
+        return status
+
+    now = timezone.now()
+    status = _status(_latest_active(mandal_id).first(), now)
+
+    ttl = _ttl(status, now)
+    if ttl > 0:
+        cache.set(key, status, ttl)
+    return status
+
+
+async def asubscription_status(mandal_id):
+    """Async ``subscription_status``."""
+    key = _cache_key(mandal_id)
+    status = await cache.aget(key)
+    if status is not None:
+        return status
+
+    now = timezone.now()
+    status = _status(await _latest_active(mandal_id).afirst(), now)
+
+    ttl = _ttl(status, now)
+    if ttl > 0:
+        await cache.aset(key, status, ttl)
+    return status
+
+
+def _ttl(status, now):
+    if status["is_active"]:
+        return min(
+            getattr(settings, "SUBSCRIPTION_STATUS_TTL", DEFAULT_STATUS_TTL),
+            (status["end_date"] - now).total_seconds(),
+        )
+    return getattr(settings, "SUBSCRIPTION_INACTIVE_TTL", DEFAULT_INACTIVE_TTL)
+
+
+def invalidate_subscription_status(mandal_id):
+    cache.delete(_cache_key(mandal_id))
+
+
+def expire_due_subscriptions(now=None):
+    """
+    Deactivate every active subscription past its end_date, in one UPDATE,
+    and tell the affected mandals' managers; returns the row count.
+    """
+    due = MandalSubscription.objects.filter(is_active=True, end_date__lt=now or timezone.now())
+
+    with transaction.atomic():
+        mandal_ids = sorted(set(due.values_list("mandal_id", flat=True)))
+        expired = due.filter(mandal_id__in=mandal_ids).update(is_active=False)
+        subscriptions_expired(mandal_ids)
+
+    return expired
+
+
+def activate_subscription(mandal_id, payment_id, user_upi_id=None, plan_name="GOLD"):
+    """
+    Start a year of ``plan_name`` for the mandal, paid by ``payment_id``,
+    replacing its active subscription. Idempotent per payment: the client's
+    verify call and the gateway webhook can both deliver the same payment,
+    and only the first activates. Returns ``(subscription, created)``.
+    """
+    with transaction.atomic():
+        # Serializes activations per mandal, so the check below sees a
+        # concurrent activation of the same payment once it commits
+        Mandal.objects.select_for_update().filter(pk=mandal_id).first()
+
+        existing = MandalSubscription.objects.filter(
+            mandal_id=mandal_id, payment_transaction_id=payment_id,
+        ).first()
+        if existing is not None:
+            return existing, False
+
+        plan = SubscriptionPlan.objects.get(name=plan_name)
+
+        # deactivate old subscription
+        MandalSubscription.objects.filter(
+            mandal_id=mandal_id,
+            is_active=True
+        ).update(is_active=False)
+
+        start = timezone.now()
+        subscription = MandalSubscription.objects.create(
+            mandal_id=mandal_id,
+            plan=plan,
+            start_date=start,
+            end_date=start + timedelta(days=365),
+            payment_transaction_id=payment_id,
+            user_upi_id=user_upi_id,
+            is_active=True
+        )
+        transaction.on_commit(lambda: invalidate_subscription_status(mandal_id))
+        subscription_activated(subscription)
+
+    return subscription, True
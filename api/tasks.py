@@ -0,0 +1,87 @@
+import logging
+
+from django.utils import timezone
+
+from .jobs import job
+from .ledger import rebuild_summary
+from .models import EventLedgerSummary, PaymentWebhookEvent
+from .notifications import collect_notifications, write_notifications
+from .subscriptions import expire_due_subscriptions
+from .wallet import stored_balance_drift
+from .webhooks import process_event, process_pending_webhooks
+
+logger = logging.getLogger(__name__)
+
+
+# ============================
+# JOB HANDLERS
+# ============================
+# What the run_jobs worker runs (api/jobs.py). Registered when the app
+# loads (ApiConfig.ready), so enqueue() knows each job's max_attempts in
+# the web process too.
+@job("subscriptions.expire", every=300)
+def expire_subscriptions():
+    with collect_notifications():
+        expire_due_subscriptions(timezone.now())
+
+
+@job("payments.webhook")
+def process_payment_webhook(payment_id):
+    """Activate one queued delivery; queued by record_delivery."""
+    event_id = (
+        PaymentWebhookEvent.objects
+        .filter(payment_id=payment_id)
+        .values_list("id", flat=True)
+        .first()
+    )
+    if event_id is None:
+        return
+
+    with collect_notifications():
+        status = process_event(event_id)
+    if status == "pending":
+        # Let the queue back off before the next attempt
+        raise RuntimeError(f"Payment {payment_id} not activated yet")
+
+
+@job("payments.webhooks", every=60, concurrency=1)
+def sweep_payment_webhooks():
+    """Anything a lost payments.webhook job left behind."""
+    with collect_notifications():
+        process_pending_webhooks()
+
+
+@job("notifications.flush")
+def write_outbox(notices):
+    write_notifications(notices, publish=False)
+
+
+@job("ledger.rebuild")
+def rebuild_ledger(mandal_event_id):
+    rebuild_summary(mandal_event_id)
+
+
+@job("ledger.reconcile", every=24 * 3600, concurrency=1)
+def reconcile_ledgers():
+    """Rebuild every event's summary from the raw rows and log any drift in the running totals."""
+    summaries = EventLedgerSummary.objects.values_list(
+        "mandal_event_id", "total_collection", "total_expense", "donation_count", "expense_count",
+    )
+    for mandal_event_id, *before in list(summaries):
+        summary = rebuild_summary(mandal_event_id)
+        after = [summary.total_collection, summary.total_expense, summary.donation_count, summary.expense_count]
+        if before != after:
+            logger.warning(
+                "ledger summary drifted",
+                extra={"mandal_event_id": mandal_event_id, "before": [str(v) for v in before], "after": [str(v) for v in after]},
+            )
+
+
+@job("wallet.reconcile", every=24 * 3600, concurrency=1)
+def reconcile_wallets():
+    """Log users whose stored wallet totals disagree with their approved transfers; changes nothing."""
+    for row in stored_balance_drift():
+        logger.warning(
+            "wallet balance drifted",
+            extra={key: str(value) if key != "user_id" else value for key, value in row.items()},
+        )
@@ -0,0 +1,90 @@
+from functools import wraps
+
+from rest_framework.response import Response
+
+from .models import MandalEvent
+
+
+# ============================
+# REQUEST TENANT CONTEXT
+# ============================
+class Tenant:
+    """
+    What an event-scoped view needs to know about the caller, resolved once
+    per request by ``@event_scoped`` and stored on ``request.tenant``.
+    """
+    def __init__(self, user, mandal_event=None):
+        self.user = user
+        self.mandal_event = mandal_event
+
+
+def resolve_event(user, event_id):
+    """
+    The caller's event, in one query; None when the id is not one of the
+    caller's mandal's events.
+    """
+    try:
+        mandal_event = _event_query(user, event_id).first()
+    except (TypeError, ValueError):
+        return None
+
+    return _tenant(user, mandal_event)
+
+
+async def aresolve_event(user, event_id):
+    """Async ``resolve_event``."""
+    try:
+        mandal_event = await _event_query(user, event_id).afirst()
+    except (TypeError, ValueError):
+        return None
+
+    return _tenant(user, mandal_event)
+
+
+def _event_query(user, event_id):
+    return MandalEvent.objects.filter(id=int(event_id), mandal_id=user.mandal_id)
+
+
+def _tenant(user, mandal_event):
+    if mandal_event is None:
+        return None
+    return Tenant(user, mandal_event)
+
+
+def event_scoped(param="event_id", source="query", required=True):
+    """
+    Resolve the event named by ``param`` (query string or request body)
+    into ``request.tenant`` before the view runs; goes under ``@api_view``
+    and its policy decorators::
+
+        @api_view(["GET"])
+        @permission_classes([IsAuthenticated])
+        @event_scoped()
+        def sync_donations(request):
+            mandal_event = request.tenant.mandal_event
+
+    Missing ``param`` is a 400 (unless ``required=False``, which leaves
+    ``request.tenant`` as None); an event outside the caller's mandal is a
+    403, as the views answered before.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            data = request.GET if source == "query" else request.data
+            event_id = data.get(param) if hasattr(data, "get") else None
+
+            if not event_id:
+                if required:
+                    message = f"{param} required" if source == "query" else f"{param} is required"
+                    return Response({"error": message}, status=400)
+                request.tenant = None
+                return view(request, *args, **kwargs)
+
+            tenant = resolve_event(request.user, event_id)
+            if tenant is None:
+                return Response({"error": "Invalid event"}, status=403)
+
+            request.tenant = tenant
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,3 +1,1247 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import re
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.urls import resolve
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import (
+    AppNotification,
+    CollectorRollup,
+    Donation,
+    EventLedgerSummary,
+    EventMaster,
+    Expense,
+    Job,
+    JobLock,
+    Mandal,
+    MandalEvent,
+    MandalSubscription,
+    PaymentWebhookEvent,
+    SubscriptionPlan,
+    User,
+    WalletTransfer,
+)
+from . import async_views
+from .authentication import CachedJWTAuthentication, invalidate_user, tokens_for, user_cache
+from .changes import bump_mandal_version, reserve_change_seq
+from .ledger import rebuild_summary
+from .log import JsonFormatter, NonBlockingHandler, RequestIdFilter, SamplingFilter, request_id_var
+from . import renderers
+from .renderers import FastJSONRenderer
+from .fast_serializers import fast_donations, fast_expenses
+from .pagination import keyset_page
+from .serializers import DonationSerializer, ExpenseSerializer
+from . import jobs
+from .payments import get_gateway, reset_gateway
+from .webhooks import process_pending_webhooks
+from .notifications import collect_notifications
+from .realtime import hub
+from .wallet import settle_transfers, stored_balance_drift, wallet_balances
+from .middleware import QueryCountMiddleware
+from .queries import count_queries, get_query_budget
+
+
+# ============================
+# QUERY PLAN REGRESSION SUITE
+# ============================
+# Every hot endpoint is called against a seeded database, each SELECT it
+# ran is EXPLAINed, and the test fails if any table is read with a full
+# scan. Small lookup tables are allowed to be scanned.
+SCAN_ALLOWED_TABLES = {"api_eventmaster", "api_subscriptionplan"}
+
+
+def full_scans(sql):
+    """Tables (or aliases) the database would read with a full scan for ``sql``."""
+    vendor = connection.vendor
+
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            details = [row[-1] for row in cursor.fetchall()]
+            return [
+                match.group(1)
+                for match in (re.match(r"SCAN (?:TABLE )?(\w+)$", d) for d in details)
+                if match
+            ]
+
+        if vendor == "mysql":
+            cursor.execute("EXPLAIN " + sql)
+            columns = [col[0] for col in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return [row["table"] for row in rows if row["type"] == "ALL"]
+
+        if vendor == "postgresql":
+            cursor.execute("EXPLAIN " + sql)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            return re.findall(r"Seq Scan on (\w+)", plan)
+
+    return []
+
+
+class SeededAPITestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.plan = SubscriptionPlan.objects.create(name="GOLD", price=999)
+        festival = EventMaster.objects.create(event_name="Ganeshotsav")
+
+        # A few mandals so "this mandal / this event" is actually selective
+        for m in range(4):
+            mandal = Mandal.objects.create(name=f"Mandal {m}")
+            manager = User.objects.create_user(
+                mobile=f"90000000{m}0", password="pw", name=f"Manager {m}",
+                mandal=mandal, role="Manager",
+            )
+            volunteer = User.objects.create_user(
+                mobile=f"90000000{m}1", password="pw", name=f"Volunteer {m}",
+                mandal=mandal, role="User",
+            )
+            event = MandalEvent.objects.create(mandal=mandal, event=festival)
+
+            Donation.objects.bulk_create([
+                Donation(
+                    mandal_event=event, mandal=mandal,
+                    created_by=manager if i % 2 else volunteer,
+                    created_by_name="x", donor_name=f"Donor {i}", amount=101,
+                    whatsapp_number="9", donation_type="Cash", received_by="x",
+                    date=now - timedelta(minutes=i), client_donation_id=f"d-{m}-{i}",
+                    change_seq=i + 1, is_deleted=(i % 17 == 0),
+                )
+                for i in range(150)
+            ])
+            Expense.objects.bulk_create([
+                Expense(
+                    mandal_event=event, mandal=mandal, created_by=manager,
+                    created_by_name="x", category="Decor", amount=50,
+                    payment_mode="Cash", paid_to="x",
+                    date=now - timedelta(minutes=i), client_expense_id=f"e-{m}-{i}",
+                    change_seq=200 + i,
+                )
+                for i in range(60)
+            ])
+            WalletTransfer.objects.bulk_create([
+                WalletTransfer(
+                    from_user_id=volunteer.id, to_manager_id=manager.id,
+                    mandal=mandal, mandal_event=event, amount=10,
+                    status=("Pending", "Approved", "Rejected")[i % 3],
+                    client_wallet_transfer_id=f"w-{m}-{i}",
+                    requested_at=now - timedelta(minutes=i),
+                )
+                for i in range(30)
+            ])
+            AppNotification.objects.bulk_create([
+                AppNotification(
+                    to_user_id=manager.id, title="t", message="m",
+                    type="info", created_at=now - timedelta(minutes=i),
+                )
+                for i in range(30)
+            ])
+            MandalSubscription.objects.create(
+                mandal=mandal, plan=cls.plan, start_date=now,
+                end_date=now + timedelta(days=365), payment_transaction_id=f"pay-{m}",
+            )
+
+            User.objects.create_user(
+                mobile=f"90000000{m}2", password="pw", name=f"Helper {m}",
+                mandal=mandal, role="User",
+            )
+            # The event's counter is past every seeded row, as reserve_change_seq leaves it
+            MandalEvent.objects.filter(pk=event.id).update(change_seq=259)
+            rebuild_summary(event.id)
+
+        cls.mandal = mandal
+        cls.manager = manager
+        cls.volunteer = volunteer
+        cls.event = event
+
+    def setUp(self):
+        # Primary keys are reused between test classes on SQLite, and
+        # cached answers would hide the queries under test
+        user_cache.clear()
+        cache.clear()
+
+    def auth(self, user):
+        token = RefreshToken.for_user(user).access_token
+        return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def call(self, method, path, user, data=None):
+        if method == "get":
+            return self.client.get(path, **self.auth(user))
+        return self.client.post(path, data or {}, content_type="application/json", **self.auth(user))
+
+
+class DeltaSyncTests(SeededAPITestCase):
+    def sync(self, since, **params):
+        query = "&".join(f"{k}={v}" for k, v in dict(event_id=self.event.id, since=since, **params).items())
+        response = self.call("get", f"/api/sync/donations/?{query}", self.manager)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_since_returns_only_newer_rows(self):
+        page = self.sync(140)
+        self.assertEqual([d["change_seq"] for d in page["donations"]], list(range(141, 151)))
+        self.assertEqual((page["deleted"], page["cursor"], page["has_more"]), ([], 150, False))
+
+        page = self.sync(140, limit=4)
+        self.assertEqual([d["change_seq"] for d in page["donations"]], [141, 142, 143, 144])
+        self.assertEqual((page["cursor"], page["has_more"]), (144, True))
+        self.assertEqual(self.sync(page["cursor"])["donations"][0]["change_seq"], 145)
+
+        page = self.sync(259)
+        self.assertEqual((page["donations"], page["deleted"], page["cursor"]), ([], [], 259))
+
+    def test_delete_sends_tombstone(self):
+        # d-3-2 is the volunteer's own donation, d-3-1 the manager's
+        response = self.client.delete("/api/donations/delete/d-3-1/", **self.auth(self.volunteer))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.delete("/api/donations/delete/d-3-2/", **self.auth(self.volunteer))
+        self.assertEqual(response.status_code, 200)
+
+        page = self.sync(259)
+        self.assertEqual(page["donations"], [])
+        self.assertEqual(page["deleted"], [{"client_donation_id": "d-3-2", "change_seq": 260}])
+        self.assertEqual(page["cursor"], 260)
+        self.assertEqual(self.sync(260)["deleted"], [])
+
+    def test_reserve_bumps_event_and_mandal_together(self):
+        version = Mandal.objects.get(pk=self.event.mandal_id).data_version
+        with transaction.atomic(), CaptureQueriesContext(connection) as ctx:
+            first = reserve_change_seq(self.event.id, 3)
+        self.assertEqual(first, 260)
+        self.assertLessEqual(len(ctx), 2)
+        self.assertEqual(MandalEvent.objects.get(pk=self.event.id).change_seq, 262)
+        self.assertEqual(Mandal.objects.get(pk=self.event.mandal_id).data_version, version + 1)
+
+        with self.assertRaises(MandalEvent.DoesNotExist), transaction.atomic():
+            reserve_change_seq(0)
+
+    def test_double_delete_leaves_ledger_once(self):
+        summary = EventLedgerSummary.objects.get(mandal_event=self.event)
+        rollup = CollectorRollup.objects.get(mandal_event=self.event, user=self.volunteer)
+
+        statuses = [
+            self.client.delete("/api/donations/delete/d-3-2/", **self.auth(self.volunteer)).status_code
+            for _ in range(2)
+        ]
+        self.assertEqual(statuses, [200, 404])
+
+        after = EventLedgerSummary.objects.get(mandal_event=self.event)
+        self.assertEqual(after.total_collection, summary.total_collection - 101)
+        self.assertEqual(after.donation_count, summary.donation_count - 1)
+        after = CollectorRollup.objects.get(mandal_event=self.event, user=self.volunteer)
+        self.assertEqual((after.total, after.donation_count), (rollup.total - 101, rollup.donation_count - 1))
+
+    def test_push_batch_is_idempotent(self):
+        donation = {
+            "donor_name": "New", "amount": "10", "whatsapp_number": "9",
+            "donation_type": "Cash", "received_by": "x", "created_by_name": "x",
+            "date": "2026-09-01T10:00:00Z", "client_donation_id": "push-1",
+        }
+        batch = {
+            "mandal_event": self.event.id,
+            "donations": [donation, donation, dict(donation, client_donation_id="d-3-1"), {"client_donation_id": "bad"}],
+            "wallet_requests": [{"client_wallet_transfer_id": "push-w", "amount": "5"}],
+        }
+        summary = EventLedgerSummary.objects.get(mandal_event=self.event)
+
+        response = self.call("post", "/api/sync/push/", self.volunteer, batch)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual(
+            [r["status"] for r in results["donations"]], ["created", "duplicate", "duplicate", "error"],
+        )
+        self.assertEqual(results["wallet_requests"], [{"client_wallet_transfer_id": "push-w", "status": "created"}])
+        self.assertEqual(
+            WalletTransfer.objects.get(client_wallet_transfer_id="push-w").to_manager_id, self.manager.id,
+        )
+
+        after = EventLedgerSummary.objects.get(mandal_event=self.event)
+        self.assertEqual(after.total_collection, summary.total_collection + 10)
+        self.assertEqual([d["client_donation_id"] for d in self.sync(259)["donations"]], ["push-1"])
+
+        # The client's retry of the same batch writes nothing
+        results = self.call("post", "/api/sync/push/", self.volunteer, batch).json()
+        self.assertEqual([r["status"] for r in results["donations"]][:3], ["duplicate"] * 3)
+        self.assertEqual(results["wallet_requests"][0]["status"], "duplicate")
+        self.assertEqual(EventLedgerSummary.objects.get(mandal_event=self.event).total_collection, after.total_collection)
+
+        with override_settings(SYNC_PUSH_MAX_ITEMS=2):
+            self.assertEqual(self.call("post", "/api/sync/push/", self.volunteer, batch).status_code, 400)
+
+    def test_expense_list_checks_event(self):
+        response = self.call("get", f"/api/expenses/?event_id={self.event.id}", self.manager)
+        self.assertEqual(len(response.json()), 60)
+        self.assertEqual(self.call("get", "/api/expenses/?event_id=abc", self.manager).status_code, 403)
+        other = MandalEvent.objects.exclude(mandal=self.mandal).values_list("id", flat=True).first()
+        self.assertEqual(self.call("get", f"/api/expenses/?event_id={other}", self.manager).status_code, 403)
+
+    def test_delete_stays_in_own_mandal(self):
+        other_manager = User.objects.get(mobile="9000000000")
+        response = self.client.delete("/api/donations/delete/d-3-4/", **self.auth(other_manager))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Donation.objects.get(client_donation_id="d-3-4").is_deleted)
+
+        response = self.client.delete("/api/expenses/delete/e-3-4/", **self.auth(other_manager))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.delete("/api/expenses/delete/e-3-4/", **self.auth(self.manager))
+        self.assertEqual(response.status_code, 200)
+
+
+class KeysetPaginationTests(SeededAPITestCase):
+    def walk(self, limit):
+        pages, cursor = [], ""
+        while cursor is not None:
+            path = f"/api/donations/?event_id={self.event.id}&limit={limit}&cursor={cursor}"
+            response = self.call("get", path, self.manager)
+            self.assertEqual(response.status_code, 200)
+            pages.append([d["client_donation_id"] for d in response.json()["results"]])
+            cursor = response.json()["next_cursor"]
+        return pages
+
+    def test_pages_cover_the_list_once(self):
+        # Rows sharing a timestamp straddle a page boundary: id breaks the tie
+        shared = Donation.objects.get(client_donation_id="d-3-5").date
+        Donation.objects.filter(client_donation_id__in=[f"d-3-{i}" for i in range(1, 10)]).update(date=shared)
+
+        full = self.call("get", f"/api/donations/?event_id={self.event.id}", self.manager).json()
+        pages = self.walk(4)
+        walked = [client_id for page in pages for client_id in page]
+        self.assertEqual(len(walked), 141)
+        self.assertEqual(set(walked), {d["client_donation_id"] for d in full})
+        self.assertEqual([len(page) for page in pages], [4] * 35 + [1])
+
+        # An exact multiple ends on a full page with no cursor after it
+        self.assertEqual([len(page) for page in self.walk(141)], [141])
+
+    @override_settings(LIST_PAGE_SIZE=50)
+    def test_limit_is_capped(self):
+        path = f"/api/donations/?event_id={self.event.id}"
+        self.assertEqual(len(self.call("get", f"{path}&limit=1000", self.manager).json()["results"]), 50)
+        self.assertEqual(len(self.call("get", f"{path}&limit=0", self.manager).json()["results"]), 1)
+
+    def test_invalid_cursor(self):
+        path = f"/api/donations/?event_id={self.event.id}&cursor="
+        for raw in (b"garbage", b"not-a-date|1", b"2026-01-01T00:00:00|x"):
+            cursor = base64.urlsafe_b64encode(raw).decode()
+            self.assertEqual(self.call("get", path + cursor, self.manager).status_code, 400)
+        self.assertEqual(self.call("get", path + "%%%", self.manager).status_code, 400)
+
+
+class ConditionalGetTests(SeededAPITestCase):
+    def get(self, path, user=None, **headers):
+        return self.client.get(path, **self.auth(user or self.manager), **headers)
+
+    def test_event_reads_answer_304_until_a_write(self):
+        path = f"/api/dashboard/summary/?event_id={self.event.id}"
+        response = self.get(path)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"'))
+
+        response = self.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response["ETag"]), (304, etag))
+        self.assertEqual(self.get(path, HTTP_IF_NONE_MATCH=f'"other", W/{etag}').status_code, 304)
+
+        # Who asks and in which format are part of the tag
+        self.assertNotEqual(self.get(path, self.volunteer)["ETag"], etag)
+        self.assertNotEqual(self.get(path, HTTP_ACCEPT="*/*")["ETag"], etag)
+
+        self.client.delete("/api/donations/delete/d-3-2/", **self.auth(self.volunteer))
+        response = self.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_mandal_reads_follow_data_version(self):
+        etag = self.get("/api/my-events/")["ETag"]
+        self.assertEqual(self.get("/api/my-events/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        bump_mandal_version(self.mandal.id)
+        self.assertEqual(self.get("/api/my-events/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CompressionTests(SeededAPITestCase):
+    def get(self, path, **headers):
+        return self.client.get(path, **self.auth(self.manager), **headers)
+
+    def test_gzip_body_gets_a_weak_etag(self):
+        path = f"/api/donations/?event_id={self.event.id}"
+        plain = self.get(path)
+        self.assertNotIn("Content-Encoding", plain)
+
+        response = self.get(path, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(json.loads(gzip.decompress(response.content)), plain.json())
+        self.assertEqual(response["ETag"], "W/" + plain["ETag"])
+
+        # The client sends back the weak tag it was given
+        response = self.get(path, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_streamed_list_is_compressed_chunk_by_chunk(self):
+        path = f"/api/donations/?event_id={self.event.id}"
+        with override_settings(STREAM_CHUNK_SIZE=20):
+            response = self.get(path + "&stream=1", HTTP_ACCEPT_ENCODING="gzip")
+            chunks = list(response.streaming_content)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(json.loads(gzip.decompress(b"".join(chunks))), self.get(path).json())
+
+    def test_skips_small_and_refused_bodies(self):
+        self.assertNotIn("Content-Encoding", self.get("/api/ping/", HTTP_ACCEPT_ENCODING="gzip"))
+        path = f"/api/donations/?event_id={self.event.id}"
+        self.assertNotIn("Content-Encoding", self.get(path, HTTP_ACCEPT_ENCODING="gzip;q=0, identity"))
+
+
+class FastSerializerTests(SeededAPITestCase):
+    def assertMatchesDRF(self, fast, serializer_class, qs):
+        self.assertEqual(fast.many(qs), serializer_class(qs, many=True).data)
+
+    def test_matches_model_serializers(self):
+        Donation.objects.filter(client_donation_id="d-3-1").update(amount=Decimal("12.5"), remarks=None)
+        Donation.objects.filter(client_donation_id="d-3-2").update(amount=Decimal("0.07"), remarks="note")
+
+        donations = Donation.objects.filter(mandal=self.mandal).order_by("id")
+        expenses = Expense.objects.filter(mandal=self.mandal).order_by("id")
+        self.assertMatchesDRF(fast_donations, DonationSerializer, donations)
+        self.assertMatchesDRF(fast_expenses, ExpenseSerializer, expenses)
+
+        with timezone.override("Asia/Kolkata"):
+            self.assertMatchesDRF(fast_donations, DonationSerializer, donations.all()[:5])
+
+    def test_pages_and_streams_use_the_same_shape(self):
+        qs = Donation.objects.filter(mandal_event=self.event, is_deleted=False)
+        expected = DonationSerializer(qs.order_by("-date", "-id")[:10], many=True).data
+        results, _ = keyset_page(qs, None, 10, fast_donations)
+        self.assertEqual(results, expected)
+
+
+class RendererTests(SeededAPITestCase):
+    def test_fast_json_matches_drf(self):
+        data = {
+            "amount": Decimal("10.50"), "at": timezone.now(), "on": timezone.now().date(),
+            "text": "line\u2028sep\u2029 \u0917\u0923\u0947\u0936",
+            "rows": [{"n": 1, "x": None, "ok": True}], 3: "int key",
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    @skipUnless(renderers.msgpack, "msgpack is not installed")
+    def test_msgpack_negotiation(self):
+        path = f"/api/sync/donations/?event_id={self.event.id}"
+        as_json = self.call("get", path, self.manager)
+        self.assertEqual(as_json["Content-Type"], "application/json")
+
+        response = self.client.get(path, HTTP_ACCEPT="application/msgpack", **self.auth(self.manager))
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(renderers.msgpack.unpackb(response.content), as_json.json())
+        self.assertLess(len(response.content), len(as_json.content))
+
+        response = self.call("get", path + "&format=msgpack", self.manager)
+        self.assertEqual(renderers.msgpack.unpackb(response.content), as_json.json())
+
+        # Only the payload endpoints offer it
+        response = self.client.get("/api/wallet/", HTTP_ACCEPT="application/msgpack", **self.auth(self.manager))
+        self.assertEqual(response.status_code, 406)
+
+
+class StructuredLoggingTests(TestCase):
+    def handler(self, maxsize=100, name="api.tests.log"):
+        stream = io.StringIO()
+        handler = NonBlockingHandler(stream, maxsize=maxsize)
+        handler.setFormatter(JsonFormatter())
+        handler.addFilter(RequestIdFilter())
+        logger = logging.getLogger(name)
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(handler.stop)
+        return logger, handler, stream
+
+    def test_json_lines_are_redacted_and_carry_the_request_id(self):
+        logger, handler, stream = self.handler()
+        token = request_id_var.set("req-1")
+        try:
+            logger.warning(
+                "login %s", "failed",
+                extra={"payload": {"mobile": "9876543210", "password": "pw", "amount": "10"}, "token": "abc"},
+            )
+        finally:
+            request_id_var.reset(token)
+        handler.stop()
+
+        line = json.loads(stream.getvalue())
+        self.assertEqual((line["level"], line["msg"], line["request_id"]), ("WARNING", "login failed", "req-1"))
+        self.assertEqual(line["payload"], {"mobile": "******3210", "password": "[redacted]", "amount": "10"})
+        self.assertEqual(line["token"], "[redacted]")
+
+    def test_secrets_in_text_are_redacted(self):
+        logger, handler, stream = self.handler()
+        logger.warning("GET %s", "/api/x/?event_id=3&token=eyJabc", extra={"path": "/y/?Ticket=t1&a=2"})
+        handler.stop()
+
+        line = json.loads(stream.getvalue())
+        self.assertEqual(line["msg"], "GET /api/x/?event_id=3&token=[redacted]")
+        self.assertEqual(line["path"], "/y/?Ticket=[redacted]&a=2")
+
+    def test_django_request_lines_keep_the_request_id(self):
+        # Logged after RequestIdMiddleware has returned
+        logger, handler, stream = self.handler(name="django.request")
+        self.client.get("/api/events/stream/?token=eyJabc", HTTP_X_REQUEST_ID="req-9")
+        handler.stop()
+
+        line = json.loads(stream.getvalue())
+        self.assertEqual((line["status_code"], line["request_id"]), (501, "req-9"))
+        self.assertIn("token=[redacted]", line["request"])
+        self.assertNotIn("eyJabc", stream.getvalue())
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        logger, handler, stream = self.handler(maxsize=2)
+        handler.pid = os.getpid()  # no listener draining the queue
+        for i in range(5):
+            logger.info("line %d", i)
+        self.assertEqual((handler.queue.qsize(), handler.dropped), (2, 3))
+
+        # Once there is room, the count goes out ahead of the next record
+        handler.queue.get_nowait()
+        handler.queue.get_nowait()
+        logger.info("after")
+        notice, after = handler.queue.get_nowait(), handler.queue.get_nowait()
+        self.assertEqual((notice.getMessage(), after.getMessage(), handler.dropped), (
+            "dropped 3 log records: queue full", "after", 0,
+        ))
+
+    def test_debug_sampling_is_per_request(self):
+        record = logging.makeLogRecord({"levelno": logging.DEBUG})
+        sampling = SamplingFilter()
+        with override_settings(LOG_DEBUG_SAMPLE_RATE=0.5):
+            decisions = set()
+            for request_id in ("a", "b", "c", "d", "e", "f"):
+                token = request_id_var.set(request_id)
+                decisions.add(tuple(sampling.filter(record) for _ in range(3)))
+                request_id_var.reset(token)
+        self.assertEqual(decisions, {(True,) * 3, (False,) * 3})
+
+        with override_settings(LOG_DEBUG_SAMPLE_RATE=0):
+            self.assertFalse(sampling.filter(record))
+            self.assertTrue(sampling.filter(logging.makeLogRecord({"levelno": logging.INFO})))
+
+    def test_request_id_header(self):
+        response = self.client.get("/api/ping/", HTTP_X_REQUEST_ID="client-id.1")
+        self.assertEqual(response["X-Request-ID"], "client-id.1")
+        response = self.client.get("/api/ping/", HTTP_X_REQUEST_ID="bad id\n")
+        self.assertRegex(response["X-Request-ID"], r"^[0-9a-f]{32}$")
+
+
+class CachedAuthTests(SeededAPITestCase):
+    def authenticate(self, user, token=None):
+        token = token or tokens_for(user).access_token
+        return CachedJWTAuthentication().get_user(token)
+
+    def test_hits_skip_the_database(self):
+        self.authenticate(self.volunteer)
+        with self.assertNumQueries(0):
+            user = self.authenticate(self.volunteer)
+        self.assertEqual(user.mandal.name, self.mandal.name)
+
+        # Each request gets its own copy
+        user.name = "changed"
+        user.mandal.name = "changed"
+        again = self.authenticate(self.volunteer)
+        self.assertEqual((again.name, again.mandal.name), (self.volunteer.name, self.mandal.name))
+
+    def test_writes_invalidate(self):
+        self.authenticate(self.volunteer)
+        response = self.call("post", "/api/user/update/", self.manager, {
+            "user_id": self.volunteer.id, "name": "Renamed",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.authenticate(self.volunteer).name, "Renamed")
+
+        self.call("post", "/api/user/update-profile/", self.manager, {"mandal_name": "New Mandal"})
+        self.assertEqual(self.authenticate(self.volunteer).mandal.name, "New Mandal")
+
+    def test_deactivated_user_is_rejected(self):
+        path = "/api/sync/user/"
+        self.assertEqual(self.call("get", path, self.volunteer).status_code, 200)
+        User.objects.filter(id=self.volunteer.id).update(is_active=False)
+        invalidate_user(self.volunteer.id)
+        self.assertEqual(self.call("get", path, self.volunteer).status_code, 401)
+
+    def test_claims_newer_than_the_cache_refetch(self):
+        self.authenticate(self.volunteer)
+        # Promoted in another worker: this process's cache still says "User"
+        User.objects.filter(id=self.volunteer.id).update(role="Manager")
+        self.volunteer.role = "Manager"
+        self.assertEqual(self.authenticate(self.volunteer).role, "Manager")
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_ttl_zero_disables_the_cache(self):
+        self.authenticate(self.volunteer)
+        with self.assertNumQueries(1):
+            self.authenticate(self.volunteer)
+
+
+class WalletSettlementTests(SeededAPITestCase):
+    def balances(self, *users):
+        return [
+            tuple(User.objects.filter(id=user.id).values_list("wallet_balance", "total_transferred").get())
+            for user in users
+        ]
+
+    def received(self, user):
+        return wallet_balances(self.event, user_ids=[user.id])[0]["received"]
+
+    def test_settle_moves_money_to_the_addressee(self):
+        # w-3-0 and w-3-3 are pending, w-3-1 already approved
+        approver = User.objects.create_user(
+            mobile="9000000039", password="pw", name="Second Manager", mandal=self.mandal, role="Manager",
+        )
+        before = self.balances(self.volunteer, self.manager, approver)
+        received = self.received(self.manager)
+
+        response = self.call("post", "/api/wallet/settle/", approver, {
+            "approve": ["w-3-0", "w-3-1", "w-0-0"], "reject": ["w-3-3", "nope"],
+        })
+        self.assertEqual(response.json(), {
+            "approved": ["w-3-0"], "rejected": ["w-3-3"], "not_found": ["nope", "w-0-0", "w-3-1"],
+        })
+
+        (vol_balance, vol_sent), (mgr_balance, _), approver_after = self.balances(self.volunteer, self.manager, approver)
+        self.assertEqual((vol_balance, vol_sent), (before[0][0] - 10, before[0][1] + 10))
+        self.assertEqual(mgr_balance, before[1][0] + 10)
+        self.assertEqual(approver_after, before[2])
+        self.assertEqual(self.received(self.manager), received + 10)
+
+        statuses = dict(WalletTransfer.objects.filter(
+            client_wallet_transfer_id__in=["w-3-0", "w-3-3"],
+        ).values_list("client_wallet_transfer_id", "status"))
+        self.assertEqual(statuses, {"w-3-0": "Approved", "w-3-3": "Rejected"})
+
+        # Settled transfers cannot be settled again
+        response = self.call("post", "/api/wallet/settle/", self.manager, {"approve": ["w-3-0"], "reject": ["w-3-3"]})
+        self.assertEqual(response.json()["not_found"], ["w-3-0", "w-3-3"])
+        self.assertEqual(self.balances(self.volunteer)[0], (vol_balance, vol_sent))
+
+    def test_reconcile_flags_stored_balance_drift(self):
+        # The seed writes approved transfers but leaves the stored totals at 0
+        drifted = {row["user_id"]: row for row in stored_balance_drift()}
+        self.assertEqual(drifted[self.volunteer.id]["expected_balance"], -100)
+        self.assertEqual(drifted[self.manager.id]["expected_balance"], 100)
+
+        User.objects.filter(id=self.volunteer.id).update(wallet_balance=-100, total_transferred=100)
+        User.objects.filter(id=self.manager.id).update(wallet_balance=100)
+        settle_transfers(self.manager, approve_ids=["w-3-0"])
+        drifted = {row["user_id"] for row in stored_balance_drift()}
+        self.assertNotIn(self.volunteer.id, drifted)
+        self.assertNotIn(self.manager.id, drifted)
+
+        with self.assertLogs("api.tasks", "WARNING") as logs:
+            jobs.enqueue("wallet.reconcile")
+            self.assertEqual(run_due_jobs(), ["done"])
+        self.assertTrue(all("wallet balance drifted" in line for line in logs.output))
+
+    def test_wallet_request_counts_toward_event_balances(self):
+        response = self.call("post", "/api/wallet/create/", self.volunteer, {
+            "mandal_event": self.event.id, "amount": "25", "client_wallet_transfer_id": "w-new",
+        })
+        self.assertEqual(response.status_code, 201)
+        transfer = WalletTransfer.objects.get(client_wallet_transfer_id="w-new")
+        self.assertEqual((transfer.mandal_event_id, transfer.to_manager_id), (self.event.id, self.manager.id))
+
+        response = self.call("post", "/api/wallet/create/", self.volunteer, {
+            "mandal_event": self.event.id, "amount": "25", "client_wallet_transfer_id": "w-bad",
+            "to_manager_id": self.volunteer.id,
+        })
+        self.assertEqual(response.status_code, 400)
+
+        before = self.call("get", f"/api/sync/wallet/?event_id={self.event.id}", self.volunteer).json()
+        settle_transfers(self.manager, approve_ids=["w-new"])
+        after = self.call("get", f"/api/sync/wallet/?event_id={self.event.id}", self.volunteer).json()
+        self.assertEqual(Decimal(after["wallet_balance"]), Decimal(before["wallet_balance"]) - 25)
+
+    def test_single_approve_and_reject(self):
+        response = self.call("post", "/api/wallet/approve/", self.manager, {"client_wallet_transfer_id": "w-3-6"})
+        self.assertEqual(response.status_code, 200)
+        response = self.call("post", "/api/wallet/approve/", self.manager, {"client_wallet_transfer_id": "w-3-6"})
+        self.assertEqual(response.status_code, 404)
+
+        response = self.call("post", "/api/wallet/reject/", self.manager, {"client_wallet_transfer_id": "w-3-9"})
+        self.assertEqual(response.status_code, 200)
+        response = self.call("post", "/api/wallet/reject/", self.volunteer, {"client_wallet_transfer_id": "w-3-12"})
+        self.assertEqual(response.status_code, 403)
+
+
+class MetricsEndpointTests(TestCase):
+    def test_closed_without_token(self):
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+        with override_settings(METRICS_TOKEN="scrape"):
+            self.assertEqual(self.client.get("/metrics").status_code, 401)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b"# TYPE http_requests_total counter", response.content)
+
+
+class QueryPlanTests(SeededAPITestCase):
+    def assertNoFullScans(self, method, path, user, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.call(method, path, user, data)
+
+        self.assertLess(response.status_code, 400, f"{path}: {response.status_code}")
+
+        for query in ctx.captured_queries:
+            sql = query["sql"]
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+
+            scans = [t for t in full_scans(sql) if t not in SCAN_ALLOWED_TABLES]
+            self.assertEqual(scans, [], f"{path} full scan:\n{sql}")
+
+    def test_sync_endpoints(self):
+        event = self.event.id
+        for path in (
+            f"/api/sync/donations/?event_id={event}",
+            f"/api/sync/donations/?event_id={event}&since=10",
+            f"/api/sync/expenses/?event_id={event}",
+            f"/api/sync/expenses/?event_id={event}&since=10",
+        ):
+            self.assertNoFullScans("get", path, self.manager)
+
+    def test_donation_lists(self):
+        event = self.event.id
+        for path, user in (
+            (f"/api/donations/?event_id={event}", self.manager),
+            (f"/api/donations/?event_id={event}", self.volunteer),
+            (f"/api/donations/?event_id={event}&limit=20", self.manager),
+            (f"/api/collections/user/{self.volunteer.id}/?limit=20", self.manager),
+        ):
+            self.assertNoFullScans("get", path, user)
+
+    def test_summaries(self):
+        event = self.event.id
+        for path in (
+            f"/api/dashboard/summary/?event_id={event}",
+            f"/api/collections/summary/?event_id={event}",
+            "/api/collections/summary/",
+            "/api/my-events/",
+        ):
+            self.assertNoFullScans("get", path, self.manager)
+
+    def test_wallet_endpoints(self):
+        self.assertNoFullScans("get", "/api/wallet/", self.manager)
+        self.assertNoFullScans("get", f"/api/wallet/balances/?event_id={self.event.id}", self.manager)
+        self.assertNoFullScans(
+            "post", "/api/wallet/settle/", self.manager,
+            {"approve": ["w-3-0"], "reject": ["w-3-3"]},
+        )
+
+    def test_notifications_and_subscription(self):
+        self.assertNoFullScans("get", "/api/notifications/", self.manager)
+        self.assertNoFullScans("get", f"/api/subscription-status/{self.mandal.id}/", self.manager)
+
+    def test_push(self):
+        self.assertNoFullScans(
+            "post", "/api/sync/push/", self.volunteer,
+            {
+                "mandal_event": self.event.id,
+                "donations": [{
+                    "donor_name": "New", "amount": "10", "whatsapp_number": "9",
+                    "donation_type": "Cash", "received_by": "x", "created_by_name": "x",
+                    "date": "2026-09-01T10:00:00Z", "client_donation_id": "push-1",
+                }],
+            },
+        )
+
+
+# ============================
+# QUERY BUDGETS
+# ============================
+# Each endpoint declares the most queries it may run (@query_budget); the
+# tests fail when a change goes over it or repeats one query shape per row.
+class QueryBudgetTests(SeededAPITestCase):
+    def assertWithinBudget(self, method, path, user, data=None):
+        budget = get_query_budget(resolve(path.split("?")[0]).func)
+        self.assertIsNotNone(budget, f"{path} declares no @query_budget")
+
+        with count_queries() as stats:
+            response = self.call(method, path, user, data)
+
+        self.assertLess(response.status_code, 400, f"{path}: {response.status_code}")
+        self.assertLessEqual(stats.count, budget, f"{path} over its query budget")
+        self.assertEqual(stats.repeated(), [], f"{path} repeats a query per row")
+
+    @override_settings(DEBUG=True)
+    async def test_async_views_are_counted(self):
+        # The async ORM queries on another thread than the event loop's
+        path = f"/api/sync/donations/?event_id={self.event.id}"
+        request = RequestFactory().get(path, **self.auth(self.manager))
+        response = await QueryCountMiddleware(async_views.sync_donations)(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(request.query_stats.count, 0)
+        self.assertLessEqual(request.query_stats.count, get_query_budget(async_views.sync_donations))
+        self.assertEqual(response["X-Query-Count"], str(request.query_stats.count))
+
+    def test_sync_endpoints(self):
+        event = self.event.id
+        for path in (
+            "/api/sync/user/",
+            f"/api/sync/donations/?event_id={event}",
+            f"/api/sync/donations/?event_id={event}&since=10",
+            f"/api/sync/expenses/?event_id={event}",
+            f"/api/sync/expenses/?event_id={event}&since=10",
+            f"/api/sync/wallet/?event_id={event}",
+        ):
+            self.assertWithinBudget("get", path, self.manager)
+
+    def test_lists(self):
+        event = self.event.id
+        for path, user in (
+            (f"/api/donations/?event_id={event}", self.manager),
+            (f"/api/donations/?event_id={event}&limit=20", self.volunteer),
+            (f"/api/expenses/?event_id={event}", self.manager),
+            (f"/api/collections/user/{self.volunteer.id}/", self.manager),
+            ("/api/my-events/", self.manager),
+            ("/api/notifications/", self.manager),
+            ("/api/user/list/", self.manager),
+            (f"/api/subscription-status/{self.mandal.id}/", self.manager),
+        ):
+            self.assertWithinBudget("get", path, user)
+
+    def test_summaries_and_wallet(self):
+        event = self.event.id
+        for path in (
+            f"/api/dashboard/summary/?event_id={event}",
+            f"/api/collections/summary/?event_id={event}",
+            "/api/collections/summary/",
+            "/api/wallet/",
+            f"/api/wallet/balances/?event_id={event}",
+        ):
+            self.assertWithinBudget("get", path, self.manager)
+
+        self.assertWithinBudget(
+            "post", "/api/wallet/settle/", self.manager,
+            {"approve": ["w-3-0", "w-3-6"], "reject": ["w-3-3", "w-3-9"]},
+        )
+
+    def test_writes(self):
+        donation = {
+            "mandal_event": self.event.id, "donor_name": "New", "amount": "10",
+            "whatsapp_number": "9", "donation_type": "Cash", "received_by": "x",
+            "created_by_name": "x", "date": "2026-09-01T10:00:00Z",
+        }
+        self.assertWithinBudget(
+            "post", "/api/donations/create/", self.volunteer,
+            dict(donation, client_donation_id="budget-1"),
+        )
+        self.assertWithinBudget(
+            "post", "/api/sync/push/", self.volunteer,
+            {
+                "mandal_event": self.event.id,
+                "donations": [
+                    dict(donation, client_donation_id=f"budget-push-{i}")
+                    for i in range(5)
+                ],
+            },
+        )
+
+
+@override_settings(PAYMENT_GATEWAY="fake", RAZORPAY_SECRET="test-secret")
+class PaymentFlowTests(SeededAPITestCase):
+    def setUp(self):
+        super().setUp()
+        reset_gateway()
+        self.addCleanup(reset_gateway)
+
+    def test_order_verify_activate(self):
+        response = self.call("post", "/api/create-subscription-order/", self.manager)
+        self.assertEqual(response.status_code, 200)
+        order_id = response.json()["order_id"]
+
+        payment = {
+            "order_id": order_id, "payment_id": "pay_test_1",
+            "mandal_id": self.mandal.id, "upi_id": "x@upi",
+        }
+        response = self.call("post", "/api/verify-subscription/", self.manager, dict(payment, signature="bad"))
+        self.assertEqual(response.status_code, 400)
+
+        signature = get_gateway().sign_payment(order_id, "pay_test_1")
+        response = self.call("post", "/api/verify-subscription/", self.manager, dict(payment, signature=signature))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            MandalSubscription.objects.filter(
+                mandal=self.mandal, is_active=True, payment_transaction_id="pay_test_1",
+            ).exists()
+        )
+
+    @override_settings(PAYMENT_ORDER_WORKERS=1, PAYMENT_ORDER_DEADLINE=0.05, FAKE_GATEWAY_LATENCY=0.5)
+    def test_slow_order_hits_deadline(self):
+        response = self.call("post", "/api/create-subscription-order/", self.manager)
+        self.assertEqual(response.status_code, 504)
+
+    def body(self, payment_id, mandal_id=None):
+        return json.dumps({
+            "event": "payment.captured",
+            "payload": {"payment": {"entity": {
+                "id": payment_id, "order_id": "order_x",
+                "notes": {"mandal_id": str(mandal_id or self.mandal.id)},
+            }}},
+        }).encode()
+
+    def deliver(self, payment_id, mandal_id, signature=None):
+        body = self.body(payment_id, mandal_id)
+        return self.client.post(
+            "/api/payments/webhook/", body, content_type="application/json",
+            HTTP_X_RAZORPAY_SIGNATURE=signature or get_gateway().sign_webhook(body),
+        )
+
+    def test_webhook_is_idempotent_and_activates_later(self):
+        self.assertEqual(self.deliver("pay_hook_1", self.mandal.id, signature="bad").status_code, 400)
+
+        for _ in range(3):
+            response = self.deliver("pay_hook_1", self.mandal.id)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(PaymentWebhookEvent.objects.filter(payment_id="pay_hook_1").count(), 1)
+        self.assertFalse(MandalSubscription.objects.filter(payment_transaction_id="pay_hook_1").exists())
+
+        self.assertEqual(Job.objects.filter(name="payments.webhook").count(), 1)
+
+        self.assertEqual(run_due_jobs(), ["done"])
+        self.assertEqual(process_pending_webhooks(), {})
+        self.assertTrue(
+            MandalSubscription.objects.filter(
+                mandal=self.mandal, is_active=True, payment_transaction_id="pay_hook_1",
+            ).exists()
+        )
+
+
+    def test_razorpay_webhooks_need_their_own_secret(self):
+        def signed(key):
+            return hmac.new(key, self.body("pay_forged"), hashlib.sha256).hexdigest()
+
+        razorpay = {"PAYMENT_GATEWAY": "razorpay", "RAZORPAY_KEY": "rzp_test"}
+        with override_settings(**razorpay, RAZORPAY_WEBHOOK_SECRET=None):
+            reset_gateway()
+            with self.assertRaises(ImproperlyConfigured):
+                self.deliver("pay_forged", self.mandal.id, signature=signed(b""))
+            with self.assertRaises(ImproperlyConfigured):
+                self.deliver("pay_forged", self.mandal.id, signature=signed(b"test-secret"))
+
+        # Signed with the key secret is not good enough any more
+        with override_settings(**razorpay, RAZORPAY_WEBHOOK_SECRET="hook"):
+            reset_gateway()
+            response = self.deliver("pay_forged", self.mandal.id, signature=signed(b"test-secret"))
+            self.assertEqual(response.status_code, 400)
+            response = self.deliver("pay_forged", self.mandal.id, signature=signed(b"hook"))
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(PaymentWebhookEvent.objects.filter(payment_id="pay_forged").count(), 1)
+
+    def test_verify_then_webhook_activates_once(self):
+        order_id = self.call("post", "/api/create-subscription-order/", self.manager).json()["order_id"]
+        signature = get_gateway().sign_payment(order_id, "pay_both")
+        response = self.call("post", "/api/verify-subscription/", self.manager, {
+            "order_id": order_id, "payment_id": "pay_both", "signature": signature,
+            "mandal_id": self.mandal.id, "upi_id": "x@upi",
+        })
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.deliver("pay_both", self.mandal.id).status_code, 200)
+        self.assertEqual(run_due_jobs(), ["done"])
+
+        self.assertEqual(MandalSubscription.objects.filter(payment_transaction_id="pay_both").count(), 1)
+        self.assertEqual(MandalSubscription.objects.filter(mandal=self.mandal, is_active=True).count(), 1)
+
+
+class NotificationTests(SeededAPITestCase):
+    def donation(self, client_id):
+        return {
+            "mandal_event": self.event.id, "donor_name": "New", "amount": "10",
+            "whatsapp_number": "9", "donation_type": "Cash", "received_by": "x",
+            "created_by_name": "x", "date": "2026-09-01T10:00:00Z",
+            "client_donation_id": client_id,
+        }
+
+    def test_donation_burst_collapses(self):
+        for i in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.call("post", "/api/donations/create/", self.volunteer, self.donation(f"burst-{i}"))
+            self.assertEqual(response.status_code, 201)
+
+        rows = AppNotification.objects.filter(group_key=f"donations:{self.event.id}")
+        self.assertEqual([(r.to_user_id, r.count, r.message) for r in rows], [
+            (self.manager.id, 3, "3 new donations recorded"),
+        ])
+
+    def test_one_write_per_outbox(self):
+        outbox = collect_notifications()
+        outbox.__enter__()
+        with self.captureOnCommitCallbacks(execute=True):
+            settle_transfers(self.manager, approve_ids=["w-3-0", "w-3-6"], reject_ids=["w-3-3"])
+        self.assertFalse(AppNotification.objects.filter(to_user_id=self.volunteer.id).exists())
+
+        with self.assertNumQueries(2):  # unread rows to merge into, one INSERT
+            outbox.__exit__(None, None, None)
+
+        rows = AppNotification.objects.filter(to_user_id=self.volunteer.id).order_by("group_key")
+        self.assertEqual([(r.group_key, r.count) for r in rows], [("wallet-approved", 2), ("wallet-rejected", 1)])
+
+        # Pushed to the volunteer's event stream, without the (unknown on MySQL) row ids
+        pushed = [m for m in hub.backlog if m[2] == "notification" and f"user:{self.volunteer.id}" in m[1]][-2:]
+        self.assertEqual(sorted(m[3]["count"] for m in pushed), [1, 2])
+        self.assertTrue(all("id" not in m[3] for m in pushed))
+
+    @override_settings(NOTIFICATION_JOBS=True)
+    def test_jobs_mode_publishes_from_the_web_process(self):
+        def pushed():
+            return [m for m in hub.backlog if m[2] == "notification" and f"user:{self.manager.id}" in m[1]]
+
+        before = len(pushed())
+        for i in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.call("post", "/api/donations/create/", self.volunteer, self.donation(f"job-{i}"))
+        self.assertEqual([m[3]["title"] for m in pushed()[before:]], ["New donation"] * 2)
+        self.assertFalse(AppNotification.objects.filter(group_key=f"donations:{self.event.id}").exists())
+
+        # The worker writes them and publishes nothing: its hub has no streams
+        self.assertEqual(run_due_jobs(), ["done", "done"])
+        self.assertEqual(len(pushed()), before + 2)
+        row = AppNotification.objects.get(group_key=f"donations:{self.event.id}")
+        self.assertEqual((row.to_user_id, row.count), (self.manager.id, 2))
+
+    def test_rolled_back_writes_notify_nobody(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    settle_transfers(self.manager, approve_ids=["w-3-0"])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+
+
+class RealtimeTests(SeededAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_event_id = MandalEvent.objects.exclude(mandal=cls.mandal).values_list("id", flat=True).first()
+
+    def test_needs_asgi(self):
+        response = self.call("get", "/api/events/stream/", self.manager)
+        self.assertEqual(response.status_code, 501)
+
+    async def test_stream_scoped_to_event(self):
+        client = AsyncClient()
+        headers = {"Authorization": self.auth(self.manager)["HTTP_AUTHORIZATION"]}
+
+        response = await client.get(f"/api/events/stream/?event_id={self.other_event_id}", headers=headers)
+        self.assertEqual(response.status_code, 403)
+
+        response = await client.get(f"/api/events/stream/?event_id={self.event.id}", headers=headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+
+        hub.publish([f"event:{self.other_event_id}"], "ledger", {"event_id": self.other_event_id})
+        message_id = hub.publish([f"event:{self.event.id}"], "ledger", {"event_id": self.event.id})
+
+        chunk = (await anext(stream)).decode()
+        self.assertIn(f"id: {message_id}\nevent: ledger\n", chunk)
+        await stream.aclose()
+
+
+    async def test_ticket_opens_the_stream_once(self):
+        response = await sync_to_async(self.call)("post", "/api/events/stream/ticket/", self.volunteer)
+        ticket = response.json()["ticket"]
+        client = AsyncClient()
+
+        response = await client.get(f"/api/events/stream/?ticket={ticket}")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        await response.streaming_content.aclose()
+
+        response = await client.get(f"/api/events/stream/?ticket={ticket}")
+        self.assertEqual(response.status_code, 401)
+        response = await client.get(f"/api/events/stream/?ticket={ticket[:-2]}xx")
+        self.assertEqual(response.status_code, 401)
+
+        # The JWT itself is not accepted in the query string
+        token = self.auth(self.volunteer)["HTTP_AUTHORIZATION"].split()[1]
+        response = await client.get(f"/api/events/stream/?token={token}")
+        self.assertEqual(response.status_code, 401)
+
+class AsyncReadViewTests(SeededAPITestCase):
+    def call_async(self, view, path, user=None, *args):
+        headers = self.auth(user) if user else {}
+        request = RequestFactory().get(path, **headers)
+        with count_queries() as stats:
+            response = async_to_sync(view)(request, *args)
+        self.assertLessEqual(stats.count, get_query_budget(view), f"{path} over its query budget")
+        return response
+
+    def test_same_answers_as_sync_views(self):
+        event = self.event.id
+        for view, path, user, args in (
+            (async_views.sync_user, "/api/sync/user/", self.manager, ()),
+            (async_views.sync_donations, f"/api/sync/donations/?event_id={event}", self.manager, ()),
+            (async_views.sync_donations, f"/api/sync/donations/?event_id={event}&since=10&limit=25", self.manager, ()),
+            (async_views.sync_expenses, f"/api/sync/expenses/?event_id={event}&since=210", self.manager, ()),
+            (async_views.get_donations, f"/api/donations/?event_id={event}", self.volunteer, ()),
+            (async_views.get_donations, f"/api/donations/?event_id={event}&limit=20", self.manager, ()),
+            (async_views.get_my_events, "/api/my-events/", self.manager, ()),
+            (async_views.get_notifications, "/api/notifications/", self.manager, ()),
+            (async_views.get_subscription_status, f"/api/subscription-status/{self.mandal.id}/", None, (self.mandal.id,)),
+        ):
+            expected = self.client.get(path, **(self.auth(user) if user else {}))
+            response = self.call_async(view, path, user, *args)
+
+            self.assertEqual(response.status_code, expected.status_code, path)
+            self.assertEqual(response["Content-Type"], expected["Content-Type"], path)
+            self.assertEqual(json.loads(response.content), json.loads(expected.content), path)
+            if expected.has_header("ETag"):
+                self.assertEqual(response["ETag"], expected["ETag"], path)
+
+    def test_stream_matches_list(self):
+        path = f"/api/donations/?event_id={self.event.id}&stream=1"
+        expected = self.client.get(path, **self.auth(self.manager))
+        response = self.call_async(async_views.get_donations, path, self.manager)
+
+        async def read(stream):
+            return b"".join([chunk async for chunk in stream])
+
+        self.assertEqual(
+            json.loads(async_to_sync(read)(response.streaming_content)),
+            json.loads(b"".join(expected.streaming_content)),
+        )
+
+    def test_auth_and_scope(self):
+        response = self.call_async(async_views.sync_user, "/api/sync/user/")
+        self.assertEqual(response.status_code, 401)
+        self.assertTrue(response.has_header("WWW-Authenticate"))
+
+        other = MandalEvent.objects.exclude(mandal=self.mandal).values_list("id", flat=True).first()
+        response = self.call_async(async_views.sync_donations, f"/api/sync/donations/?event_id={other}", self.manager)
+        self.assertEqual(response.status_code, 403)
+
+        path = f"/api/sync/donations/?event_id={self.event.id}&format=msgpack"
+        response = self.call_async(async_views.sync_donations, path, self.manager)
+        self.assertEqual(response["Content-Type"], self.call("get", path, self.manager)["Content-Type"])
+
+
+def run_due_jobs(worker="test-worker"):
+    return [jobs.run(job) for job in jobs.claim(worker, 100)]
+
+
+class GenerateDataTests(TestCase):
+    def test_generated_wallets_reconcile(self):
+        call_command(
+            "generate_festival_data", mandals=3, users=4, events=2, donations=5, expenses=2,
+            transfers=30, skip_summaries=True, stdout=io.StringIO(),
+        )
+        self.assertTrue(WalletTransfer.objects.filter(status="Approved").exists())
+        self.assertEqual(stored_balance_drift(), [])
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.addCleanup(jobs.handlers.pop, "test.flaky", None)
+        self.addCleanup(jobs.handlers.pop, "test.single", None)
+
+        @jobs.job("test.flaky", max_attempts=2)
+        def flaky(n):
+            self.calls.append(n)
+            raise ValueError("boom")
+
+        @jobs.job("test.single", concurrency=1)
+        def single():
+            self.calls.append("single")
+
+    def test_retries_with_backoff_then_fails(self):
+        jobs.enqueue("test.flaky", {"n": 1})
+        self.assertEqual(run_due_jobs(), ["retry"])
+
+        job = Job.objects.get(name="test.flaky")
+        self.assertEqual((job.status, job.attempts), ("pending", 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(run_due_jobs(), [])  # backing off
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        self.assertEqual(run_due_jobs(), ["failed"])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, self.calls), ("failed", 2, [1, 1]))
+        self.assertIn("boom", job.last_error)
+
+    def test_concurrency_limit_and_unique_key(self):
+        for i in range(3):
+            jobs.enqueue("test.single", unique_key=f"single-{i % 2}")
+        self.assertEqual(Job.objects.filter(name="test.single").count(), 2)
+
+        claimed = jobs.claim("worker-a", 10)
+        self.assertEqual([job.name for job in claimed], ["test.single"])
+        self.assertEqual(jobs.claim("worker-b", 10), [])
+
+        self.assertEqual(jobs.run(claimed[0]), "done")
+        self.assertEqual(run_due_jobs(), ["done"])
+        self.assertEqual(self.calls, ["single", "single"])
+
+    def test_concurrency_cap_counts_claims_under_the_lock(self):
+        for i in range(3):
+            jobs.enqueue("test.single", unique_key=f"single-{i}")
+        claimed = jobs.claim("worker-a", 10)
+        self.assertEqual(len(claimed), 1)
+        self.assertTrue(JobLock.objects.filter(name="test.single").exists())
+
+        # A job another worker is still running fills the only slot
+        self.assertEqual(jobs.claim("worker-b", 10), [])
+        jobs.run(claimed[0])
+        self.assertEqual(len(jobs.claim("worker-b", 10)), 1)
+
+    def test_capped_backlog_does_not_starve_other_jobs(self):
+        past = timezone.now() - timedelta(minutes=1)
+        for i in range(5):
+            jobs.enqueue("test.single", run_at=past, unique_key=f"single-{i}")
+        jobs.enqueue("test.flaky", {"n": 1})
+
+        claimed = jobs.claim("worker-a", 2)
+        self.assertEqual(sorted(job.name for job in claimed), ["test.flaky", "test.single"])
+
+    def test_schedule_once_per_interval(self):
+        now = timezone.now()
+        jobs.schedule(now)
+        jobs.schedule(now)
+        periodic = {name for name, handler in jobs.handlers.items() if handler.every}
+        self.assertEqual(set(Job.objects.values_list("name", flat=True)), periodic)
+        self.assertEqual(Job.objects.count(), len(periodic))
+
+        with override_settings(JOB_SCHEDULE={"subscriptions.expire": 0}):
+            jobs.schedule(now + timedelta(days=2))
+        self.assertEqual(Job.objects.filter(name="subscriptions.expire").count(), 1)
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_abandoned_job_is_requeued(self):
+        jobs.enqueue("test.single")
+        job, = jobs.claim("dead-worker", 1)
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(minutes=5))
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(run_due_jobs("live-worker"), ["done"])
+        # The dead worker's late report does not overwrite the new run
+        self.assertEqual(jobs.run(job), "done")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.attempts), ("done", "live-worker", 2))
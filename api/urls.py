@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView, TokenObtainPairView
-from . import views
+from . import async_views, views
+
+# Read endpoints on the async ORM when served over ASGI (ganeshji/asgi.py)
+reads = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
     # 🔐 AUTH
@@ -10,7 +14,7 @@ urlpatterns = [
 
     # 💰 DONATIONS
     path("donations/create/", views.create_donation),
-    path("donations/", views.get_donations),
+    path("donations/", reads.get_donations),
     path("donations/delete/<str:client_id>/", views.delete_donation),
 
     # 💸 EXPENSES
@@ -21,11 +25,13 @@ urlpatterns = [
     # 💼 WALLET
     path("wallet/create/", views.create_wallet_request),
     path("wallet/", views.get_wallet_requests),
+    path("wallet/balances/", views.wallet_balances_view),
     path("wallet/approve/", views.approve_wallet_request),
     path("wallet/reject/", views.reject_wallet_request),
+    path("wallet/settle/", views.settle_wallet_requests),
 
     # 🔔 NOTIFICATIONS
-    path("notifications/", views.get_notifications),
+    path("notifications/", reads.get_notifications),
     
     # 🧑‍🤝‍🧑 USERS / SIGNUP
     # path("register/", views.register),
@@ -40,22 +46,30 @@ urlpatterns = [
     path("signup/", views.signup),
     
     
-    path("sync/user/", views.sync_user, name="sync_user"),
-    path("sync/donations/", views.sync_donations, name="sync_donations"),
-    path("sync/expenses/", views.sync_expenses, name="sync_expenses"),
+    path("sync/user/", reads.sync_user, name="sync_user"),
+    path("sync/donations/", reads.sync_donations, name="sync_donations"),
+    path("sync/expenses/", reads.sync_expenses, name="sync_expenses"),
+    path("sync/wallet/", views.sync_wallet, name="sync_wallet"),
+    path("sync/push/", views.sync_push, name="sync_push"),
     
     
+    path("dashboard/summary/", views.dashboard_summary),
     path("collections/summary/", views.collection_summary),
     path("collections/user/<int:user_id>/", views.donations_by_user),
     
     
     path('events/', views.get_all_events),
     path('create-event/', views.create_mandal_event),
-    path('my-events/', views.get_my_events),
+    path('my-events/', reads.get_my_events),
 
     path('create-subscription-order/', views.create_subscription_order),
     path('verify-subscription/', views.verify_and_activate_subscription),
-    path('subscription-status/<int:mandal_id>/', views.get_subscription_status),
+    path('payments/webhook/', views.payment_webhook),
+    path('subscription-status/<int:mandal_id>/', reads.get_subscription_status),
     path('validate-session/', views.validate_session),
 
+    # 📡 REAL-TIME
+    path('events/stream/', views.events_stream),
+    path('events/stream/ticket/', views.stream_ticket),
+
 ]
\ No newline at end of file
@@ -1,20 +1,46 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils import timezone
+import json
 import logging
-from django.db.models import Sum
+from django.db.models import Max, Sum
 from .serializers import EventMasterSerializer, MandalEventSerializer
-from .models import EventMaster, Mandal, MandalEvent, MandalSubscription, SubscriptionPlan, Mandal
+from .models import EventMaster, Mandal, MandalEvent
 from rest_framework.permissions import AllowAny
-import razorpay
 from django.conf import settings
-from rest_framework.response import Response
-from datetime import timedelta
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
+from .changes import reserve_change_seq, parse_since, sync_page_size, changes_since
+from .push import PUSH_SECTIONS, batch_size, push_batch, push_max_items
+from .pagination import (
+    decode_cursor,
+    keyset_page,
+    page_size,
+    stream_json_array,
+    wants_page,
+    wants_stream,
+)
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from .fast_serializers import fast_donations, fast_expenses
+from .renderers import payload_renderer_classes
+from .changes import bump_mandal_version
+from .etags import etag_matches, event_etag, mandal_etag, not_modified, with_etag
+from .ledger import apply_ledger_delta, ensure_summaries, get_summary
+from .wallet import settle_transfers, wallet_balance, wallet_balances
+from .queries import query_budget
+from .authentication import CachedJWTAuthentication, invalidate_mandal, invalidate_user, tokens_for
+from .tenancy import aresolve_event, event_scoped, resolve_event
+from .subscriptions import activate_subscription, subscription_status
+from .payments import PaymentGatewayError, PaymentGatewayTimeout, create_order, verify_payment, verify_webhook
+from .webhooks import parse_delivery, record_delivery
+from .notifications import donations_recorded, wallet_requested
+from . import realtime
+from django.db import IntegrityError
 logger = logging.getLogger(__name__)
 
 from .models import (
@@ -22,7 +48,8 @@ from .models import (
     Donation,
     Expense,
     WalletTransfer,
-    AppNotification
+    AppNotification,
+    CollectorRollup
 )
 
 from .serializers import (
@@ -38,15 +65,13 @@ from .serializers import (
 # ============================
 # AUTH / LOGIN
 # ============================
-from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
-
+@query_budget(3)
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def login(request):
     mobile = request.data.get("mobile")
     password = request.data.get("password")
-    print(request.data)
+    logger.info("login attempt", extra={"mobile": mobile})
     if not mobile or not password:
         return Response(
             {"error": "Mobile and password are required"},
@@ -67,118 +92,79 @@ def login(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
-    refresh = RefreshToken.for_user(user)
+    refresh = tokens_for(user)
 
     return Response(
     {
         "access": str(refresh.access_token),
         "refresh": str(refresh),
         "user_id": user.id,
-        "mandal_id": user.mandal.id,
+        "mandal_id": user.mandal_id,
         "role": user.role,
     },
     status=status.HTTP_200_OK
 )
 
-def calculate_user_wallet(user_id, mandal_event):
-    donations = Donation.objects.filter(
-        mandal_event=mandal_event,
-        created_by_user_id=user_id,
-        is_deleted=False
-    ).aggregate(total=Sum("amount"))["total"] or 0
-
-    expenses = Expense.objects.filter(
-        mandal_event=mandal_event,
-        created_by_user_id=user_id,
-        is_deleted=False
-    ).aggregate(total=Sum("amount"))["total"] or 0
-
-    sent = WalletTransfer.objects.filter(
-        from_user_id=user_id,
-        mandal_event=mandal_event,
-        status="Approved"
-    ).aggregate(total=Sum("amount"))["total"] or 0
-
-    return donations - expenses - sent
-
-def calculate_manager_wallet(manager_id, mandal_event):
-    base_wallet = calculate_user_wallet(manager_id, mandal_event)
-
-    received = WalletTransfer.objects.filter(
-        to_manager_id=manager_id,
-        mandal_event=mandal_event,
-        status="Approved"
-    ).aggregate(total=Sum("amount"))["total"] or 0
-
-    return base_wallet + received
-
-
+@query_budget(2)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@event_scoped()
 def sync_wallet(request):
-    event_id = request.GET.get("event_id")
+    mandal_event = request.tenant.mandal_event
 
-    if not event_id:
-        return Response({"error": "event_id required"}, status=400)
-
-    try:
-        mandal_event = MandalEvent.objects.get(
-            id=event_id,
-            mandal=request.user.mandal
-        )
-    except MandalEvent.DoesNotExist:
-        return Response({"error": "Invalid event"}, status=403)
-
-    user = request.user
-
-    if user.role == "Manager":
-        wallet = calculate_manager_wallet(user.id, mandal_event)
-    else:
-        wallet = calculate_user_wallet(user.id, mandal_event)
+    wallet = wallet_balance(request.user.id, mandal_event)
 
     return Response({
         "wallet_balance": wallet
     })
 
 
+@query_budget(3)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def dashboard_summary(request):
-    event_id = request.GET.get("event_id")
+@event_scoped()
+def wallet_balances_view(request):
+    if request.user.role != "Manager":
+        return Response(
+            {"error": "Only managers can view team balances"},
+            status=403
+        )
 
-    if not event_id:
-        return Response({"error": "event_id required"}, status=400)
+    mandal_event = request.tenant.mandal_event
 
-    try:
-        mandal_event = MandalEvent.objects.get(
-            id=event_id,
-            mandal=request.user.mandal
-        )
-    except MandalEvent.DoesNotExist:
-        return Response({"error": "Invalid event"}, status=403)
+    return Response(wallet_balances(mandal_event))
 
-    total_collection = Donation.objects.filter(
-        mandal_event=mandal_event,
-        is_deleted=False
-    ).aggregate(total=Sum("amount"))["total"] or 0
 
-    total_expense = Expense.objects.filter(
-        mandal_event=mandal_event,
-        is_deleted=False
-    ).aggregate(total=Sum("amount"))["total"] or 0
+@query_budget(3)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@event_scoped()
+def dashboard_summary(request):
+    mandal_event = request.tenant.mandal_event
 
-    return Response({
-        "total_collection": total_collection,
-        "total_expense": total_expense,
-        "net_balance": total_collection - total_expense
-    })
+    etag = event_etag(request, mandal_event)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # 📊 Served from the materialized summary (api.ledger)
+    summary = get_summary(mandal_event.id)
+
+    return with_etag(Response({
+        "total_collection": summary.total_collection,
+        "total_expense": summary.total_expense,
+        "net_balance": summary.total_collection - summary.total_expense,
+        "donation_count": summary.donation_count,
+        "expense_count": summary.expense_count,
+        "donation_types": summary.donation_types,
+        "expense_categories": summary.expense_categories,
+    }), etag)
 
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def signup(request):
     data = request.data
-    print("Received signup data:", data)
+    logger.info("signup", extra={"data": data})
     if User.objects.filter(mobile=data.get("mobile")).exists():
         return Response(
             {"error": "Mobile already registered"},
@@ -204,7 +190,7 @@ def signup(request):
         role=data.get("role") or "Manager"
     )
 
-    refresh = RefreshToken.for_user(user)
+    refresh = tokens_for(user)
 
     return Response({
         "access": str(refresh.access_token),
@@ -216,28 +202,20 @@ def signup(request):
 
 @api_view(["GET"])
 def ping(request):
-    print("🔥 PING HIT FROM PHONE")
+    logger.debug("ping")
     return Response({"ok": True})
 
 # ============================
 # DONATIONS
 # ============================
 
+@query_budget(15)
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@event_scoped("mandal_event", source="body")
 def create_donation(request):
-    mandal_event_id = request.data.get("mandal_event")
-    print("Received donation creation request for event_id:", request.data)
-    if not mandal_event_id:
-        return Response({"error": "mandal_event is required"}, status=400)
-
-    try:
-        mandal_event = MandalEvent.objects.get(
-            id=mandal_event_id,
-            mandal=request.user.mandal  # ensures event belongs to this manager
-        )
-    except MandalEvent.DoesNotExist:
-        return Response({"error": "Invalid event"}, status=403)
+    mandal_event = request.tenant.mandal_event
+    logger.debug("create_donation", extra={"mandal_event": mandal_event.id})
 
     serializer = DonationSerializer(
         data=request.data,
@@ -245,29 +223,30 @@ def create_donation(request):
     )
 
     if serializer.is_valid():
-        serializer.save(
-        mandal_event=mandal_event,
-        mandal=request.user.mandal   # 🔥 ADD THIS
-        )
+        with transaction.atomic():
+            serializer.save(
+            mandal_event=mandal_event,
+            mandal_id=request.user.mandal_id,   # 🔥 ADD THIS
+            change_seq=reserve_change_seq(mandal_event.id)
+            )
+            apply_ledger_delta(mandal_event.id, donations=[serializer.instance])
+            # 🔔 Sent after commit, collapsed with other recent donations
+            donations_recorded(request.user, mandal_event, [serializer.instance])
         return Response(serializer.data, status=201)
 
     return Response(serializer.errors, status=400)
 
+@query_budget(3)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(payload_renderer_classes())
+@event_scoped()
 def get_donations(request):
-    event_id = request.GET.get("event_id")
+    mandal_event = request.tenant.mandal_event
 
-    if not event_id:
-        return Response({"error": "event_id required"}, status=400)
-
-    try:
-        mandal_event = MandalEvent.objects.get(
-            id=event_id,
-            mandal=request.user.mandal
-        )
-    except MandalEvent.DoesNotExist:
-        return Response({"error": "Invalid event"}, status=403)
+    etag = event_etag(request, mandal_event)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
     if request.user.role == "Manager":
         qs = Donation.objects.filter(
@@ -277,14 +256,42 @@ def get_donations(request):
     else:
         qs = Donation.objects.filter(
             mandal_event=mandal_event,
-            created_by_user_id=request.user.id,
+            created_by_id=request.user.id,
             is_deleted=False
         )
 
-    return Response(DonationSerializer(qs, many=True).data)
+    return with_etag(donation_list_response(request, qs), etag)
+
+
+def donation_list_response(request, qs):
+    """
+    Render a donation queryset as a full list (legacy clients), a keyset
+    page (``?limit=`` / ``?cursor=``) or a streamed array (``?stream=1``).
+    """
+    if wants_stream(request):
+        return StreamingHttpResponse(
+            stream_json_array(qs, fast_donations),
+            content_type="application/json"
+        )
 
+    if wants_page(request):
+        try:
+            cursor = decode_cursor(request.GET["cursor"]) if request.GET.get("cursor") else None
+        except ValueError:
+            return Response({"error": "Invalid cursor"}, status=400)
+
+        results, next_cursor = keyset_page(qs, cursor, page_size(request), fast_donations)
+        return Response({
+            "results": results,
+            "next_cursor": next_cursor,
+        })
+
+    return Response(fast_donations.many(qs))
+
+@query_budget(4)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@event_scoped(required=False)
 def collection_summary(request):
     user = request.user
 
@@ -294,20 +301,50 @@ def collection_summary(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
-    # mandal = user.mandal_name
+    # 🏆 Event-scoped leaderboard; without event_id, all of the mandal's events
+    if request.tenant:
+        mandal_event = request.tenant.mandal_event
 
-    donations = (
-        Donation.objects
-        .filter( mandal=user.mandal, is_deleted=False)
-        .values("created_by_user_id", "created_by_name")
-        .annotate(total=Sum("amount"))
-        .order_by("created_by_name"),
-        
+        etag = event_etag(request, mandal_event)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        get_summary(mandal_event.id)
+        rollups = CollectorRollup.objects.filter(mandal_event=mandal_event)
+    else:
+        etag = mandal_etag(request)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        ensure_summaries(user.mandal_id)
+        rollups = CollectorRollup.objects.filter(mandal_event__mandal_id=user.mandal_id)
+
+    collectors = (
+        rollups
+        .filter(donation_count__gt=0)
+        .values("user_id")
+        .annotate(
+            created_by_name=Max("collector_name"),
+            total=Sum("total"),
+            count=Sum("donation_count"),
+            last_collected_at=Max("last_collected_at"),
+        )
+        .order_by("-total", "created_by_name")
     )
 
-    return Response(donations)
+    return with_etag(Response([
+        {
+            "created_by_user_id": row["user_id"],
+            "created_by_name": row["created_by_name"],
+            "total": row["total"],
+            "count": row["count"],
+            "last_collected_at": row["last_collected_at"],
+        }
+        for row in collectors
+    ]), etag)
 
 
+@query_budget(3)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def donations_by_user(request, user_id):
@@ -319,32 +356,27 @@ def donations_by_user(request, user_id):
             status=status.HTTP_403_FORBIDDEN
         )
 
+    etag = mandal_etag(request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     qs = Donation.objects.filter(
-        created_by_user_id=user_id,
-        mandal=user.mandal,
+        created_by_id=user_id,
+        mandal_id=user.mandal_id,
         is_deleted=False
     ).order_by("-date")
 
-    return Response(DonationSerializer(qs, many=True).data)
+    return with_etag(donation_list_response(request, qs), etag)
 
 # ============================
 # EXPENSES
 # ============================
+@query_budget(10)
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@event_scoped("mandal_event", source="body")
 def create_expense(request):
-    mandal_event_id = request.data.get("mandal_event")
-
-    if not mandal_event_id:
-        return Response({"error": "mandal_event is required"}, status=400)
-
-    try:
-        mandal_event = MandalEvent.objects.get(
-            id=mandal_event_id,
-            mandal=request.user.mandal  # ensures event belongs to this manager
-        )
-    except MandalEvent.DoesNotExist:
-        return Response({"error": "Invalid event"}, status=403)
+    mandal_event = request.tenant.mandal_event
 
     serializer = ExpenseSerializer(
         data=request.data,
@@ -352,10 +384,13 @@ def create_expense(request):
     )
 
     if serializer.is_valid():
-        serializer.save(
-        mandal_event=mandal_event,
-        mandal=request.user.mandal   # 🔥 ADD THIS
-        )
+        with transaction.atomic():
+            serializer.save(
+            mandal_event=mandal_event,
+            mandal_id=request.user.mandal_id,   # 🔥 ADD THIS
+            change_seq=reserve_change_seq(mandal_event.id)
+            )
+            apply_ledger_delta(mandal_event.id, expenses=[serializer.instance])
         return Response(serializer.data, status=201)
 
     return Response(serializer.errors, status=400)
@@ -365,27 +400,34 @@ def create_expense(request):
 def delete_donation(request, client_id):
     user = request.user
 
-    try:
-        donation = Donation.objects.get(
-            client_donation_id=client_id,
-            is_deleted=False
-        )
-    except Donation.DoesNotExist:
-        return Response(
-            {"error": "Donation not found"},
-            status=status.HTTP_404_NOT_FOUND
-        )
+    # 🔒 Row locked for the whole delete: a concurrent DELETE of the same
+    # row waits here, then finds it already deleted (404) instead of
+    # taking it off the ledger a second time
+    with transaction.atomic():
+        try:
+            donation = Donation.objects.select_for_update().get(
+                client_donation_id=client_id,
+                mandal_id=user.mandal_id,
+                is_deleted=False
+            )
+        except Donation.DoesNotExist:
+            return Response(
+                {"error": "Donation not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-    # 🔒 PERMISSION CHECK
-    if user.role != "Manager" and donation.created_by_user_id != user.id:
-        return Response(
-            {"error": "Permission denied"},
-            status=status.HTTP_403_FORBIDDEN
-        )
+        # 🔒 PERMISSION CHECK
+        if user.role != "Manager" and donation.created_by_id != user.id:
+            return Response(
+                {"error": "Permission denied"},
+                status=status.HTTP_403_FORBIDDEN
+            )
 
-    # ❌ SOFT DELETE
-    donation.is_deleted = True
-    donation.save(update_fields=["is_deleted"])
+        # ❌ SOFT DELETE (kept as a tombstone for delta sync)
+        donation.is_deleted = True
+        donation.change_seq = reserve_change_seq(donation.mandal_event_id)
+        donation.save(update_fields=["is_deleted", "change_seq"])
+        apply_ledger_delta(donation.mandal_event_id, donations=[donation], sign=-1)
 
     return Response(
         {"message": "Donation deleted successfully"},
@@ -398,27 +440,32 @@ def delete_donation(request, client_id):
 def delete_expense(request, client_id):
     user = request.user
 
-    try:
-        expense = Expense.objects.get(
-            client_expense_id=client_id,
-            is_deleted=False
-        )
-    except Expense.DoesNotExist:
-        return Response(
-            {"error": "Expense not found"},
-            status=status.HTTP_404_NOT_FOUND
-        )
+    # 🔒 Row locked for the whole delete (see delete_donation)
+    with transaction.atomic():
+        try:
+            expense = Expense.objects.select_for_update().get(
+                client_expense_id=client_id,
+                mandal_id=user.mandal_id,
+                is_deleted=False
+            )
+        except Expense.DoesNotExist:
+            return Response(
+                {"error": "Expense not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-    # 🔒 PERMISSION CHECK
-    if user.role != "Manager" and expense.created_by_user_id != user.id:
-        return Response(
-            {"error": "Permission denied"},
-            status=status.HTTP_403_FORBIDDEN
-        )
+        # 🔒 PERMISSION CHECK
+        if user.role != "Manager" and expense.created_by_id != user.id:
+            return Response(
+                {"error": "Permission denied"},
+                status=status.HTTP_403_FORBIDDEN
+            )
 
-    # ❌ SOFT DELETE
-    expense.is_deleted = True
-    expense.save(update_fields=["is_deleted"])
+        # ❌ SOFT DELETE (kept as a tombstone for delta sync)
+        expense.is_deleted = True
+        expense.change_seq = reserve_change_seq(expense.mandal_event_id)
+        expense.save(update_fields=["is_deleted", "change_seq"])
+        apply_ledger_delta(expense.mandal_event_id, expenses=[expense], sign=-1)
 
     return Response(
         {"message": "Expense deleted successfully"},
@@ -426,31 +473,36 @@ def delete_expense(request, client_id):
     )
 
 
+@query_budget(2)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(payload_renderer_classes())
+@event_scoped(required=False)
 def get_expenses(request):
-    mandal = request.GET.get("mandal")
-    role = request.GET.get("role")
-    user_id = request.GET.get("user_id")
 
-    if role == "Manager":
+    # Scope comes from the authenticated user, not from query params
+    if request.user.role == "Manager":
         qs = Expense.objects.filter(
-            mandal_name=mandal,
+            mandal_id=request.user.mandal_id,
             is_deleted=False
         )
     else:
         qs = Expense.objects.filter(
-            created_by_user_id=user_id,
+            created_by_id=request.user.id,
             is_deleted=False
         )
 
-    return Response(ExpenseSerializer(qs, many=True).data)
+    if request.tenant is not None:
+        qs = qs.filter(mandal_event=request.tenant.mandal_event)
+
+    return Response(fast_expenses.many(qs))
 
 # ============================
 # WALLET TRANSFERS
 # ============================
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@event_scoped("mandal_event", source="body")
 def create_wallet_request(request):
     user = request.user
 
@@ -463,14 +515,32 @@ def create_wallet_request(request):
             status=400
         )
 
-    WalletTransfer.objects.create(
+    # 💼 Addressed to a manager of the caller's mandal (the first one by default)
+    manager_ids = list(
+        User.objects.filter(mandal_id=user.mandal_id, role="Manager")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    to_manager_id = request.data.get("to_manager_id") or (manager_ids[0] if manager_ids else None)
+    try:
+        to_manager_id = int(to_manager_id)
+    except (TypeError, ValueError):
+        to_manager_id = None
+    if to_manager_id not in manager_ids:
+        return Response({"error": "Invalid manager"}, status=400)
+
+    transfer = WalletTransfer.objects.create(
         client_wallet_transfer_id=client_id,
         from_user_id=user.id,
-        mandal=user.mandal,
+        to_manager_id=to_manager_id,
+        mandal_id=user.mandal_id,
+        mandal_event=request.tenant.mandal_event,
         amount=amount,
         status="Pending",
         requested_at=timezone.now()
     )
+    wallet_requested(user, amount, to_manager_id)
+    realtime.wallet_requested(transfer)
 
     return Response(
         {"message": "Wallet request created"},
@@ -480,6 +550,7 @@ def create_wallet_request(request):
 
 
 
+@query_budget(2)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_wallet_requests(request):
@@ -492,7 +563,7 @@ def get_wallet_requests(request):
         )
 
     qs = WalletTransfer.objects.filter(
-        mandal=user.mandal,
+        mandal_id=user.mandal_id,
         status="Pending"
     ).order_by("requested_at")
 
@@ -505,6 +576,7 @@ def get_wallet_requests(request):
 # ============================
 # NOTIFICATIONS
 # ============================
+@query_budget(2)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_notifications(request):
@@ -549,8 +621,8 @@ def update_profile(request):
             status=403
         )
 
-    user.mandal.name = mandal_name
-    user.mandal.save()
+    Mandal.objects.filter(id=user.mandal_id).update(name=mandal_name)
+    invalidate_mandal(user.mandal_id)
 
     return Response({"message": "Profile updated"})
 
@@ -596,6 +668,7 @@ def change_password(request):
 
     target_user.set_password(new_password)
     target_user.save()
+    invalidate_user(target_user.id)
 
     return Response(
         {"message": "Password changed successfully"},
@@ -613,28 +686,11 @@ def approve_wallet_request(request):
 
     transfer_id = request.data.get("client_wallet_transfer_id")
 
-    try:
-        transfer = WalletTransfer.objects.get(
-            client_wallet_transfer_id=transfer_id,
-            status="Pending"
-        )
-    except WalletTransfer.DoesNotExist:
-        return Response({"error": "Transfer not found"}, status=404)
-
-    user = User.objects.get(id=transfer.from_user_id)
-
-    # 🔴 CRITICAL WALLET LOGIC
-    user.wallet_balance -= transfer.amount
-    manager.wallet_balance += transfer.amount
-
-    user.total_transferred += transfer.amount
-
-    user.save()
-    manager.save()
+    # 🔴 CRITICAL WALLET LOGIC (locked, set-based; see api.wallet)
+    result = settle_transfers(manager, approve_ids=[transfer_id])
 
-    transfer.status = "Approved"
-    transfer.approved_at = timezone.now()
-    transfer.save()
+    if not result["approved"]:
+        return Response({"error": "Transfer not found"}, status=404)
 
     return Response({"message": "Approved"})
 
@@ -651,27 +707,49 @@ def reject_wallet_request(request):
 
     transfer_id = request.data.get("client_wallet_transfer_id")
 
-    try:
-        transfer = WalletTransfer.objects.get(
-            client_wallet_transfer_id=transfer_id,
-            status="Pending"
-        )
-    except WalletTransfer.DoesNotExist:
-        return Response({"error": "Transfer not found"}, status=404)
+    result = settle_transfers(manager, reject_ids=[transfer_id])
 
-    transfer.status = "Rejected"
-    transfer.approved_at = timezone.now()
-    transfer.save()
+    if not result["rejected"]:
+        return Response({"error": "Transfer not found"}, status=404)
 
     return Response({"message": "Rejected"})
 
 
+@query_budget(12)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def settle_wallet_requests(request):
+    manager = request.user
+
+    if manager.role != "Manager":
+        return Response({"error": "Only manager can settle"}, status=403)
+
+    approve_ids = request.data.get("approve") or []
+    reject_ids = request.data.get("reject") or []
+
+    if not all(
+        isinstance(ids, list) and all(isinstance(i, str) for i in ids)
+        for ids in (approve_ids, reject_ids)
+    ):
+        return Response({"error": "approve and reject must be lists of ids"}, status=400)
+
+    max_items = getattr(settings, "WALLET_SETTLE_MAX_ITEMS", 200)
+    if len(approve_ids) + len(reject_ids) > max_items:
+        return Response(
+            {"error": f"Too many transfers (max {max_items})"},
+            status=400
+        )
+
+    return Response(settle_transfers(manager, approve_ids, reject_ids))
+
+
+@query_budget(2)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def list_users(request):
     users = User.objects.filter(
-        mandal=request.user.mandal
-    )
+        mandal_id=request.user.mandal_id
+    ).select_related("mandal")
 
     return Response(
         UserSerializer(users, many=True).data
@@ -702,7 +780,7 @@ def add_user(request):
     # 🔥 Use relational mandal instead of string
     if User.objects.filter(
         mobile=data["mobile"],
-        mandal=manager.mandal
+        mandal_id=manager.mandal_id
     ).exists():
         return Response(
             {"error": "User already exists"},
@@ -714,7 +792,7 @@ def add_user(request):
         password=data["password"],
         name=data["name"],
         role="User",
-        mandal=manager.mandal   # ✅ FIXED
+        mandal_id=manager.mandal_id   # ✅ FIXED
     )
 
     return Response(
@@ -725,7 +803,7 @@ def add_user(request):
                 "name": user.name,
                 "mobile": user.mobile,
                 "role": user.role,
-                "mandal_id": manager.mandal.id,
+                "mandal_id": manager.mandal_id,
                 "mandal_name": manager.mandal.name,
             }
         },
@@ -734,10 +812,14 @@ def add_user(request):
 
     
 # api/views.py
+@query_budget(2)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(payload_renderer_classes())
 def sync_user(request):
-    user = request.user
+    # Fresh row: wallet counters change outside this user's requests, and
+    # request.user may come from the auth cache
+    user = User.objects.select_related("mandal").get(pk=request.user.pk)
 
     if not user or not user.is_active:
         return Response(
@@ -771,55 +853,128 @@ def sync_user(request):
         status=status.HTTP_200_OK
     )
 
+@query_budget(3)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(payload_renderer_classes())
+@event_scoped()
 def sync_donations(request):
-    event_id = request.GET.get("event_id")
+    mandal_event = request.tenant.mandal_event
 
-    if not event_id:
-        return Response({"error": "event_id required"}, status=400)
+    etag = event_etag(request, mandal_event)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
     try:
-        mandal_event = MandalEvent.objects.get(
-            id=event_id,
-            mandal=request.user.mandal
+        since = parse_since(request)
+    except ValueError:
+        return Response({"error": "Invalid since cursor"}, status=400)
+
+    # 🔄 DELTA MODE: only rows changed after the client's cursor
+    if since is not None:
+        donations, deleted, cursor, has_more = changes_since(
+            Donation.objects.filter(mandal_event=mandal_event),
+            since,
+            sync_page_size(request),
+            fast_donations
         )
-    except MandalEvent.DoesNotExist:
-        return Response({"error": "Invalid event"}, status=403)
+        return with_etag(Response({
+            "donations": donations,
+            "deleted": [
+                {"client_donation_id": d["client_donation_id"], "change_seq": d["change_seq"]}
+                for d in deleted
+            ],
+            "cursor": cursor,
+            "has_more": has_more,
+        }), etag)
 
     donations = Donation.objects.filter(
         mandal_event=mandal_event,
         is_deleted=False
     )
 
-    serializer = DonationSerializer(donations, many=True)
-    print("Sync donations for event_id:", serializer.data)
-    return Response(serializer.data)
+    data = fast_donations.many(donations)
+    logger.debug("sync_donations", extra={"event_id": mandal_event.id, "rows": len(data)})
+    return with_etag(Response(data), etag)
 
 
+@query_budget(3)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(payload_renderer_classes())
+@event_scoped()
 def sync_expenses(request):
-    event_id = request.GET.get("event_id")
-    print("Sync expenses for event_id:", event_id)
-    if not event_id:
-        return Response({"error": "event_id required"}, status=400)
+    mandal_event = request.tenant.mandal_event
+    logger.debug("sync_expenses", extra={"event_id": mandal_event.id})
+
+    etag = event_etag(request, mandal_event)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
     try:
-        mandal_event = MandalEvent.objects.get(
-            id=event_id,
-            mandal=request.user.mandal
+        since = parse_since(request)
+    except ValueError:
+        return Response({"error": "Invalid since cursor"}, status=400)
+
+    # 🔄 DELTA MODE: only rows changed after the client's cursor
+    if since is not None:
+        expenses, deleted, cursor, has_more = changes_since(
+            Expense.objects.filter(mandal_event=mandal_event),
+            since,
+            sync_page_size(request),
+            fast_expenses
         )
-    except MandalEvent.DoesNotExist:
-        return Response({"error": "Invalid event"}, status=403)
+        return with_etag(Response({
+            "expenses": expenses,
+            "deleted": [
+                {"client_expense_id": e["client_expense_id"], "change_seq": e["change_seq"]}
+                for e in deleted
+            ],
+            "cursor": cursor,
+            "has_more": has_more,
+        }), etag)
 
     expenses = Expense.objects.filter(
         mandal_event=mandal_event,
         is_deleted=False
     )
 
-    serializer = ExpenseSerializer(expenses, many=True)
-    return Response(serializer.data)
+    return with_etag(Response(fast_expenses.many(expenses)), etag)
+
+
+@query_budget(14)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@renderer_classes(payload_renderer_classes())
+def sync_push(request):
+    mandal_event_id = request.data.get("mandal_event")
+
+    if not mandal_event_id:
+        return Response({"error": "mandal_event is required"}, status=400)
+
+    for key, *_ in PUSH_SECTIONS:
+        if not isinstance(request.data.get(key) or [], list):
+            return Response({"error": f"{key} must be a list"}, status=400)
+
+    if batch_size(request.data) > push_max_items():
+        return Response(
+            {"error": f"Batch too large (max {push_max_items()} items)"},
+            status=400
+        )
+
+    # Resolved after the cheap payload checks, unlike @event_scoped
+    request.tenant = resolve_event(request.user, mandal_event_id)
+    if request.tenant is None:
+        return Response({"error": "Invalid event"}, status=403)
+    mandal_event = request.tenant.mandal_event
+
+    try:
+        results = push_batch(request.user, mandal_event, request.data)
+    except IntegrityError:
+        # A client id landed concurrently; the retry will report it as a duplicate
+        return Response({"error": "Conflicting concurrent push, retry"}, status=409)
+
+    return Response(results, status=200)
 
 
 @api_view(["POST"])
@@ -835,7 +990,7 @@ def update_user(request):
 
     data = request.data
     user_id = data.get("user_id")
-    print("Updating user_id:", user_id, "with data:", data)
+    logger.info("update_user", extra={"user_id": user_id, "fields": sorted(data)})
     if not user_id:
         return Response(
             {"error": "user_id is required"},
@@ -846,7 +1001,7 @@ def update_user(request):
         # 🔥 FIX: use relational mandal instead of mandal_name
         user = User.objects.get(
             id=user_id,
-            mandal=manager.mandal
+            mandal_id=manager.mandal_id
         )
     except User.DoesNotExist:
         return Response(
@@ -868,6 +1023,7 @@ def update_user(request):
         user.set_password(data["password"])
 
     user.save()
+    invalidate_user(user.id)
 
     return Response(
         {"message": "User updated successfully"},
@@ -879,7 +1035,7 @@ def update_user(request):
 def get_all_events(request):
     events = EventMaster.objects.all()
     serializer = EventMasterSerializer(events, many=True)
-    print(serializer.data)
+    logger.debug("get_all_events", extra={"count": len(serializer.data)})
     return Response(serializer.data)
 
 
@@ -905,7 +1061,7 @@ def create_mandal_event(request):
 
     # 🔥 Check duplicate per mandal (NOT per user)
     if MandalEvent.objects.filter(
-        mandal=request.user.mandal,
+        mandal_id=request.user.mandal_id,
         event=event
     ).exists():
         return Response(
@@ -914,39 +1070,54 @@ def create_mandal_event(request):
         )
 
     # 🔥 Create event under Mandal
-    MandalEvent.objects.create(
-        mandal=request.user.mandal,
-        event=event
-    )
+    with transaction.atomic():
+        MandalEvent.objects.create(
+            mandal_id=request.user.mandal_id,
+            event=event
+        )
+        bump_mandal_version(request.user.mandal_id)
 
     return Response(
         {"message": "Event created successfully"},
         status=status.HTTP_201_CREATED
     )
 
+@query_budget(3)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_my_events(request):
+    etag = mandal_etag(request)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     events = MandalEvent.objects.filter(
-        mandal=request.user.mandal
-    )
+        mandal_id=request.user.mandal_id
+    ).select_related("event")
     serializer = MandalEventSerializer(events, many=True)
-    return Response(serializer.data)
+    return with_etag(Response(serializer.data), etag)
 
 
-client = razorpay.Client(auth=(settings.RAZORPAY_KEY, settings.RAZORPAY_SECRET))
-
 @csrf_exempt
 @api_view(['POST'])
 def create_subscription_order(request):
 
     amount = 99900
 
-    order = client.order.create({
-        "amount": amount,
-        "currency": "INR",
-        "payment_capture": 1
-    })
+    # 🏷️ The order carries the mandal, so the payment webhook can activate it
+    mandal_id = request.data.get("mandal_id")
+    if not mandal_id and request.user.is_authenticated:
+        mandal_id = request.user.mandal_id
+    notes = {"mandal_id": str(mandal_id)} if mandal_id else None
+
+    # 💳 Gateway is built on first use, with pooled connections and timeouts
+    try:
+        order = create_order(amount, notes=notes)
+    except PaymentGatewayTimeout:
+        logger.warning("payment order timed out", extra={"amount": amount})
+        return Response({"error": "Payment gateway timed out"}, status=504)
+    except PaymentGatewayError:
+        logger.exception("payment order failed", extra={"amount": amount})
+        return Response({"error": "Payment gateway error"}, status=502)
 
     return Response({
         "order_id": order["id"],
@@ -964,68 +1135,57 @@ def verify_and_activate_subscription(request):
     mandal_id = request.data.get("mandal_id")
     user_upi_id = request.data.get("upi_id")
 
-    try:
-        client.utility.verify_payment_signature({
-            'razorpay_order_id': order_id,
-            'razorpay_payment_id': payment_id,
-            'razorpay_signature': signature
-        })
-    except:
+    # 🔐 Signature is checked locally (HMAC), no gateway round trip
+    if not verify_payment(order_id, payment_id, signature):
         return Response({"error": "Payment verification failed"}, status=400)
 
     mandal = Mandal.objects.get(id=mandal_id)
-    plan = SubscriptionPlan.objects.get(name="GOLD")
 
-    # deactivate old subscription
-    MandalSubscription.objects.filter(
-        mandal=mandal,
-        is_active=True
-    ).update(is_active=False)
+    # ♻️ Same payment may also arrive by webhook; only the first activates
+    activate_subscription(mandal.id, payment_id, user_upi_id)
 
-    start = timezone.now()
-    end = start + timedelta(days=365)
+    return Response({"message": "Subscription Activated"})
 
-    MandalSubscription.objects.create(
-        mandal=mandal,
-        plan=plan,
-        start_date=start,
-        end_date=end,
-        payment_transaction_id=payment_id,
-        user_upi_id=user_upi_id,
-        is_active=True
-    )
 
-    return Response({"message": "Subscription Activated"})
+# ============================
+# PAYMENT WEBHOOK
+# ============================
+@query_budget(2)
+@csrf_exempt
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def payment_webhook(request):
+
+    # 🔐 Signed over the raw body, so read it before DRF parses it
+    body = request.body
+    if not verify_webhook(body, request.headers.get("X-Razorpay-Signature")):
+        return Response({"error": "Invalid signature"}, status=400)
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return Response({"error": "Invalid payload"}, status=400)
+
+    event = parse_delivery(payload)
+    if event is None:
+        return Response({"status": "ignored"})
 
+    # 📥 Queue and answer; the run_jobs worker activates the subscription
+    record_delivery(event)
+    logger.info("payment webhook queued", extra={"payment_id": event.payment_id, "event": event.event})
+    return Response({"status": "queued"})
 
+
+@query_budget(2)
 @api_view(['GET'])
 def get_subscription_status(request, mandal_id):
 
     # mandal_id = request.GET.get("mandal_id")
-    print(mandal_id)
-    try:
-        sub = MandalSubscription.objects.filter(
-            mandal_id=mandal_id,
-            is_active=True
-        ).latest("created_at")
-
-        if not sub:
-            return Response({
-            "is_active": False
-            })
-        elif sub.end_date < timezone.now():
-            sub.is_active = False
-            sub.save()
-        return Response({
-            "is_active": sub.is_active,
-            "plan": sub.plan.name,
-            "start_date": sub.start_date,
-            "end_date": sub.end_date
-        })
-    except:
-        return Response({
-            "is_active": False
-        })
+    logger.debug("get_subscription_status", extra={"mandal_id": mandal_id})
+
+    # ⏳ Cached; expired rows are deactivated by expire_subscriptions, not here
+    return Response(subscription_status(mandal_id))
         
         
 @api_view(['POST'])
@@ -1045,4 +1205,74 @@ def validate_session(request):
     except User.DoesNotExist:
         return Response({
             "valid": False
-        })
\ No newline at end of file
+        })
+
+
+# ============================
+# REAL-TIME EVENTS (SSE)
+# ============================
+async def _stream_user(request):
+    """The stream's user, or None when unauthenticated."""
+    auth = CachedJWTAuthentication()
+
+    # EventSource cannot set headers: browsers open it with a ?ticket= from
+    # stream_ticket instead (never the JWT itself, which would be logged)
+    try:
+        header = auth.get_header(request)
+        raw_token = auth.get_raw_token(header) if header else None
+        if raw_token:
+            return await auth.aget_user(auth.get_validated_token(raw_token))
+
+        user_id = realtime.redeem_ticket(request.GET["ticket"]) if request.GET.get("ticket") else None
+        if user_id is None:
+            return None
+        return await auth.aget_user_by_id(user_id)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def stream_ticket(request):
+    """Single-use ticket for opening events_stream without an Authorization header."""
+    return Response({
+        "ticket": realtime.issue_ticket(request.user),
+        "expires_in": realtime.ticket_ttl(),
+    })
+
+
+async def events_stream(request):
+    """
+    Server-sent events for the caller: their notifications, wallet
+    requests / settlements (managers) and, with ?event_id=, that event's
+    ledger changes. Needs the ASGI app; under WSGI every open stream
+    would hold a worker, so it answers 501 there.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Event stream needs the ASGI server"}, status=501)
+
+    user = await _stream_user(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+
+    mandal_event = None
+    if request.GET.get("event_id"):
+        tenant = await aresolve_event(user, request.GET["event_id"])
+        if tenant is None:
+            return JsonResponse({"error": "Invalid event"}, status=403)
+        mandal_event = tenant.mandal_event
+
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+
+    # 📡 Fed by the in-process hub (api/realtime.py)
+    response = StreamingHttpResponse(
+        realtime.event_stream(realtime.user_channels(user, mandal_event), last_id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,185 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Donation, Expense, User, WalletTransfer
+from . import realtime
+from .notifications import transfers_settled
+
+
+# ============================
+# WALLET BALANCE ENGINE
+# ============================
+# balance = collected - spent - sent + received
+#
+# Every component is a correlated SUM against the same outer user row, so
+# one SELECT returns the whole breakdown for any number of users. Only
+# managers ever receive transfers, so the same formula covers both roles.
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _total(qs, user_field):
+    total = (
+        qs.filter(**{user_field: OuterRef("pk")})
+        .order_by()
+        .values(user_field)
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    return Coalesce(Subquery(total, output_field=MONEY), Value(0), output_field=MONEY)
+
+
+def wallet_balances(mandal_event, user_ids=None):
+    """
+    Wallet breakdown for members of the event's mandal, in one query.
+
+    Returns a list of dicts (ordered by name) with ``collected``, ``spent``,
+    ``sent``, ``received`` and ``wallet_balance``. ``user_ids`` limits the
+    result to those users.
+    """
+    users = User.objects.filter(mandal_id=mandal_event.mandal_id)
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+
+    donations = Donation.objects.filter(mandal_event=mandal_event, is_deleted=False)
+    expenses = Expense.objects.filter(mandal_event=mandal_event, is_deleted=False)
+    transfers = WalletTransfer.objects.filter(mandal_event=mandal_event, status="Approved")
+
+    rows = users.annotate(
+        collected=_total(donations, "created_by"),
+        spent=_total(expenses, "created_by"),
+        sent=_total(transfers, "from_user_id"),
+        received=_total(transfers, "to_manager_id"),
+    ).order_by("name").values(
+        "id", "name", "role", "collected", "spent", "sent", "received"
+    )
+
+    balances = []
+    for row in rows:
+        row["user_id"] = row.pop("id")
+        row["wallet_balance"] = row["collected"] - row["spent"] - row["sent"] + row["received"]
+        balances.append(row)
+
+    return balances
+
+
+def wallet_balance(user_id, mandal_event):
+    rows = wallet_balances(mandal_event, user_ids=[user_id])
+    return rows[0]["wallet_balance"] if rows else 0
+
+
+# ============================
+# TRANSFER SETTLEMENT
+# ============================
+# Lock order is always: pending transfers by id, then users by id. Two
+# managers settling overlapping queues therefore queue up instead of
+# deadlocking, and every balance change is a set-based F() update, so no
+# value read in Python is ever written back.
+def _per_user(amounts):
+    return Case(
+        *[When(id=user_id, then=Value(amount)) for user_id, amount in amounts.items()],
+        default=Value(0),
+        output_field=MONEY,
+    )
+
+
+def settle_transfers(manager, approve_ids=(), reject_ids=()):
+    """
+    Approve and/or reject pending transfers of the manager's mandal in one
+    transaction.
+
+    Approved amounts move from each sender's ``wallet_balance`` (and into
+    their ``total_transferred``) to the manager the transfer was addressed
+    to, or to the approving manager when it names none (as the balance
+    engine above counts them). Returns
+    ``{"approved": [...], "rejected": [...], "not_found": [...]}`` keyed by
+    ``client_wallet_transfer_id``.
+    """
+    approve_ids = set(approve_ids)
+    reject_ids = set(reject_ids) - approve_ids
+
+    with transaction.atomic():
+        transfers = list(
+            WalletTransfer.objects.select_for_update()
+            .filter(
+                mandal_id=manager.mandal_id,
+                status="Pending",
+                client_wallet_transfer_id__in=approve_ids | reject_ids,
+            )
+            .order_by("id")
+        )
+
+        approved = [t for t in transfers if t.client_wallet_transfer_id in approve_ids]
+        rejected = [t for t in transfers if t.client_wallet_transfer_id in reject_ids]
+
+        if approved:
+            sent = defaultdict(Decimal)
+            balance = defaultdict(Decimal)
+            for transfer in approved:
+                sent[transfer.from_user_id] += transfer.amount
+                balance[transfer.from_user_id] -= transfer.amount
+                balance[transfer.to_manager_id or manager.id] += transfer.amount
+
+            list(
+                User.objects.select_for_update()
+                .filter(id__in=sorted(balance))
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+
+            User.objects.filter(id__in=balance).update(
+                wallet_balance=F("wallet_balance") + _per_user(balance),
+                total_transferred=F("total_transferred") + _per_user(sent),
+            )
+
+        now = timezone.now()
+        for rows, new_status in ((approved, "Approved"), (rejected, "Rejected")):
+            if rows:
+                WalletTransfer.objects.filter(id__in=[t.id for t in rows]).update(
+                    status=new_status,
+                    approved_at=now,
+                )
+
+        transfers_settled(manager, approved, rejected)
+        realtime.transfers_settled(manager, approved, rejected)
+
+    found = {t.client_wallet_transfer_id for t in transfers}
+    return {
+        "approved": [t.client_wallet_transfer_id for t in approved],
+        "rejected": [t.client_wallet_transfer_id for t in rejected],
+        "not_found": sorted((approve_ids | reject_ids) - found),
+    }
+
+
+# ============================
+# RECONCILIATION
+# ============================
+def stored_balance_drift():
+    """
+    Users whose stored ``wallet_balance`` / ``total_transferred`` no longer
+    match their approved transfers (the only thing settle_transfers moves
+    them by), across all events. Returns a list of dicts with the stored and
+    the expected values.
+    """
+    transfers = WalletTransfer.objects.filter(status="Approved")
+    rows = User.objects.annotate(
+        sent=_total(transfers, "from_user_id"),
+        received=_total(transfers, "to_manager_id"),
+    ).order_by("id").values("id", "wallet_balance", "total_transferred", "sent", "received")
+
+    drift = []
+    for row in rows:
+        expected_balance = row["received"] - row["sent"]
+        if row["wallet_balance"] != expected_balance or row["total_transferred"] != row["sent"]:
+            drift.append({
+                "user_id": row["id"],
+                "wallet_balance": row["wallet_balance"],
+                "expected_balance": expected_balance,
+                "total_transferred": row["total_transferred"],
+                "expected_transferred": row["sent"],
+            })
+    return drift
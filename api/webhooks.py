@@ -0,0 +1,135 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import Mandal, PaymentWebhookEvent
+from .subscriptions import activate_subscription
+
+logger = logging.getLogger(__name__)
+
+
+# ============================
+# PAYMENT WEBHOOK QUEUE
+# ============================
+# The webhook view only verifies and records a delivery (an INSERT that
+# ignores a repeat of the same payment, plus a payments.webhook job) and
+# answers; the run_jobs worker activates it (api/tasks.py), and
+# process_pending_webhooks sweeps up anything left pending. A crash
+# mid-activation rolls the row back to pending.
+ACTIVATING_EVENTS = {"payment.captured", "order.paid"}
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BATCH_SIZE = 50
+
+
+def _entity(payload, name):
+    return ((payload.get("payload") or {}).get(name) or {}).get("entity") or {}
+
+
+def parse_delivery(payload):
+    """
+    ``PaymentWebhookEvent`` (unsaved) for an activating delivery, or None
+    for events we do not act on. The mandal comes from the order notes
+    set by create_subscription_order, copied onto the payment.
+    """
+    if not isinstance(payload, dict) or payload.get("event") not in ACTIVATING_EVENTS:
+        return None
+
+    payment = _entity(payload, "payment")
+    order = _entity(payload, "order")
+    payment_id = payment.get("id")
+    if not payment_id:
+        return None
+
+    notes = payment.get("notes") or order.get("notes") or {}
+    try:
+        mandal_id = int(notes.get("mandal_id")) if isinstance(notes, dict) else None
+    except (TypeError, ValueError):
+        mandal_id = None
+
+    return PaymentWebhookEvent(
+        payment_id=payment_id,
+        order_id=payment.get("order_id") or order.get("id"),
+        event=payload["event"],
+        mandal_id=mandal_id,
+        payload=payload,
+    )
+
+
+def record_delivery(event):
+    """
+    Queue the delivery and its activation job; a retried delivery of the
+    same payment is a no-op. A delivery whose job insert fails is still
+    picked up by the payments.webhooks sweep.
+    """
+    PaymentWebhookEvent.objects.bulk_create([event], ignore_conflicts=True)
+    enqueue("payments.webhook", {"payment_id": event.payment_id}, unique_key=f"payment:{event.payment_id}")
+
+
+def _activate(event):
+    if event.mandal_id is None:
+        raise ValueError("Payment has no mandal_id note")
+    if not Mandal.objects.filter(id=event.mandal_id).exists():
+        raise ValueError(f"Unknown mandal {event.mandal_id}")
+
+    payment = _entity(event.payload, "payment")
+    activate_subscription(event.mandal_id, event.payment_id, payment.get("vpa"))
+
+
+def process_event(event_id):
+    """
+    Activate one pending delivery. Returns its new status, or None when it
+    is not pending (already done, or claimed by another worker).
+    """
+    max_attempts = getattr(settings, "PAYMENT_WEBHOOK_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+
+    with transaction.atomic():
+        event = (
+            PaymentWebhookEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(id=event_id, status="pending")
+            .first()
+        )
+        if event is None:
+            return None
+
+        event.attempts += 1
+        try:
+            with transaction.atomic():
+                _activate(event)
+        except Exception as exc:
+            event.last_error = str(exc)
+            if event.attempts >= max_attempts:
+                event.status = "failed"
+            logger.warning(
+                "payment webhook failed",
+                extra={"payment_id": event.payment_id, "attempts": event.attempts, "error": str(exc)},
+            )
+        else:
+            event.status = "processed"
+            event.processed_at = timezone.now()
+            event.last_error = None
+
+        event.save(update_fields=["status", "attempts", "last_error", "processed_at"])
+
+    return event.status
+
+
+def process_pending_webhooks(limit=None):
+    """Work through up to ``limit`` pending deliveries, oldest first; returns ``{status: count}``."""
+    limit = limit or getattr(settings, "PAYMENT_WEBHOOK_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+    ids = list(
+        PaymentWebhookEvent.objects
+        .filter(status="pending")
+        .order_by("received_at")
+        .values_list("id", flat=True)[:limit]
+    )
+
+    counts = {}
+    for event_id in ids:
+        status = process_event(event_id)
+        if status is not None:
+            counts[status] = counts.get(status, 0) + 1
+    return counts
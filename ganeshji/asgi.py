@@ -5,6 +5,23 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Serving mode for event day: one process holds many open syncs and event
+streams, since a request waiting on MySQL does not hold a worker thread.
+
+    ASYNC_READ_VIEWS=True uvicorn ganeshji.asgi:application \
+        --host 0.0.0.0 --port $PORT --workers 1
+
+- ASYNC_READ_VIEWS=True routes the read endpoints to api/async_views.py
+  (async ORM); writes stay on the sync views and run in a thread.
+- Keep one worker while clients use events/stream/: the realtime hub is
+  in-process. More workers need a broker first.
+- WhiteNoise is sync-only and costs a thread hop per request; static
+  files are better served by the CDN in this mode.
+- Persistent DB connections are off in this mode (see DATABASES): they
+  are kept per thread and ASGI requests do not reuse threads.
+
+Compare the two modes with ``manage.py bench_serving``.
 """
 
 import os
@@ -68,20 +68,55 @@ from datetime import timedelta
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ),
 }
 
+# Content negotiation (Accept header) for sync/*, donations/ and expenses/
+PAYLOAD_RENDERER_CLASSES = (
+    "api.renderers.FastJSONRenderer",
+    "api.renderers.MessagePackRenderer",
+    "rest_framework.renderers.BrowsableAPIRenderer",
+)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=7),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=30),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    # Adds the mandal_id / role claims (api/authentication.py)
+    "TOKEN_OBTAIN_SERIALIZER": "api.authentication.ClaimsTokenObtainPairSerializer",
 }
 
+# Unread notifications of the same group merge into one row within this window
+NOTIFICATION_COLLAPSE_WINDOW = int(os.getenv("NOTIFICATION_COLLAPSE_WINDOW", "900"))
+# Write notifications from the run_jobs worker instead of at the end of the request
+NOTIFICATION_JOBS = os.getenv("NOTIFICATION_JOBS", "False") == "True"
+
+# Server-sent events (api/realtime.py): seconds between keep-alive pings
+# and how many recent messages a reconnecting client can catch up on
+REALTIME_HEARTBEAT = int(os.getenv("REALTIME_HEARTBEAT", "15"))
+REALTIME_BACKLOG = int(os.getenv("REALTIME_BACKLOG", "1000"))
+
+# Serve the read endpoints (sync/*, donations/, my-events/, notifications/,
+# subscription-status/) from api/async_views.py; only worth it under ASGI
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "False") == "True"
+
+# Per-process cache of authenticated users (CachedJWTAuthentication)
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+
 MIDDLEWARE = [
+    'api.middleware.RequestIdMiddleware',
+    'api.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.QueryCountMiddleware',
+    'api.middleware.NotificationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -129,7 +164,9 @@ DATABASES = {
             "init_command": "SET sql_mode='STRICT_TRANS_TABLES'",
             "charset": "utf8mb4",
         },
-        "CONN_MAX_AGE": 100,
+        # Persistent connections leak under ASGI (each request's ORM calls
+        # run on a fresh thread), so close them per request there
+        "CONN_MAX_AGE": 0 if ASYNC_READ_VIEWS else 100,
     }
 }
 
@@ -177,4 +214,63 @@ AUTH_USER_MODEL = "api.User"
 
 
 RAZORPAY_KEY = os.getenv("RAZORPAY_KEY")
-RAZORPAY_SECRET = os.getenv("RAZORPAY_SECRET")
\ No newline at end of file
+RAZORPAY_SECRET = os.getenv("RAZORPAY_SECRET")
+# Signs payment webhooks (set in the gateway dashboard, separate from the
+# key secret); webhooks are refused while it is unset
+RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET")
+
+# Payment gateway: "razorpay", or "fake" to take payments offline (dev,
+# tests, load tests). Order creation can run on a small thread pool with
+# a hard deadline (0 workers = on the request thread)
+PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "razorpay")
+PAYMENT_HTTP_TIMEOUT = (
+    float(os.getenv("PAYMENT_CONNECT_TIMEOUT", "3.05")),
+    float(os.getenv("PAYMENT_READ_TIMEOUT", "10")),
+)
+PAYMENT_ORDER_WORKERS = int(os.getenv("PAYMENT_ORDER_WORKERS", "0"))
+PAYMENT_ORDER_DEADLINE = float(os.getenv("PAYMENT_ORDER_DEADLINE", "15"))
+
+# Background jobs (api/jobs.py, manage.py run_jobs): jobs each worker runs
+# at once, seconds before a running job counts as abandoned, first retry
+# delay (doubled per attempt) and how long finished jobs are kept
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "900"))
+JOB_RETRY_BACKOFF = int(os.getenv("JOB_RETRY_BACKOFF", "10"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))
+
+# /metrics: shared directory for per-worker metric files (unset = this
+# process only) and the scraper's bearer token (unset = no /metrics)
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Structured JSON logs through a non-blocking queue (api/log.py).
+# LOG_DEBUG_SAMPLE_RATE is the share of requests whose DEBUG lines are kept.
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "request_id": {"()": "api.log.RequestIdFilter"},
+        "sampling": {"()": "api.log.SamplingFilter"},
+    },
+    "formatters": {
+        "json": {"()": "api.log.JsonFormatter"},
+    },
+    "handlers": {
+        "queue": {
+            "()": "api.log.NonBlockingHandler",
+            "formatter": "json",
+            "filters": ["request_id", "sampling"],
+        },
+    },
+    "root": {
+        "handlers": ["queue"],
+        "level": os.getenv("LOG_LEVEL", "INFO"),
+    },
+    "loggers": {
+        "api": {
+            "level": os.getenv("API_LOG_LEVEL", "DEBUG"),
+        },
+    },
+}
@@ -2,11 +2,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
 
+from api.metrics import metrics_view
+
 def health_check(request):
     return JsonResponse({"status": "ok"})
 
 urlpatterns = [
     path("", health_check),              # 🔥 Railway health check
+    path("metrics", metrics_view),
     path("admin/", admin.site.urls),
     path("api/", include("api.urls")),
 ]
\ No newline at end of file